@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import base64
+import os
+import threading
+from contextlib import contextmanager
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import unquote, urlsplit
+
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Base64 decodes in 4-character groups; 256 KiB of text per chunk
+_B64_CHUNK = 4 * 64 * 1024
+
+
+def media_dir() -> str:
+    return os.getenv("MEDIA_DIR", os.path.join(os.getcwd(), "outputs"))
+
+
+def public_dir() -> str:
+    """ The part of MEDIA_DIR served at /media: finished videos and reference-mode audio """
+    return os.path.join(media_dir(), "public")
+
+
+def media_url(path: str) -> str:
+    """ URL under the API's /media mount for a file inside public_dir() """
+    root = os.path.abspath(public_dir())
+    path = os.path.abspath(path)
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"{path} is not in the public media directory")
+    return "/media/" + os.path.relpath(path, root).replace(os.sep, "/")
+
+
+def media_path(url: str) -> Optional[str]:
+    """ The file in public_dir() behind a /media/... URL (the inverse of media_url), or None """
+    if not url.startswith("/media/"):
+        return None
+    root = os.path.abspath(public_dir())
+    path = os.path.abspath(os.path.join(root, unquote(urlsplit(url).path[len("/media/"):])))
+    return path if os.path.commonpath([root, path]) == root else None
+
+
+def is_media_path(path: str) -> bool:
+    root = os.path.abspath(media_dir())
+    return os.path.commonpath([root, os.path.abspath(path)]) == root
+
+
+def is_public_path(path: str) -> bool:
+    root = os.path.abspath(public_dir())
+    return os.path.commonpath([root, os.path.abspath(path)]) == root
+
+
+def write_audio_file(data: bytes, path: str) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+def write_data_uri(uri: str, path: str) -> str:
+    """ Decode a base64 data URI straight to disk, one chunk at a time """
+    _, _, encoded = uri.partition(",")
+    encoded = "".join(encoded.split())
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        for start in range(0, len(encoded), _B64_CHUNK):
+            f.write(base64.b64decode(encoded[start:start + _B64_CHUNK]))
+    os.replace(tmp_path, path)
+    return path
+
+
+def materialize_slide_audio(slides: List[Dict[str, Any]], asset_dir: str) -> List[Optional[str]]:
+    """
+    Make sure every slide's audio exists as a file in `asset_dir`.
+
+    Returns one file name (relative to `asset_dir`) or None per slide. Inline
+    data URIs are decoded to disk and /media URLs resolve to their public
+    file; `audioPath` references are only honoured when they point inside
+    MEDIA_DIR.
+    """
+    names: List[Optional[str]] = []
+    for idx, slide in enumerate(slides):
+        audio_url = slide.get("audioUrl") or ""
+        audio_path = slide.get("audioPath") or media_path(audio_url)
+        name = None
+        if audio_path and os.path.isfile(audio_path) and is_media_path(audio_path):
+            if os.path.dirname(os.path.abspath(audio_path)) == os.path.abspath(asset_dir):
+                name = os.path.basename(audio_path)
+            else:
+                name = f"slide-{idx + 1:02d}.mp3"
+                target = os.path.join(asset_dir, name)
+                os.makedirs(asset_dir, exist_ok=True)
+                if os.path.lexists(target):
+                    os.remove(target)
+                try:
+                    os.link(audio_path, target)
+                except OSError:
+                    with open(audio_path, "rb") as src:
+                        write_audio_file(src.read(), target)
+        elif audio_path:
+            logger.warning(f"Ignoring audioPath outside MEDIA_DIR for slide {idx + 1}")
+        elif audio_url.startswith("data:"):
+            name = f"slide-{idx + 1:02d}.mp3"
+            write_data_uri(audio_url, os.path.join(asset_dir, name))
+        names.append(name)
+    return names
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("asset server: " + format % args)
+
+
+@contextmanager
+def serve_directory(directory: str) -> Iterator[str]:
+    """ Serve a directory on an ephemeral localhost port; yields the base URL """
+    handler = partial(_QuietHandler, directory=directory)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import struct
+from typing import Optional, Tuple
+
+# Kbit/s by (MPEG-1?, layer) and the header's bitrate index
+_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Sample rates by the header's version bits (0: MPEG-2.5, 2: MPEG-2, 3: MPEG-1)
+_SAMPLE_RATES = {0: (11025, 12000, 8000), 2: (22050, 24000, 16000), 3: (44100, 48000, 32000)}
+
+
+def audio_duration(data: bytes) -> Optional[float]:
+    """
+    Playback length in seconds of WAV or MP3 bytes, read from the headers
+    without decoding. None when the format is not recognised.
+    """
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return _wav_duration(data)
+    return _mp3_duration(data)
+
+
+def _wav_duration(data: bytes) -> Optional[float]:
+    byte_rate = 0
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk, size = data[pos:pos + 4], struct.unpack_from("<I", data, pos + 4)[0]
+        if chunk == b"fmt " and size >= 12:
+            byte_rate = struct.unpack_from("<I", data, pos + 16)[0]
+        elif chunk == b"data":
+            # Streamed WAVs leave the size unset; the data runs to the end
+            size = min(size, len(data) - pos - 8)
+            return size / byte_rate if byte_rate else None
+        pos += 8 + size + (size & 1)
+    return None
+
+
+def _frame_header(data: bytes, pos: int) -> Optional[Tuple[int, int, int, bool, int]]:
+    """ (frame length, samples, sample rate, MPEG-1?, channel mode) of the frame at `pos` """
+    if pos + 4 > len(data) or data[pos] != 0xFF or data[pos + 1] & 0xE0 != 0xE0:
+        return None
+    b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+    version, layer_bits = (b1 >> 3) & 3, (b1 >> 1) & 3
+    bitrate_idx, rate_idx = b2 >> 4, (b2 >> 2) & 3
+    if version == 1 or layer_bits == 0 or bitrate_idx in (0, 15) or rate_idx == 3:
+        return None
+    layer = 4 - layer_bits
+    mpeg1 = version == 3
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_idx] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_idx]
+    padding = (b2 >> 1) & 1
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate, mpeg1, b3 >> 6
+    samples = 1152 if layer == 2 or mpeg1 else 576
+    return samples // 8 * bitrate // sample_rate + padding, samples, sample_rate, mpeg1, b3 >> 6
+
+
+def _skip_id3(data: bytes) -> int:
+    if data[:3] != b"ID3" or len(data) < 10:
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _vbr_frames(data: bytes, pos: int, mpeg1: bool, channel_mode: int) -> Optional[int]:
+    """ Frame count from a Xing/Info or VBRI header in the first frame """
+    mono = channel_mode == 3
+    side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    xing = pos + 4 + side_info
+    if data[xing:xing + 4] in (b"Xing", b"Info") and xing + 12 <= len(data):
+        flags = struct.unpack_from(">I", data, xing + 4)[0]
+        if flags & 1:
+            return struct.unpack_from(">I", data, xing + 8)[0]
+    vbri = pos + 36
+    if data[vbri:vbri + 4] == b"VBRI" and vbri + 18 <= len(data):
+        return struct.unpack_from(">I", data, vbri + 14)[0]
+    return None
+
+
+def _mp3_duration(data: bytes) -> Optional[float]:
+    pos = _skip_id3(data)
+    # Find the first frame whose successor also lines up, to skip stray sync bytes
+    while pos + 4 <= len(data):
+        header = _frame_header(data, pos)
+        if header and (pos + header[0] >= len(data) or _frame_header(data, pos + header[0])):
+            break
+        pos += 1
+    else:
+        return None
+
+    length, samples, sample_rate, mpeg1, channel_mode = header
+    frames = _vbr_frames(data, pos, mpeg1, channel_mode)
+    if frames is not None:
+        return frames * samples / sample_rate
+
+    total = 0
+    while header:
+        total += header[1]
+        pos += header[0]
+        header = _frame_header(data, pos)
+    return total / sample_rate
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, Optional
+
+# Route -> fixed latency in seconds; overridable per run
+DEFAULT_LATENCY = {
+    "/api/slides/generate": 0.8,
+    "/api/slides/update": 0.4,
+    "/api/podcast/tts": 0.6,
+    "/pinning/pinFileToIPFS": 0.3,
+    "/payment/": 0.05,
+    "/payment/resolve-blockchain-identifier": 0.02,
+    "/payment/submit-result": 0.05,
+}
+
+_WORDS = "growth market product team revenue customers traction vision scale platform".split()
+
+
+class FakeServiceConfig:
+    """ Latency and payload sizes for the stand-in upstreams """
+
+    def __init__(
+        self,
+        latency: Optional[Dict[str, float]] = None,
+        notes_words: int = 60,
+        audio_bytes: int = 96_000,
+        failure_rate: float = 0.0,
+        stream_slides: bool = False,
+    ) -> None:
+        self.latency = {**DEFAULT_LATENCY, **(latency or {})}
+        self.notes_words = notes_words
+        self.audio_bytes = audio_bytes
+        self.failure_rate = failure_rate
+        # Answer slide generation as NDJSON, one slide per line spread over the
+        # route latency, when the client accepts it
+        self.stream_slides = stream_slides
+
+    @classmethod
+    def scaled(cls, factor: float, **kwargs: Any) -> "FakeServiceConfig":
+        """ Every default latency multiplied by `factor` (0 for a pure overhead run) """
+        return cls(latency={route: value * factor for route, value in DEFAULT_LATENCY.items()}, **kwargs)
+
+
+def _silent_mp3(size: int) -> bytes:
+    """ Valid MPEG-1 Layer III silence (128 kbps, 44.1 kHz), about 26 ms per 417-byte frame """
+    frame = b"\xff\xfb\x90\x00" + bytes(413)
+    return frame * max(1, size // len(frame))
+
+
+def _iso(delta: timedelta) -> str:
+    return (datetime.now(timezone.utc) + delta).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # Clients hanging up mid-response (shutdown, cancelled calls) are expected
+        pass
+
+
+class FakeServices:
+    """
+    One HTTP server standing in for Podio AI, Pinata and the Masumi payment
+    service, so the whole pipeline can run without network access.
+
+    Payments are reported as FundsLocked on the first status check and as
+    ResultSubmitted once a result has been submitted.
+    """
+
+    def __init__(self, config: Optional[FakeServiceConfig] = None, port: int = 0) -> None:
+        self.config = config or FakeServiceConfig()
+        self.requests: Counter = Counter()
+        self._submitted: set = set()
+        self._failures = 0
+        self._lock = threading.Lock()
+        self._audio = base64.b64encode(_silent_mp3(self.config.audio_bytes)).decode("ascii")
+        self._server = _Server(("127.0.0.1", port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self) -> "FakeServices":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _should_fail(self) -> bool:
+        if self.config.failure_rate <= 0:
+            return False
+        with self._lock:
+            # Deterministic: every Nth call fails, so runs are reproducible
+            self._failures += 1
+            return self._failures % max(1, round(1 / self.config.failure_rate)) == 0
+
+    def _notes(self, seed: int) -> str:
+        return " ".join(_WORDS[(seed + i) % len(_WORDS)] for i in range(self.config.notes_words))
+
+    def _slide(self, idx: int, topic: str) -> Dict[str, Any]:
+        return {
+            "title": f"{topic} {idx + 1}",
+            "layoutType": "title" if idx == 0 else "content",
+            "bullets": [f"Point {n + 1}" for n in range(3)],
+            "speakerNotes": self._notes(idx),
+            "gradient": "linear-gradient(135deg, #1e1b4b 0%, #0f172a 100%)",
+        }
+
+    def respond(self, path: str, body: Dict[str, Any]) -> tuple[int, Dict[str, Any]]:
+        if path == "/api/slides/generate":
+            count = int(body.get("count", 5))
+            return 200, {"slides": [self._slide(i, body.get("topic", "Pitch")) for i in range(count)]}
+        if path == "/api/slides/update":
+            slide = dict(body.get("currentSlide") or {})
+            slide["title"] = f"{slide.get('title', 'Slide')} (updated)"
+            return 200, {"slide": slide}
+        if path == "/api/podcast/tts":
+            return 200, {"audio": self._audio}
+        if path == "/pinning/pinFileToIPFS":
+            return 200, {"IpfsHash": "Qm" + uuid.uuid4().hex, "PinSize": 0, "Timestamp": _iso(timedelta())}
+        if path == "/payment/":
+            return 200, {"status": "success", "data": {
+                "blockchainIdentifier": "bench_" + uuid.uuid4().hex,
+                "payByTime": _iso(timedelta(hours=12)),
+                "submitResultTime": _iso(timedelta(hours=24)),
+                "unlockTime": _iso(timedelta(hours=36)),
+                "externalDisputeUnlockTime": _iso(timedelta(hours=48)),
+            }}
+        identifier = body.get("blockchainIdentifier")
+        if path.startswith("/payment/") and path != "/payment/" and not isinstance(identifier, str):
+            return 400, {"error": "blockchainIdentifier must be a string"}
+        if path == "/payment/resolve-blockchain-identifier":
+            with self._lock:
+                submitted = identifier in self._submitted
+            state = "ResultSubmitted" if submitted else "FundsLocked"
+            return 200, {"status": "success", "data": {
+                "blockchainIdentifier": identifier,
+                "onChainState": state,
+                "NextAction": {"requestedAction": "WaitingForExternalAction"},
+            }}
+        if path == "/payment/submit-result":
+            with self._lock:
+                self._submitted.add(identifier)
+            return 200, {"status": "success", "data": {}}
+        return 404, {"error": f"No fake for {path}"}
+
+    def _handler(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                path = self.path.split("?", 1)[0]
+                raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                try:
+                    body = json.loads(raw) if raw and "json" in (self.headers.get("Content-Type") or "") else {}
+                except ValueError:
+                    body = {}
+                with services._lock:
+                    services.requests[path] += 1
+                if (
+                    path == "/api/slides/generate"
+                    and services.config.stream_slides
+                    and "application/x-ndjson" in (self.headers.get("Accept") or "")
+                    and not services._should_fail()
+                ):
+                    return self._stream_slides(body)
+                time.sleep(services.config.latency.get(path, 0))
+                if path.startswith("/api/") and services._should_fail():
+                    status, payload = 503, {"error": "injected failure"}
+                else:
+                    status, payload = services.respond(path, body)
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream_slides(self, body: Dict[str, Any]) -> None:
+                slides = services.respond("/api/slides/generate", body)[1]["slides"]
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for slide in slides:
+                    time.sleep(services.config.latency["/api/slides/generate"] / max(1, len(slides)))
+                    line = json.dumps(slide).encode("utf-8") + b"\n"
+                    self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
+
+
+@contextmanager
+def run_fake_services(config: Optional[FakeServiceConfig] = None, port: int = 0) -> Iterator[FakeServices]:
+    services = FakeServices(config, port=port).start()
+    try:
+        yield services
+    finally:
+        services.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the fake upstream services standalone")
+    parser.add_argument("--port", type=int, default=3002)
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--audio-bytes", type=int, default=96_000)
+    args = parser.parse_args()
+
+    fake = FakeServices(FakeServiceConfig.scaled(args.latency_scale, audio_bytes=args.audio_bytes), port=args.port)
+    print(f"Fake Podio / Pinata / Masumi listening on {fake.url}")
+    try:
+        fake._server.serve_forever()
+    except KeyboardInterrupt:
+        fake.stop()
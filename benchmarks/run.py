@@ -0,0 +1,348 @@
+"""
+End-to-end benchmark against local stand-ins for every upstream.
+
+    python -m benchmarks.run --scenario all --concurrency 1,4,8 --requests 16
+    python -m benchmarks.run --scenario pipeline --output after.json --baseline before.json
+
+Reports p50/p95/p99 latency, throughput and peak RSS per scenario and
+concurrency level. `--output` saves the results as JSON and `--baseline`
+compares against a previous run.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.fake_services import FakeServiceConfig, run_fake_services
+
+SCENARIOS = ("pipeline", "tools", "start_job")
+TOOL_ENDPOINTS = ("slides/generate", "slides/update", "tts")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """ Nearest-rank percentile; 0 for an empty sample """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def _current_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == "darwin" else usage * 1024
+
+
+class RSSSampler:
+    """ Tracks the peak resident set size of this process while active """
+
+    def __init__(self, interval: float = 0.05) -> None:
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _current_rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "RSSSampler":
+        self.peak = _current_rss_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss_bytes())
+
+
+async def drive(operation: Callable[[int], Awaitable[Any]], concurrency: int, total: int) -> Dict[str, Any]:
+    """ Run `operation(i)` for i in range(total) with `concurrency` callers in flight """
+    latencies: List[float] = []
+    errors: List[str] = []
+    next_index = iter(range(total))
+
+    async def caller() -> None:
+        for idx in next_index:
+            start = time.perf_counter()
+            try:
+                await operation(idx)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors.append(str(e))
+
+    with RSSSampler() as rss:
+        started = time.perf_counter()
+        await asyncio.gather(*(caller() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+        "throughput_rps": len(latencies) / wall if wall > 0 else 0.0,
+        "wall_seconds": wall,
+        "peak_rss_mb": rss.peak / (1024 * 1024),
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Application setup
+# ─────────────────────────────────────────────────────────────────────────────
+def _bench_env(fake_url: str, workdir: str, args: argparse.Namespace) -> Dict[str, str]:
+    return {
+        "PODIO_AI_BASE_URL": fake_url,
+        "PINATA_API_URL": fake_url,
+        "PINATA_JWT": "bench",
+        "PAYMENT_SERVICE_URL": fake_url,
+        "PAYMENT_API_KEY": "bench",
+        "AGENT_IDENTIFIER": "bench-agent",
+        "NETWORK": "Preprod",
+        "JOB_STORE": "memory",
+        "EXECUTION_MODE": "local",
+        "MEDIA_DIR": os.path.join(workdir, "media"),
+        "TTS_CACHE_ENABLED": "true" if args.tts_cache else "false",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        **({"VIDEO_ENGINE": args.renderer} if args.renderer != "fake" else {}),
+    }
+
+
+def _load_app(env: Dict[str, str]):
+    os.environ.update(env)
+    import main
+    from masumi.config import Config
+
+    # main runs load_dotenv(override=True), so a developer .env must not
+    # redirect the benchmark to real services
+    os.environ.update(env)
+    main.config = Config(payment_service_url=env["PAYMENT_SERVICE_URL"], payment_api_key=env["PAYMENT_API_KEY"])
+    main.NETWORK = env["NETWORK"]
+    return main
+
+
+def _install_fake_renderer(seconds: float, video_bytes: int) -> None:
+    """ Replace the video render with a timed stub that writes a dummy video """
+    import video_generation
+
+    def fake_render(topic, slides, output_dir, project_id=None, **_options):
+        time.sleep(seconds)
+        filename = f"{project_id}.mp4"
+        with open(os.path.join(output_dir, filename), "wb") as f:
+            f.write(os.urandom(video_bytes))
+        return os.path.join(output_dir, filename), filename
+
+    video_generation.render_video = fake_render
+
+
+class _ApiServer:
+    """ The real FastAPI app on an ephemeral port, served from a background thread """
+
+    def __init__(self, app) -> None:
+        import uvicorn
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "_ApiServer":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Scenarios
+# ─────────────────────────────────────────────────────────────────────────────
+async def bench_pipeline(levels: List[int], total: int) -> List[Dict[str, Any]]:
+    from http_pool import close_clients
+    from pipeline import execute_crew_task
+
+    async def run(idx: int) -> None:
+        result = await execute_crew_task(f"Benchmark pitch {idx}")
+        if not result.startswith("Presentation Generated Successfully"):
+            raise RuntimeError(result)
+
+    results = []
+    for level in levels:
+        results.append({"scenario": "pipeline", **await drive(run, level, total)})
+    await close_clients()
+    return results
+
+
+async def bench_tools(base_url: str, levels: List[int], total: int) -> List[Dict[str, Any]]:
+    slide = {"title": "Market", "bullets": ["Large", "Growing"], "speakerNotes": "The market is large."}
+    bodies = {
+        "slides/generate": lambda idx: {"topic": f"Benchmark {idx}", "count": 5},
+        "slides/update": lambda idx: {"topic": "Benchmark", "instruction": f"Tighten {idx}", "currentSlide": slide},
+        "tts": lambda idx: {"script": [{"speaker": "Presenter", "line": f"Benchmark line number {idx}."}]},
+    }
+    results = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+        for endpoint in TOOL_ENDPOINTS:
+            async def call(idx: int, endpoint: str = endpoint) -> None:
+                resp = await client.post(f"/tools/{endpoint}", json=bodies[endpoint](idx))
+                resp.raise_for_status()
+
+            for level in levels:
+                results.append({"scenario": f"tools/{endpoint}", **await drive(call, level, total)})
+    return results
+
+
+async def bench_start_job(base_url: str, levels: List[int], total: int, wait: bool) -> List[Dict[str, Any]]:
+    """ /start_job latency; with `wait`, latency until /status reports the job finished """
+    results = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+        async def start(idx: int) -> str:
+            resp = await client.post("/start_job", json={
+                "identifier_from_purchaser": f"bench{idx:06d}",
+                "input_data": {"text": f"Benchmark pitch {idx}"},
+            })
+            resp.raise_for_status()
+            return resp.json()["job_id"]
+
+        async def start_and_wait(idx: int) -> None:
+            job_id = await start(idx)
+            while True:
+                status = (await client.get("/status", params={"job_id": job_id})).json()
+                if status["status"] == "completed":
+                    return
+                if status["status"] == "failed":
+                    raise RuntimeError(f"Job {job_id} failed")
+                await asyncio.sleep(0.2)
+
+        name = "start_job+complete" if wait else "start_job"
+        for level in levels:
+            results.append({"scenario": name, **await drive(start_and_wait if wait else start, level, total)})
+    return results
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Reporting
+# ─────────────────────────────────────────────────────────────────────────────
+def format_table(results: List[Dict[str, Any]], baseline: Optional[List[Dict[str, Any]]] = None) -> str:
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline or []}
+    header = f"{'scenario':<22}{'conc':>5}{'reqs':>6}{'err':>5}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'rps':>9}{'rss MB':>9}"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        lines.append(
+            f"{r['scenario']:<22}{r['concurrency']:>5}{r['requests']:>6}{r['errors']:>5}"
+            f"{r['p50']:>9.3f}{r['p95']:>9.3f}{r['p99']:>9.3f}{r['throughput_rps']:>9.2f}{r['peak_rss_mb']:>9.1f}"
+        )
+        before = previous.get((r["scenario"], r["concurrency"]))
+        if before:
+            lines.append(
+                f"{'  vs baseline':<38}"
+                f"{_delta(before['p50'], r['p50']):>9}{_delta(before['p95'], r['p95']):>9}"
+                f"{_delta(before['p99'], r['p99']):>9}{_delta(before['throughput_rps'], r['throughput_rps']):>9}"
+                f"{_delta(before['peak_rss_mb'], r['peak_rss_mb']):>9}"
+            )
+    return "\n".join(lines)
+
+
+def _delta(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.0f}%"
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--concurrency", default="1,4", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=8, help="operations per concurrency level")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier for the fake upstream latencies")
+    parser.add_argument("--audio-bytes", type=int, default=96_000, help="size of each fake TTS clip")
+    parser.add_argument("--notes-words", type=int, default=60, help="speaker-note length of fake slides")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of Podio calls answered with 503")
+    parser.add_argument("--renderer", choices=("fake", "remotion", "ffmpeg"), default="fake",
+                        help="fake stub, or a real VIDEO_ENGINE")
+    parser.add_argument("--render-seconds", type=float, default=2.0, help="duration of the fake render")
+    parser.add_argument("--video-bytes", type=int, default=2_000_000, help="size of the fake rendered video")
+    parser.add_argument("--stream-slides", action="store_true", help="fake Podio streams slides as NDJSON")
+    parser.add_argument("--tts-cache", action="store_true", help="keep the TTS cache enabled")
+    parser.add_argument("--wait", action="store_true", help="start_job: measure until the job completes")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    return parser.parse_args(argv)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    config = FakeServiceConfig.scaled(
+        args.latency_scale,
+        notes_words=args.notes_words,
+        audio_bytes=args.audio_bytes,
+        failure_rate=args.failure_rate,
+        stream_slides=args.stream_slides,
+    )
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="pitch-bench-") as workdir, run_fake_services(config) as fake:
+        main = _load_app(_bench_env(fake.url, workdir, args))
+        if args.renderer == "fake":
+            _install_fake_renderer(args.render_seconds, args.video_bytes)
+
+        if "pipeline" in scenarios:
+            results.extend(asyncio.run(bench_pipeline(levels, args.requests)))
+        if "tools" in scenarios or "start_job" in scenarios:
+            with _ApiServer(main.app) as api:
+                if "tools" in scenarios:
+                    results.extend(asyncio.run(bench_tools(api.url, levels, args.requests)))
+                if "start_job" in scenarios:
+                    results.extend(asyncio.run(bench_start_job(api.url, levels, args.requests, args.wait)))
+        upstream_calls = dict(fake.requests)
+    return {"args": vars(args), "results": results, "upstream_calls": upstream_calls}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    report = run(args)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print()
+    print(format_table(report["results"], baseline))
+    print(f"\nUpstream calls: {report['upstream_calls']}")
+
+
+if __name__ == "__main__":
+    main()
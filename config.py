@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import os
+from typing import Optional
+
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def env_float(name: str, default: float, minimum: Optional[float] = None) -> float:
+    """ Float setting from the environment; unset, empty or invalid values fall back to `default` """
+    raw = (os.getenv(name) or "").strip()
+    if not raw:
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        logger.warning(f"Ignoring {name}={raw!r}: not a number, using {default}")
+        return default
+    return value if minimum is None else max(minimum, value)
+
+
+def env_int(name: str, default: int, minimum: Optional[int] = None) -> int:
+    """ Integer setting from the environment, with the same fallbacks as env_float """
+    raw = (os.getenv(name) or "").strip()
+    if not raw:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        logger.warning(f"Ignoring {name}={raw!r}: not an integer, using {default}")
+        return default
+    return value if minimum is None else max(minimum, value)
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from PIL import ImageFont
+
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+FontType = Union[ImageFont.FreeTypeFont, ImageFont.ImageFont]
+
+_FONT_EXTENSIONS = (".ttf", ".otf", ".ttc")
+# Searched in order when no family is requested or the requested one is missing
+_DEFAULT_FAMILIES = ("DejaVu Sans", "Liberation Sans", "Arial", "Helvetica", "Noto Sans")
+# Sizes render_slide uses, warmed by preload()
+PRELOAD_SIZES = (20, 24, 28, 54)
+
+_BOLD_STYLES = ("bold", "black", "heavy", "extrabold", "semibold")
+
+
+def font_dirs() -> List[str]:
+    """ FONT_DIRS (os.pathsep separated) first, then the repo's fonts/ and the usual system locations """
+    configured = [d for d in os.getenv("FONT_DIRS", "").split(os.pathsep) if d]
+    bundled = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts")
+    system = [
+        "/usr/share/fonts",
+        "/usr/local/share/fonts",
+        os.path.expanduser("~/.fonts"),
+        os.path.expanduser("~/.local/share/fonts"),
+        "/Library/Fonts",
+        "/System/Library/Fonts",
+        os.path.join(os.getenv("WINDIR", "C:\\Windows"), "Fonts"),
+    ]
+    return configured + [bundled] + system
+
+
+def _normalize(family: str) -> str:
+    return "".join(family.lower().split()).replace("-", "")
+
+
+class FontRegistry:
+    """
+    Process-wide index of font files, keyed by family and weight.
+
+    Directories are scanned once, on first use; every (family, size, bold)
+    combination is opened at most once and then shared across slides.
+    """
+
+    def __init__(self, directories: Optional[Iterable[str]] = None) -> None:
+        self._directories = list(directories) if directories is not None else None
+        self._index: Optional[Dict[str, Dict[bool, str]]] = None
+        self._lock = threading.Lock()
+        self._fonts: Dict[Tuple[str, int, bool], FontType] = {}
+
+    def _scan(self) -> Dict[str, Dict[bool, str]]:
+        index: Dict[str, Dict[bool, Tuple[int, str]]] = {}
+        for directory in self._directories if self._directories is not None else font_dirs():
+            if not os.path.isdir(directory):
+                continue
+            for root, _, files in os.walk(directory):
+                for name in sorted(files):
+                    if not name.lower().endswith(_FONT_EXTENSIONS):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        family, style = ImageFont.truetype(path, size=12).getname()
+                    except Exception:
+                        continue
+                    style = (style or "").lower()
+                    if "italic" in style or "oblique" in style:
+                        continue
+                    bold = any(token in style.replace(" ", "") for token in _BOLD_STYLES)
+                    # Prefer plain "Regular" / "Bold" over other weights of the family
+                    rank = 0 if style in ("regular", "book", "roman", "normal", "bold") else 1
+                    current = index.setdefault(_normalize(family or name), {}).get(bold)
+                    if current is None or rank < current[0]:
+                        index[_normalize(family or name)][bold] = (rank, path)
+        logger.info(f"Indexed {len(index)} font families")
+        return {family: {bold: path for bold, (_, path) in styles.items()} for family, styles in index.items()}
+
+    def index(self) -> Dict[str, Dict[bool, str]]:
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._scan()
+        return self._index
+
+    def resolve(self, family: Optional[str] = None, bold: bool = False) -> Optional[str]:
+        """ Path of the best file for `family`, falling back to the default families """
+        index = self.index()
+        families = ([family] if family else []) + list(_DEFAULT_FAMILIES)
+        for candidate in families:
+            styles = index.get(_normalize(candidate))
+            if styles:
+                return styles.get(bold) or styles.get(not bold)
+        return None
+
+    def get(self, size: int, bold: bool = False, family: Optional[str] = None) -> FontType:
+        key = (_normalize(family) if family else "", size, bold)
+        font = self._fonts.get(key)
+        if font is not None:
+            return font
+        path = self.resolve(family, bold)
+        font = None
+        if path:
+            try:
+                font = ImageFont.truetype(path, size=size)
+            except Exception as e:
+                logger.warning(f"Could not load font {path}: {str(e)}")
+        if font is None:
+            try:
+                font = ImageFont.load_default(size=size)
+            except TypeError:
+                # Pillow < 10.1 only has the fixed-size bitmap font
+                font = ImageFont.load_default()
+        with self._lock:
+            return self._fonts.setdefault(key, font)
+
+    def preload(self, families: Iterable[Optional[str]] = (None,), sizes: Iterable[int] = PRELOAD_SIZES) -> None:
+        for family in families:
+            for size in sizes:
+                for bold in (False, True):
+                    self.get(size, bold, family)
+
+
+_registry: Optional[FontRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_font_registry() -> FontRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = FontRegistry()
+    return _registry
+
+
+def get_font(size: int, bold: bool = False, family: Optional[str] = None) -> FontType:
+    return get_font_registry().get(size, bold, family)
+
+
+def preload_fonts() -> None:
+    """ Scan font directories and open the sizes render_slide uses, ahead of the first job """
+    get_font_registry().preload()
+
+
+@lru_cache(maxsize=8192)
+def text_length(font: FontType, text: str) -> float:
+    """ Memoized font.getlength; fonts come from the registry, so identity is stable """
+    return font.getlength(text)
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Any, Awaitable, Dict, Tuple, TypeVar
+import httpx
+from config import env_float, env_int
+
+T = TypeVar("T")
+
+# One pooled AsyncClient per upstream and event loop. The API process has a
+# single loop, so this is one client per upstream for the process lifetime.
+_clients: Dict[Tuple[str, int], httpx.AsyncClient] = {}
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=env_int("HTTP_MAX_CONNECTIONS", 20),
+        max_keepalive_connections=env_int("HTTP_MAX_KEEPALIVE_CONNECTIONS", 10),
+        keepalive_expiry=env_float("HTTP_KEEPALIVE_EXPIRY", 30),
+    )
+
+
+def _http2_enabled() -> bool:
+    if os.getenv("HTTP2_ENABLED", "true").lower() in ("0", "false", "no"):
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """ Return the shared client for an upstream, creating it on first use """
+    key = (name, id(asyncio.get_running_loop()))
+    client = _clients.get(key)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(limits=_limits(), http2=_http2_enabled())
+        _clients[key] = client
+    return client
+
+
+def open_clients(*names: str) -> None:
+    for name in names:
+        get_client(name)
+
+
+async def close_clients() -> None:
+    """ Close every client owned by the running event loop """
+    loop_id = id(asyncio.get_running_loop())
+    for key in [k for k in _clients if k[1] == loop_id]:
+        await _clients.pop(key).aclose()
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """ Run an upstream coroutine from synchronous code (standalone scripts) """
+    async def runner() -> Any:
+        try:
+            return await coro
+        finally:
+            await close_clients()
+
+    return asyncio.run(runner())
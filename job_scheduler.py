@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from config import env_int
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+JobFactory = Callable[[], Awaitable[Any]]
+
+
+class SchedulerFullError(RuntimeError):
+    pass
+
+
+class JobScheduler:
+    """
+    Bounded asyncio job scheduler.
+
+    A fixed number of worker tasks pull jobs from a bounded queue. Callers that
+    must not lose work (paid jobs) await `submit`, which waits for queue space;
+    admission control uses `try_submit` / `has_capacity` to push back on new
+    requests while the queue is full.
+    """
+
+    def __init__(self, workers: Optional[int] = None, queue_size: Optional[int] = None):
+        self.workers = workers or env_int("JOB_WORKERS", 2, minimum=1)
+        self.queue_size = queue_size or env_int("JOB_QUEUE_SIZE", 10, minimum=1)
+        self._queue: Optional[asyncio.Queue[Tuple[str, JobFactory]]] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running: Set[str] = set()
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [
+            asyncio.create_task(self._worker(idx), name=f"job-worker-{idx}")
+            for idx in range(self.workers)
+        ]
+        logger.info(f"Job scheduler started with {self.workers} workers, queue size {self.queue_size}")
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._running.clear()
+        logger.info("Job scheduler stopped")
+
+    async def submit(self, job_id: str, factory: JobFactory) -> None:
+        """ Queue a job, waiting for space if the queue is full """
+        await self.start()
+        await self._queue.put((job_id, factory))
+        logger.info(f"Queued job {job_id} (queue depth {self._queue.qsize()})")
+
+    async def try_submit(self, job_id: str, factory: JobFactory) -> None:
+        """ Queue a job or raise SchedulerFullError without waiting """
+        await self.start()
+        try:
+            self._queue.put_nowait((job_id, factory))
+        except asyncio.QueueFull as exc:
+            raise SchedulerFullError("Job queue is full") from exc
+        logger.info(f"Queued job {job_id} (queue depth {self._queue.qsize()})")
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def has_capacity(self) -> bool:
+        return self.queue_depth() < self.queue_size
+
+    def stats(self) -> Dict[str, int]:
+        running = len(self._running)
+        depth = self.queue_depth()
+        return {
+            "workers": self.workers,
+            "running": running,
+            "free_slots": max(0, self.workers - running),
+            "queue_depth": depth,
+            "queue_size": self.queue_size,
+            "queue_free": max(0, self.queue_size - depth),
+        }
+
+    async def _worker(self, idx: int) -> None:
+        while True:
+            job_id, factory = await self._queue.get()
+            self._running.add(job_id)
+            try:
+                logger.info(f"Worker {idx} picked up job {job_id}")
+                await factory()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job {job_id} failed in worker {idx}: {str(e)}", exc_info=True)
+            finally:
+                self._running.discard(job_id)
+                self._queue.task_done()
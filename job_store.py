@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional
+
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+FINISHED_STATUSES = ("completed", "failed")
+UNFINISHED_STATUSES = ("awaiting_payment", "pending", "running")
+
+# Fields stored in their own columns; anything else goes into the `extra` blob
+_COLUMNS = (
+    "job_id",
+    "status",
+    "payment_status",
+    "payment_id",
+    "identifier_from_purchaser",
+    "input_data",
+    "result",
+    "error",
+    "created_at",
+    "updated_at",
+    "finished_at",
+)
+
+
+class JobStore(ABC):
+    """
+    Storage interface for MIP-003 jobs.
+
+    Jobs are plain dicts. `transition` is the only way status should change:
+    it applies the update only if the current status is one of `from_statuses`,
+    so two processes can never both move a job out of the same state.
+    """
+
+    @abstractmethod
+    def create(self, job: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def get_by_payment_id(self, payment_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def update(self, job_id: str, **fields: Any) -> None:
+        ...
+
+    @abstractmethod
+    def transition(self, job_id: str, status: Optional[str], from_statuses: Optional[Iterable[str]] = None, **fields: Any) -> bool:
+        ...
+
+    @abstractmethod
+    def list_by_status(self, statuses: Iterable[str]) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def prune(self, ttl_seconds: float) -> int:
+        """ Delete finished jobs older than `ttl_seconds`; returns the count """
+
+    def close(self) -> None:
+        pass
+
+
+def _stamp(status: Optional[str], fields: Dict[str, Any]) -> Dict[str, Any]:
+    now = time.time()
+    fields = dict(fields)
+    fields["updated_at"] = now
+    if status is not None:
+        fields["status"] = status
+        if status in FINISHED_STATUSES:
+            fields.setdefault("finished_at", now)
+    return fields
+
+
+class InMemoryJobStore(JobStore):
+    """ Process-local store for tests and single-process development """
+
+    def __init__(self) -> None:
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._by_payment: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job: Dict[str, Any]) -> None:
+        now = time.time()
+        record = {"created_at": now, "updated_at": now, "finished_at": None, **copy.deepcopy(job)}
+        with self._lock:
+            self._jobs[record["job_id"]] = record
+            if record.get("payment_id"):
+                self._by_payment[record["payment_id"]] = record["job_id"]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job else None
+
+    def get_by_payment_id(self, payment_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job_id = self._by_payment.get(payment_id)
+        return self.get(job_id) if job_id else None
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        self.transition(job_id, fields.pop("status", None), None, **fields)
+
+    def transition(self, job_id: str, status: Optional[str], from_statuses: Optional[Iterable[str]] = None, **fields: Any) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            if from_statuses is not None and job.get("status") not in tuple(from_statuses):
+                return False
+            job.update(copy.deepcopy(_stamp(status, fields)))
+            if job.get("payment_id"):
+                self._by_payment[job["payment_id"]] = job_id
+            return True
+
+    def list_by_status(self, statuses: Iterable[str]) -> List[Dict[str, Any]]:
+        wanted = tuple(statuses)
+        with self._lock:
+            return [copy.deepcopy(j) for j in self._jobs.values() if j.get("status") in wanted]
+
+    def prune(self, ttl_seconds: float) -> int:
+        cutoff = time.time() - ttl_seconds
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.get("status") in FINISHED_STATUSES and (job.get("finished_at") or 0) < cutoff
+            ]
+            for job_id in expired:
+                job = self._jobs.pop(job_id)
+                self._by_payment.pop(job.get("payment_id"), None)
+        return len(expired)
+
+
+class SQLiteJobStore(JobStore):
+    """ Durable store in a WAL-mode SQLite file, shareable across processes """
+
+    def __init__(self, path: str) -> None:
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                payment_status TEXT,
+                payment_id TEXT,
+                identifier_from_purchaser TEXT,
+                input_data TEXT,
+                result TEXT,
+                error TEXT,
+                extra TEXT NOT NULL DEFAULT '{}',
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                finished_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_payment_id ON jobs(payment_id);
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+            CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs(finished_at);
+            """
+        )
+
+    def _row_to_job(self, row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = {key: row[key] for key in _COLUMNS}
+        job["input_data"] = json.loads(row["input_data"]) if row["input_data"] else None
+        job.update(json.loads(row["extra"] or "{}"))
+        return job
+
+    @staticmethod
+    def _split(fields: Dict[str, Any]) -> tuple[Dict[str, Any], Dict[str, Any]]:
+        columns = {k: v for k, v in fields.items() if k in _COLUMNS}
+        extra = {k: v for k, v in fields.items() if k not in _COLUMNS}
+        if "input_data" in columns and columns["input_data"] is not None:
+            columns["input_data"] = json.dumps(columns["input_data"])
+        return columns, extra
+
+    def create(self, job: Dict[str, Any]) -> None:
+        now = time.time()
+        columns, extra = self._split({"created_at": now, "updated_at": now, **job})
+        columns["extra"] = json.dumps(extra)
+        names = ", ".join(columns)
+        placeholders = ", ".join("?" for _ in columns)
+        with self._lock:
+            self._conn.execute(f"INSERT INTO jobs ({names}) VALUES ({placeholders})", tuple(columns.values()))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def get_by_payment_id(self, payment_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE payment_id = ?", (payment_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        self.transition(job_id, fields.pop("status", None), None, **fields)
+
+    def transition(self, job_id: str, status: Optional[str], from_statuses: Optional[Iterable[str]] = None, **fields: Any) -> bool:
+        columns, extra = self._split(_stamp(status, fields))
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front, so the status check
+            # and the update are atomic across processes sharing the file
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT status, extra FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                if row is None or (from_statuses is not None and row["status"] not in tuple(from_statuses)):
+                    self._conn.execute("ROLLBACK")
+                    return False
+                if extra:
+                    merged = json.loads(row["extra"] or "{}")
+                    merged.update(extra)
+                    columns["extra"] = json.dumps(merged)
+                assignments = ", ".join(f"{name} = ?" for name in columns)
+                self._conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*columns.values(), job_id))
+                self._conn.execute("COMMIT")
+                return True
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def list_by_status(self, statuses: Iterable[str]) -> List[Dict[str, Any]]:
+        wanted = tuple(statuses)
+        placeholders = ", ".join("?" for _ in wanted)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT * FROM jobs WHERE status IN ({placeholders})", wanted).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def prune(self, ttl_seconds: float) -> int:
+        cutoff = time.time() - ttl_seconds
+        placeholders = ", ".join("?" for _ in FINISHED_STATUSES)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({placeholders}) AND finished_at < ?",
+                (*FINISHED_STATUSES, cutoff),
+            )
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_job_store() -> JobStore:
+    """ Build the store selected by JOB_STORE ('sqlite' or 'memory') """
+    backend = os.getenv("JOB_STORE", "sqlite").lower()
+    if backend == "memory":
+        return InMemoryJobStore()
+    path = os.getenv("JOB_STORE_PATH", "jobs.db")
+    logger.info(f"Using SQLite job store at {path}")
+    return SQLiteJobStore(path)
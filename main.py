@@ -1,12 +1,18 @@
 import os
+import asyncio
+import json
 import uvicorn
 import uuid
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, Header, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field, field_validator
 from masumi.config import Config
 from masumi.payment import Payment, Amount
 from crew_definition import ResearchCrew
+from config import env_float, env_int
 from logging_config import setup_logging
 from schemas import (
     GenerateSlidesRequest,
@@ -18,8 +24,28 @@ from schemas import (
     VideoRenderRequest,
     VideoRenderResponse,
 )
-from slide_generation import generate_slides, update_slide
-from podio_client import generate_tts
+from slide_generation import generate_slides_async as generate_slides, update_slide_async as update_slide
+from tts_generation import TTSGenerationError, generate_tts_async as generate_tts, generate_tts_bytes_async, attach_slide_audio
+from tts_cache import cache_key, get_tts_cache
+from audio_assets import is_public_path, media_dir, media_url, public_dir, write_audio_file
+from podio_client import PodioUnavailableError, circuit_breaker as podio_circuit
+from pinata_client import upload_file_async as pinata_upload, PinataError, drain_background_uploads
+from video_generation import VideoGenerationError, default_engine, render_video_async
+from render_settings import resolve_render_settings
+from segment_cache import get_segment_cache
+from result_cache import get_result_cache
+from job_scheduler import JobScheduler
+from pipeline import execute_crew_task, pipeline_capacity, pipeline_stats, shutdown_pipeline
+from work_queue import create_work_queue
+from job_store import create_job_store, UNFINISHED_STATUSES
+from http_pool import get_client, open_clients, close_clients, run_sync
+from font_registry import preload_fonts
+from slide_rendering import shutdown_render_pool
+from remotion_server import shutdown_render_server, warm_render_server
+from metrics import JOBS_RUNNING, JOBS_TOTAL, QUEUE_DEPTH, UPSTREAM_ERRORS, job_trace, render_metrics
+from payment_monitor import create_payment_monitor
+from payment_status import UNRESOLVED_STATUSES, get_payment_status_cache
+from progress import TERMINAL_STATUSES, get_progress_hub, job_progress
 
 # Configure logging
 logger = setup_logging()
@@ -36,17 +62,90 @@ NETWORK = os.getenv("NETWORK")
 logger.info("Starting application with configuration:")
 logger.info(f"PAYMENT_SERVICE_URL: {PAYMENT_SERVICE_URL}")
 
+# ─────────────────────────────────────────────────────────────────────────────
+# Job execution
+# EXECUTION_MODE=local runs paid jobs on the in-process scheduler (bounded
+# worker pool); EXECUTION_MODE=queue hands them to render workers
+# (`python worker.py`, on this or other hosts) through the durable work queue
+# ─────────────────────────────────────────────────────────────────────────────
+EXECUTION_MODE = os.getenv("EXECUTION_MODE", "local").lower()
+WORK_QUEUE_MAX_DEPTH = env_int("WORK_QUEUE_MAX_DEPTH", 50)
+WORK_QUEUE_POLL_INTERVAL = env_float("WORK_QUEUE_POLL_INTERVAL", 1)
+PROGRESS_KEEPALIVE_SECONDS = env_float("PROGRESS_KEEPALIVE_SECONDS", 15)
+WORKER_TOKEN = os.getenv("WORKER_TOKEN")
+# How long shutdown waits for background IPFS uploads (PINATA_BACKGROUND_UPLOAD)
+PINATA_DRAIN_SECONDS = env_float("PINATA_DRAIN_SECONDS", 60)
+
+# Each scheduler worker holds one job for its whole run through the stage
+# pipeline, so by default there are enough of them to keep every stage busy
+scheduler = JobScheduler(workers=env_int("JOB_WORKERS", pipeline_capacity(), minimum=1))
+work_queue = create_work_queue() if EXECUTION_MODE == "queue" else None
+
+def has_capacity() -> bool:
+    if work_queue:
+        return work_queue.stats()["queue_depth"] < WORK_QUEUE_MAX_DEPTH
+    return scheduler.has_capacity()
+
+def queue_stats() -> dict:
+    if work_queue:
+        stats = work_queue.stats()
+        return {
+            "mode": "queue",
+            **stats,
+            "queue_size": WORK_QUEUE_MAX_DEPTH,
+            "queue_free": max(0, WORK_QUEUE_MAX_DEPTH - stats["queue_depth"]),
+        }
+    return {"mode": "local", **scheduler.stats()}
+
+QUEUE_DEPTH.set_function(lambda: queue_stats()["queue_depth"])
+JOBS_RUNNING.set_function(lambda: queue_stats()["leased" if work_queue else "running"])
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    open_clients("podio", "pinata", "masumi")
+    await asyncio.to_thread(preload_fonts)
+    # Bundling takes a while; jobs that arrive first wait for it in render_remotion
+    warm_task = asyncio.create_task(asyncio.to_thread(warm_render_server))
+    await scheduler.start()
+    payment_monitor.start()
+    resume_payment_monitoring()
+    prune_task = asyncio.create_task(prune_finished_jobs())
+    collect_task = asyncio.create_task(collect_work_results()) if work_queue else None
+    yield
+    prune_task.cancel()
+    if collect_task:
+        collect_task.cancel()
+    await payment_monitor.stop()
+    payment_instances.clear()
+    await scheduler.stop()
+    await shutdown_pipeline()
+    await drain_background_uploads(PINATA_DRAIN_SECONDS)
+    await close_clients()
+    await asyncio.to_thread(shutdown_render_pool)
+    await warm_task
+    await asyncio.to_thread(shutdown_render_server)
+
 # Initialize FastAPI
 app = FastAPI(
     title="API following the Masumi API Standard",
     description="API for running Agentic Services tasks with Masumi payment integration",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Rendered videos and reference-mode audio are served from MEDIA_DIR
+os.makedirs(public_dir(), exist_ok=True)
+app.mount("/media", StaticFiles(directory=public_dir()), name="media")
+
 # ─────────────────────────────────────────────────────────────────────────────
-# Temporary in-memory job store (DO NOT USE IN PRODUCTION)
+# Job store (SQLite/WAL by default, JOB_STORE=memory for tests)
 # ─────────────────────────────────────────────────────────────────────────────
-jobs = {}
+job_store = create_job_store()
+JOB_TTL_SECONDS = env_float("JOB_TTL_SECONDS", 7 * 24 * 3600)
+JOB_PRUNE_INTERVAL = env_float("JOB_PRUNE_INTERVAL", 3600)
+
+# Masumi Payment objects by job_id, kept to complete the payment once the job
+# finishes; rebuilt from the job store when missing
 payment_instances = {}
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -77,60 +176,32 @@ class StartJobRequest(BaseModel):
 class ProvideInputRequest(BaseModel):
     job_id: str
 
+class QueueClaimRequest(BaseModel):
+    worker_id: str
+    lease_seconds: float = 60
+
+class QueueHeartbeatRequest(BaseModel):
+    task_id: str
+    worker_id: str
+    lease_seconds: float = 60
+    events: list[dict] = []
+
+class QueueCompleteRequest(BaseModel):
+    task_id: str
+    worker_id: str
+    result: str | None = None
+    error: str | None = None
+    trace: dict | None = None
+
 # ─────────────────────────────────────────────────────────────────────────────
 # CrewAI Task Execution
 # ─────────────────────────────────────────────────────────────────────────────
-async def execute_crew_task(input_data: str) -> str:
-    """ Execute the multimedia generation pipeline (Slides, Audio, Video, IPFS) without CrewAI """
-    logger.info(f"Starting execution with input: {input_data}")
-    
-    try:
-        # 1. Generate Slides (Using Podio directly from User Input)
-        topic = input_data.strip()
-        logger.info(f"Generating slides for topic: {topic}")
-        slides = generate_slides(topic=topic, count=5, style="Modern")
-        
-        # 3. Generate Audio for each slide
-        logger.info("Generating audio for slides...")
-        for slide in slides:
-            if slide.speakerNotes:
-                script = [{"speaker": "Presenter", "line": slide.speakerNotes}]
-                tts_response = generate_tts(script, language="en-US")
-                audio_b64 = tts_response.get("audio", "")
-                slide.audioUrl = f"data:audio/mp3;base64,{audio_b64}"
-                
-                # Calculate duration based on word count with natural pause buffer
-                word_count = len(slide.speakerNotes.split())
-                base_duration = word_count / 2.2
-                pause_buffer = 1.5
-                slide.duration = max(5.0, base_duration + pause_buffer)
-                
-        # 4. Generate a project ID
-        import uuid
-        project_id = str(uuid.uuid4())
-        slides_dict_list = [s.model_dump() for s in slides]
-        
-        # 5. Render Video using Remotion and Upload to IPFS via Pinata
-        from pinata_client import upload_file as pinata_upload
-        from render_remotion import render_remotion_video
-        
-        logger.info("Rendering Remotion video locally...")
-        video_path = render_remotion_video(slides_dict_list, project_id)
-        
-        logger.info("Uploading rendered video to IPFS via Pinata...")
-        ipfs_data = pinata_upload(video_path)
-        ipfs_url = ipfs_data.get("ipfsUrl", "Generation completed, but IPFS missing.")
-        
-        final_output = (
-            f"Presentation Generated Successfully!\n"
-            f"IPFS Backup URL (Pinata): {ipfs_url}"
-        )
-        logger.info("Multimedia pipeline completed.")
-        return final_output
+# The pipeline lives in pipeline.py so worker processes can import it
+# without the API's Masumi configuration
 
-    except Exception as e:
-        logger.error(f"Error during multimedia generation: {str(e)}", exc_info=True)
-        return f"Error generating video presentation: {str(e)}"
+def publish_status(job_id: str, status: str, **data) -> None:
+    """ Push a job status transition to /status/stream subscribers """
+    get_progress_hub().publish(job_id, {"event": "status", "status": status, **data})
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 1) Start Job (MIP-003: /start_job)
@@ -140,6 +211,16 @@ async def start_job(data: StartJobRequest):
     """ Initiates a job and creates a payment request """
     print(f"Received data: {data}")
     print(f"Received data.input_data: {data.input_data}")
+
+    # Push back on new work while the job queue is saturated
+    if not has_capacity():
+        logger.warning("Rejecting job request: job queue is full")
+        raise HTTPException(
+            status_code=503,
+            detail="Server at capacity, please retry later.",
+            headers={"Retry-After": "60"}
+        )
+
     try:
         job_id = str(uuid.uuid4())
         agent_identifier = os.getenv("AGENT_IDENTIFIER")
@@ -170,26 +251,24 @@ async def start_job(data: StartJobRequest):
         logger.info("Creating payment request...")
         payment_request = await payment.create_payment_request()
         blockchain_identifier = payment_request["data"]["blockchainIdentifier"]
-        payment.payment_ids.add(blockchain_identifier)
         logger.info(f"Created payment request with ID: {blockchain_identifier}")
 
         # Store job info (Awaiting payment)
-        jobs[job_id] = {
+        job_store.create({
+            "job_id": job_id,
             "status": "awaiting_payment",
             "payment_status": "pending",
             "payment_id": blockchain_identifier,
             "input_data": data.input_data,
             "result": None,
             "identifier_from_purchaser": data.identifier_from_purchaser
-        }
+        })
 
-        async def payment_callback(blockchain_identifier: str):
-            await handle_payment_status(job_id, blockchain_identifier)
+        publish_status(job_id, "awaiting_payment")
 
         # Start monitoring the payment status
         payment_instances[job_id] = payment
-        logger.info(f"Starting payment status monitoring for job {job_id}")
-        await payment.start_status_monitoring(payment_callback)
+        start_payment_monitoring(job_id, blockchain_identifier)
 
         # Return the response in the required format
         return {
@@ -223,99 +302,336 @@ async def start_job(data: StartJobRequest):
 # 2) Process Payment and Execute AI Task
 # payment_id is the blockchain identifier of the payment
 # ─────────────────────────────────────────────────────────────────────────────
+def payment_for_job(job: dict) -> Payment:
+    """ Returns the Payment for a job, rebuilding it from the store if needed """
+    payment = payment_instances.get(job["job_id"])
+    if payment is None:
+        payment = Payment(
+            agent_identifier=os.getenv("AGENT_IDENTIFIER"),
+            config=config,
+            identifier_from_purchaser=job["identifier_from_purchaser"],
+            input_data=job["input_data"],
+            network=NETWORK
+        )
+        payment_instances[job["job_id"]] = payment
+    return payment
+
+async def resolve_payment(blockchain_identifier: str) -> dict:
+    """ Masumi's record of one payment, or {} if it is not on chain yet """
+    resp = await get_client("masumi").post(
+        f"{config.payment_service_url}/payment/resolve-blockchain-identifier",
+        headers={"token": config.payment_api_key},
+        json={"network": NETWORK, "blockchainIdentifier": blockchain_identifier, "includeHistory": "false"},
+        timeout=30,
+    )
+    if resp.status_code == 404:
+        return {}
+    resp.raise_for_status()
+    return resp.json().get("data") or {}
+
+async def on_payment_confirmed(job_id: str, payment_data: dict) -> None:
+    job_store.update(job_id, payment_status=payment_data["onChainState"])
+    await handle_payment_status(job_id, payment_data["blockchainIdentifier"])
+
+# One monitor polls every outstanding payment and dispatches jobs once paid
+payment_monitor = create_payment_monitor(resolve_payment, on_payment_confirmed, statuses=get_payment_status_cache())
+
+def start_payment_monitoring(job_id: str, blockchain_identifier: str) -> None:
+    logger.info(f"Monitoring payment {blockchain_identifier} for job {job_id}")
+    payment_monitor.track(job_id, blockchain_identifier)
+
+def stop_payment_monitoring(job_id: str) -> None:
+    payment_monitor.untrack(job_id)
+    payment_instances.pop(job_id, None)
+    get_payment_status_cache().forget(job_id)
+
+def resume_payment_monitoring() -> None:
+    """ Restarts monitoring for every unfinished job after a restart """
+    for job in job_store.list_by_status(UNFINISHED_STATUSES):
+        if not job.get("payment_id"):
+            continue
+        if job["status"] != "awaiting_payment" and work_queue is None:
+            # Interrupted mid-run: the payment is still locked, so the monitor
+            # will dispatch the job again
+            logger.warning(f"Job {job['job_id']} was interrupted while {job['status']}, re-dispatching")
+            job_store.transition(job["job_id"], "awaiting_payment", from_statuses=(job["status"],))
+        start_payment_monitoring(job["job_id"], job["payment_id"])
+
+async def prune_finished_jobs() -> None:
+    """ Periodically drops finished jobs older than JOB_TTL_SECONDS """
+    while True:
+        try:
+            removed = job_store.prune(JOB_TTL_SECONDS)
+            if removed:
+                logger.info(f"Pruned {removed} finished jobs")
+        except Exception as e:
+            logger.error(f"Job pruning failed: {str(e)}", exc_info=True)
+        await asyncio.sleep(JOB_PRUNE_INTERVAL)
+
 async def handle_payment_status(job_id: str, payment_id: str) -> None: 
-    """ Executes CrewAI task after payment confirmation """
+    """ Queues the paid job after payment confirmation """
+    if not job_store.transition(job_id, "pending", from_statuses=("awaiting_payment",)):
+        logger.info(f"Job {job_id} is already being processed, ignoring payment callback")
+        return
+    logger.info(f"Payment {payment_id} completed for job {job_id}, queueing task...")
+    publish_status(job_id, "pending")
+
+    if work_queue:
+        job = job_store.get(job_id)
+        await asyncio.to_thread(work_queue.enqueue, job_id, {"text": job["input_data"]["text"]})
+        return
+
+    # Paid work is never dropped: wait for queue space instead of rejecting
+    await scheduler.submit(job_id, lambda: process_job(job_id, payment_id))
+
+async def process_job(job_id: str, payment_id: str) -> None:
+    """ Executes CrewAI task for a paid job """
     try:
-        logger.info(f"Payment {payment_id} completed for job {job_id}, executing task...")
-        
-        # Update job status to running
-        jobs[job_id]["status"] = "running"
-        logger.info(f"Input data: {jobs[job_id]['input_data']}")
-
-        # Execute the AI task
-        result = await execute_crew_task(jobs[job_id]["input_data"])
+        # Update job status to running (atomically, so a job only runs once)
+        if not job_store.transition(job_id, "running", from_statuses=("pending",)):
+            logger.info(f"Job {job_id} is no longer pending, skipping")
+            return
+        publish_status(job_id, "running")
+        job = job_store.get(job_id)
+        logger.info(f"Executing task for job {job_id}...")
+        logger.info(f"Input data: {job['input_data']}")
+
+        async def record_publish(ipfs: dict) -> None:
+            # The IPFS pin may land after the job completed (PINATA_BACKGROUND_UPLOAD)
+            job_store.update(job_id, ipfs=ipfs)
+            get_progress_hub().publish(job_id, {"event": "publish", **ipfs})
+
+        # Execute the AI task, keeping a per-stage trace for /status?trace=true
+        # and streaming its progress to /status/stream
+        with job_trace() as trace, job_progress(job_id):
+            result = await execute_crew_task(job["input_data"]["text"], on_publish=record_publish)
+        job_store.update(job_id, trace=trace.to_dict())
         print(f"Result: {result}")
         logger.info(f"Crew task completed for job {job_id}")
-        
-        # Convert result to string for payment completion
-        # Check if result has .raw attribute (CrewOutput), otherwise convert to string
-        result_string = result.raw if hasattr(result, "raw") else str(result)
-        
-        # Mark payment as completed on Masumi
-        # Use a shorter string for the result hash
-        await payment_instances[job_id].complete_payment(payment_id, result_string)
-        logger.info(f"Payment completed for job {job_id}")
-
-        # Update job status
-        jobs[job_id]["status"] = "completed"
-        jobs[job_id]["payment_status"] = "completed"
-        jobs[job_id]["result"] = result
-
-        # Stop monitoring payment status
-        if job_id in payment_instances:
-            payment_instances[job_id].stop_status_monitoring()
-            del payment_instances[job_id]
+
+        await finish_job(job, payment_id, result)
     except Exception as e:
-        print(f"Error processing payment {payment_id} for job {job_id}: {str(e)}")
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["error"] = str(e)
-        
-        # Still stop monitoring to prevent repeated failures
-        if job_id in payment_instances:
-            payment_instances[job_id].stop_status_monitoring()
-            del payment_instances[job_id]
+        fail_job(job_id, payment_id, str(e))
+
+async def finish_job(job: dict, payment_id: str, result) -> None:
+    """ Submits the result to Masumi and marks the job completed """
+    job_id = job["job_id"]
+
+    # Convert result to string for payment completion
+    # Check if result has .raw attribute (CrewOutput), otherwise convert to string
+    result_string = result.raw if hasattr(result, "raw") else str(result)
+    
+    # Mark payment as completed on Masumi
+    # Use a shorter string for the result hash
+    try:
+        await payment_for_job(job).complete_payment(payment_id, result_string)
+    except Exception:
+        UPSTREAM_ERRORS.inc(upstream="masumi", endpoint="complete_payment")
+        raise
+    logger.info(f"Payment completed for job {job_id}")
+
+    # Update job status
+    job_store.transition(job_id, "completed", payment_status="completed", result=result_string)
+    JOBS_TOTAL.inc(status="completed")
+    publish_status(job_id, "completed", result=result_string)
+
+    # Stop monitoring payment status
+    stop_payment_monitoring(job_id)
+
+def fail_job(job_id: str, payment_id: str, error: str) -> None:
+    print(f"Error processing payment {payment_id} for job {job_id}: {error}")
+    job_store.transition(job_id, "failed", error=error)
+    JOBS_TOTAL.inc(status="failed")
+    publish_status(job_id, "failed", error=error)
+    
+    # Still stop monitoring to prevent repeated failures
+    stop_payment_monitoring(job_id)
+
+async def collect_work_results() -> None:
+    """ Applies render worker progress and results to the job store (queue mode) """
+    while True:
+        try:
+            for job_id in await asyncio.to_thread(work_queue.leased_job_ids):
+                if job_store.transition(job_id, "running", from_statuses=("pending",)):
+                    publish_status(job_id, "running")
+
+            for job_id, events in await asyncio.to_thread(work_queue.drain_events):
+                for event in events:
+                    get_progress_hub().publish(job_id, event)
+
+            for task in await asyncio.to_thread(work_queue.finished):
+                job = job_store.get(task["job_id"])
+                if job and task.get("trace"):
+                    job_store.update(job["job_id"], trace=task["trace"])
+                if job and job["status"] not in ("completed", "failed"):
+                    if task["status"] == "done":
+                        try:
+                            await finish_job(job, job["payment_id"], task["result"])
+                        except Exception as e:
+                            fail_job(job["job_id"], job["payment_id"], str(e))
+                    else:
+                        fail_job(job["job_id"], job["payment_id"], task["error"] or "Render worker failed")
+                await asyncio.to_thread(work_queue.mark_collected, task["task_id"])
+        except Exception as e:
+            logger.error(f"Collecting work results failed: {str(e)}", exc_info=True)
+        await asyncio.sleep(WORK_QUEUE_POLL_INTERVAL)
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 3) Check Job and Payment Status (MIP-003: /status)
 # ─────────────────────────────────────────────────────────────────────────────
+async def fetch_payment_status(job: dict) -> str:
+    """ Resolves a job's on-chain payment state from Masumi """
+    try:
+        payment = await resolve_payment(job["payment_id"])
+    except ValueError as e:
+        logger.warning(f"Error checking payment status: {str(e)}")
+        return "unknown"
+    except Exception as e:
+        logger.error(f"Error checking payment status: {str(e)}", exc_info=True)
+        UPSTREAM_ERRORS.inc(upstream="masumi", endpoint="resolve_payment")
+        return "error"
+    # Not found / no on-chain state yet means the buyer has not paid
+    payment_status = payment.get("onChainState") or job["payment_status"]
+    logger.info(f"Updated payment status for job {job['job_id']}: {payment_status}")
+    return payment_status
+
 @app.get("/status")
-async def get_status(job_id: str):
+async def get_status(job_id: str, trace: bool = False):
     """ Retrieves the current status of a specific job """
     logger.info(f"Checking status for job {job_id}")
-    if job_id not in jobs:
+    job = job_store.get(job_id)
+    if job is None:
         logger.warning(f"Job {job_id} not found")
         raise HTTPException(status_code=404, detail="Job not found")
 
-    job = jobs[job_id]
-
-    # Check latest payment status if payment instance exists
-    if job_id in payment_instances:
-        try:
-            status = await payment_instances[job_id].check_payment_status()
-            job["payment_status"] = status.get("data", {}).get("status")
-            logger.info(f"Updated payment status for job {job_id}: {job['payment_status']}")
-        except ValueError as e:
-            logger.warning(f"Error checking payment status: {str(e)}")
-            job["payment_status"] = "unknown"
-        except Exception as e:
-            logger.error(f"Error checking payment status: {str(e)}", exc_info=True)
-            job["payment_status"] = "error"
-
+    # Payment state comes from the monitor, refreshed at most once per
+    # PAYMENT_STATUS_TTL_SECONDS however many clients poll
+    if payment_monitor.is_tracking(job_id):
+        payment_status = await get_payment_status_cache().get(job_id, lambda: fetch_payment_status(job))
+        if payment_status not in UNRESOLVED_STATUSES and payment_status != job["payment_status"]:
+            job_store.update(job_id, payment_status=payment_status)
+        job["payment_status"] = payment_status
 
-    result_data = job.get("result")
-    logger.info(f"Result data: {result_data}")
-    result = result_data.raw if result_data and hasattr(result_data, "raw") else None
+    result = job.get("result")
+    logger.info(f"Result data: {result}")
 
-
-
-    return {
+    response = {
         "job_id": job_id,
         "status": job["status"],
         "payment_status": job["payment_status"],
         "result": result
     }
+    if job.get("ipfs"):
+        response["ipfs"] = job["ipfs"]
+    if trace:
+        response["trace"] = job.get("trace")
+    return response
+
+def _sse(event: dict) -> str:
+    event_id = f"id: {event['id']}\n" if "id" in event else ""
+    return f"{event_id}event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+@app.get("/status/stream")
+async def stream_status(job_id: str, request: Request, last_event_id: str | None = Header(None)):
+    """
+    Server-Sent Events for one job: a snapshot of its stored state, then
+    status transitions, stage start/finish, per-slide TTS, render and upload
+    progress as they happen. The stream ends once the job completes or
+    fails; reconnecting with Last-Event-ID resumes after the last event seen.
+    Served from memory, without a Masumi call per update.
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    hub = get_progress_hub()
+    after = hub.resume_after(job_id, last_event_id)
+
+    def snapshot(job: dict) -> str:
+        return _sse({
+            "event": "snapshot",
+            "status": job["status"],
+            "payment_status": job["payment_status"],
+            "result": job.get("result"),
+        })
+
+    async def events():
+        with hub.subscribe(job_id, after) as subscription:
+            # Read after subscribing: a job finishing meanwhile shows up here or as an event
+            current = job_store.get(job_id) or job
+            finished = current["status"] in TERMINAL_STATUSES
+            if not after:
+                yield snapshot(current)
+                if finished:
+                    return
+            while True:
+                event = await subscription.get(timeout=0 if finished else PROGRESS_KEEPALIVE_SECONDS)
+                if event is None:
+                    if finished:
+                        # Resumed after the final status left the history
+                        yield snapshot(current)
+                        return
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse(event)
+                if event["event"] == "status" and event["status"] in TERMINAL_STATUSES:
+                    return
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 4) Check Server Availability (MIP-003: /availability)
 # ─────────────────────────────────────────────────────────────────────────────
 @app.get("/availability")
 async def check_availability():
-    """ Checks if the server is operational """
-
-    return {"status": "available", "type": "masumi-agent", "message": "Server operational."}
+    """ Checks if the server is operational and has room for new jobs """
+    queue = queue_stats()
+    upstreams = {"podio": podio_circuit().stats()}
+    if not has_capacity():
+        return {"status": "unavailable", "type": "masumi-agent", "message": "Server at capacity.", "queue": queue, "upstreams": upstreams}
+    if upstreams["podio"]["state"] == "open":
+        return {"status": "unavailable", "type": "masumi-agent", "message": "Podio AI is unavailable.", "queue": queue, "upstreams": upstreams}
+
+    return {"status": "available", "type": "masumi-agent", "message": "Server operational.", "queue": queue, "upstreams": upstreams}
     # Commented out for simplicity sake but its recommended to include the agentIdentifier
     #return {"status": "available","agentIdentifier": os.getenv("AGENT_IDENTIFIER"), "message": "The server is running smoothly."}
 
+# ─────────────────────────────────────────────────────────────────────────────
+# Work queue endpoints for render workers on other hosts (EXECUTION_MODE=queue)
+# ─────────────────────────────────────────────────────────────────────────────
+def require_worker(token: str | None) -> None:
+    if work_queue is None:
+        raise HTTPException(status_code=404, detail="Work queue is disabled")
+    if not WORKER_TOKEN or token != WORKER_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid worker token")
+
+@app.post("/internal/queue/claim")
+async def queue_claim(payload: QueueClaimRequest, x_worker_token: str | None = Header(None)):
+    require_worker(x_worker_token)
+    task = await asyncio.to_thread(work_queue.claim, payload.worker_id, payload.lease_seconds)
+    if task is None:
+        return Response(status_code=204)
+    return task
+
+@app.post("/internal/queue/heartbeat")
+async def queue_heartbeat(payload: QueueHeartbeatRequest, x_worker_token: str | None = Header(None)):
+    require_worker(x_worker_token)
+    ok = await asyncio.to_thread(
+        work_queue.heartbeat, payload.task_id, payload.worker_id, payload.lease_seconds, payload.events
+    )
+    return {"ok": ok}
+
+@app.post("/internal/queue/complete")
+async def queue_complete(payload: QueueCompleteRequest, x_worker_token: str | None = Header(None)):
+    require_worker(x_worker_token)
+    ok = await asyncio.to_thread(work_queue.complete, payload.task_id, payload.worker_id, payload.result, payload.error, payload.trace)
+    return {"ok": ok}
+
 # ─────────────────────────────────────────────────────────────────────────────
 # 5) Retrieve Input Schema (MIP-003: /input_schema)
 # ─────────────────────────────────────────────────────────────────────────────
@@ -342,11 +658,17 @@ async def input_schema():
 # ─────────────────────────────────────────────────────────────────────────────
 # Pitch Generator Tools (Slides, TTS, Video)
 # ─────────────────────────────────────────────────────────────────────────────
+def podio_unavailable(error: PodioUnavailableError) -> HTTPException:
+    """ 503 while the Podio AI circuit breaker is open, instead of waiting on a failing upstream """
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": str(max(1, round(error.retry_after)))})
+
 @app.post("/tools/slides/generate", response_model=GenerateSlidesResponse)
 async def tools_generate_slides(payload: GenerateSlidesRequest):
     try:
-        slides = generate_slides(topic=payload.topic, count=payload.count, style=payload.style)
+        slides = await generate_slides(topic=payload.topic, count=payload.count, style=payload.style)
         return GenerateSlidesResponse(slides=slides)
+    except PodioUnavailableError as e:
+        raise podio_unavailable(e)
     except Exception as e:
         logger.error(f"Slide generation failed: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to generate slides")
@@ -355,13 +677,15 @@ async def tools_generate_slides(payload: GenerateSlidesRequest):
 @app.post("/tools/slides/update", response_model=UpdateSlideResponse)
 async def tools_update_slide(payload: UpdateSlideRequest):
     try:
-        slide = update_slide(
+        slide = await update_slide(
             topic=payload.topic,
             instruction=payload.instruction,
             current_slide=payload.currentSlide,
             style=payload.style
         )
         return UpdateSlideResponse(slide=slide)
+    except PodioUnavailableError as e:
+        raise podio_unavailable(e)
     except Exception as e:
         logger.error(f"Slide update failed: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to update slide")
@@ -370,11 +694,24 @@ async def tools_update_slide(payload: UpdateSlideRequest):
 @app.post("/tools/tts", response_model=TTSResponse)
 async def tools_generate_tts(payload: TTSRequest):
     try:
-        audio = generate_tts(
-            [line.model_dump() for line in payload.script],
+        script = [line.model_dump() for line in payload.script]
+        options = dict(
             language=payload.language,
+            provider=payload.provider,
+            voice=payload.voice,
+            voice_map=payload.voiceMap,
         )
+        if payload.audioMode == "reference":
+            audio_bytes = await generate_tts_bytes_async(script, **options)
+            key = cache_key(script, payload.language, payload.provider, payload.voice, payload.voiceMap)
+            path = os.path.join(public_dir(), "audio", f"{key}.mp3")
+            await asyncio.to_thread(write_audio_file, audio_bytes, path)
+            return TTSResponse(audioUrl=media_url(path))
+
+        audio = await generate_tts(script, **options)
         return TTSResponse(audio=audio)
+    except PodioUnavailableError as e:
+        raise podio_unavailable(e)
     except TTSGenerationError as e:
         logger.error(f"TTS generation failed: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -386,8 +723,32 @@ async def tools_generate_tts(payload: TTSRequest):
 @app.post("/tools/video/render", response_model=VideoRenderResponse)
 async def tools_render_video(payload: VideoRenderRequest):
     try:
-        output_dir = os.getenv("MEDIA_DIR", os.path.join(os.getcwd(), "outputs"))
-        video_path, filename = render_video(
+        settings = resolve_render_settings(
+            payload.engine or default_engine(),
+            fps=payload.fps,
+            output_format=payload.outputFormat,
+            codec=payload.codec,
+            crf=payload.crf,
+            resolution=payload.resolution,
+            concurrency=payload.concurrency,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    for idx, slide in enumerate(payload.slides):
+        # Only audio this API published (reference-mode TTS) may be read from disk
+        if slide.audioPath and not is_public_path(slide.audioPath):
+            raise HTTPException(status_code=400, detail=f"Slide {idx + 1}: audioPath must be a public media file")
+    try:
+        output_dir = public_dir()
+        if payload.generateAudio:
+            await attach_slide_audio(
+                payload.slides,
+                language=payload.ttsLanguage,
+                provider=payload.ttsProvider,
+                voice=payload.ttsVoice,
+                audio_dir=os.path.join(media_dir(), "audio", str(uuid.uuid4())),
+            )
+        video_path, filename = await render_video_async(
             topic=payload.topic,
             slides=payload.slides,
             output_dir=output_dir,
@@ -395,14 +756,16 @@ async def tools_render_video(payload: VideoRenderRequest):
             brand=payload.brand,
             fps=payload.fps,
             output_format=payload.outputFormat,
-            generate_audio=payload.generateAudio,
+            # Audio was attached above through the TTS cache
+            generate_audio=False,
             tts_language=payload.ttsLanguage,
             tts_provider=payload.ttsProvider,
             tts_voice=payload.ttsVoice,
+            settings=settings,
         )
         ipfs_data = None
         try:
-            ipfs_data = pinata_upload(video_path, name=filename)
+            ipfs_data = await pinata_upload(video_path, name=filename)
         except PinataError as e:
             logger.error(f"Pinata upload failed: {str(e)}", exc_info=True)
 
@@ -412,6 +775,7 @@ async def tools_render_video(payload: VideoRenderRequest):
             ipfsUrl=ipfs_data.get("ipfsUrl") if ipfs_data else None,
             gatewayUrl=ipfs_data.get("gatewayUrl") if ipfs_data else None,
             ipfsHash=ipfs_data.get("ipfsHash") if ipfs_data else None,
+            settings=settings,
         )
     except VideoGenerationError as e:
         logger.error(f"Video rendering failed: {str(e)}", exc_info=True)
@@ -428,10 +792,24 @@ async def health():
     """
     Returns the health of the server.
     """
+    cache = get_tts_cache()
+    segments = get_segment_cache()
+    results = get_result_cache()
     return {
-        "status": "healthy"
+        "status": "healthy",
+        "tts_cache": cache.stats() if cache else None,
+        "segment_cache": segments.stats() if segments else None,
+        "payment_status_cache": get_payment_status_cache().stats(),
+        "payment_monitor": payment_monitor.stats(),
+        "result_cache": results.stats() if results else None,
+        "stage_pipeline": pipeline_stats(),
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """ Prometheus scrape endpoint: stage latencies, upstream errors, queue gauges """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Main Logic if Called as a Script
 # ─────────────────────────────────────────────────────────────────────────────
@@ -451,10 +829,8 @@ def main():
     print(f"Input: {input_data['text']}")
     print("\nProcessing with CrewAI agents...\n")
     
-    import asyncio
-    
     # Run the full async execute_crew_task pipeline, rendering video locally!
-    result = asyncio.run(execute_crew_task(input_data["text"]))
+    result = run_sync(execute_crew_task(input_data["text"]))
     
     # Display the result
     print("\n" + "=" * 70)
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import contextvars
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from progress import emit
+
+# Seconds; covers a cache hit through a multi-minute render
+DEFAULT_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+_registry: List["_Metric"] = []
+_registry_lock = threading.Lock()
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = [(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in pairs]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        ...
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """ Gauge whose value is either set directly or read from a callback at scrape time """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    def _samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                return [f"{self.name} {_format_value(self._function())}"]
+            except Exception:
+                return []
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            # Per-bucket counts followed by sum and count
+            state = self._values.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[idx] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = []
+        for key, state in items:
+            for idx, bound in enumerate(self.buckets):
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {_format_value(state[idx])}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(state[-1])}")
+        return lines
+
+
+def render_metrics() -> str:
+    """ All registered metrics in the Prometheus text exposition format """
+    with _registry_lock:
+        metrics = list(_registry)
+    return "\n".join(m.render() for m in metrics) + "\n"
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Pipeline metrics
+# ─────────────────────────────────────────────────────────────────────────────
+STAGE_SECONDS = Histogram("pitch_stage_seconds", "Duration of execute_crew_task pipeline stages", ["stage"])
+TTS_REQUEST_SECONDS = Histogram("pitch_tts_request_seconds", "Duration of a single TTS synthesis", ["source"])
+UPSTREAM_ERRORS = Counter("pitch_upstream_errors_total", "Failed calls to upstream services", ["upstream", "endpoint"])
+UPSTREAM_RETRIES = Counter("pitch_upstream_retries_total", "Retried calls to upstream services", ["upstream", "endpoint"])
+UPSTREAM_HEDGES = Counter("pitch_upstream_hedges_total", "Hedged (duplicate) calls to slow upstreams", ["upstream", "endpoint"])
+AUDIO_BYTES = Counter("pitch_audio_bytes_total", "Bytes of synthesized audio produced")
+VIDEO_BYTES = Counter("pitch_video_bytes_total", "Bytes of rendered video produced")
+UPLOAD_BYTES = Counter("pitch_upload_bytes_total", "Bytes uploaded to upstream storage", ["upstream"])
+UPLOAD_THROUGHPUT = Histogram(
+    "pitch_upload_throughput_bytes_per_second",
+    "Throughput of completed uploads",
+    ["upstream"],
+    buckets=(1e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 2.5e7, 5e7, 1e8),
+)
+PIPELINE_STAGE_RETRIES = Counter("pitch_pipeline_stage_retries_total", "Retried pipeline stage runs", ["stage"])
+JOBS_TOTAL = Counter("pitch_jobs_total", "Finished paid jobs", ["status"])
+QUEUE_DEPTH = Gauge("pitch_job_queue_depth", "Paid jobs waiting for a worker")
+JOBS_RUNNING = Gauge("pitch_jobs_running", "Paid jobs currently executing")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Per-job traces
+# ─────────────────────────────────────────────────────────────────────────────
+class JobTrace:
+    """ Ordered list of timed spans recorded while one job runs """
+
+    def __init__(self) -> None:
+        self.started_at = time.time()
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float, **attrs: Any) -> None:
+        span = {"name": name, "start": round(time.time() - seconds - self.started_at, 4), "seconds": round(seconds, 4)}
+        span.update(attrs)
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start"])
+        return {"started_at": self.started_at, "total_seconds": round(time.time() - self.started_at, 4), "spans": spans}
+
+
+_current_trace: contextvars.ContextVar[Optional[JobTrace]] = contextvars.ContextVar("job_trace", default=None)
+
+
+@contextmanager
+def job_trace() -> Iterator[JobTrace]:
+    """ Collect spans from everything run inside the block (including child tasks) """
+    trace = JobTrace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def record_span(name: str, seconds: float, **attrs: Any) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, seconds, **attrs)
+
+
+@contextmanager
+def stage_timer(stage: str, **attrs: Any) -> Iterator[None]:
+    """ Time a pipeline stage into STAGE_SECONDS and the current job trace, and report it as progress """
+    start = time.perf_counter()
+    emit("stage", stage=stage, state="started")
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        record_span(stage, elapsed, **attrs)
+        emit("stage", stage=stage, state="finished", seconds=round(elapsed, 4))
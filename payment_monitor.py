@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from config import env_float, env_int
+from logging_config import get_logger
+from metrics import UPSTREAM_ERRORS
+from payment_status import PaymentStatusCache
+
+logger = get_logger(__name__)
+
+# Masumi on-chain state at which a job is paid for and can run
+FUNDS_LOCKED = "FundsLocked"
+
+Resolve = Callable[[str], Awaitable[Dict[str, Any]]]
+OnConfirmed = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+class PaymentMonitor:
+    """
+    One polling loop for every outstanding Masumi payment.
+
+    Jobs are tracked by their blockchain identifier. Each round resolves up
+    to `batch_size` of them concurrently (least recently checked first),
+    records their state in the payment status cache and calls
+    `on_confirmed(job_id, payment)` once a payment reaches FundsLocked.
+
+    Rounds run every `interval` seconds. The interval backs off towards
+    `max_interval` while nothing changes and drops back to `interval` when a
+    payment changes state or a new job is tracked, so idle buyers cost few
+    upstream calls and fresh payments are still picked up quickly.
+    """
+
+    def __init__(
+        self,
+        resolve: Resolve,
+        on_confirmed: OnConfirmed,
+        statuses: Optional[PaymentStatusCache] = None,
+        interval: float = 10.0,
+        max_interval: float = 60.0,
+        batch_size: int = 20,
+    ) -> None:
+        self._resolve = resolve
+        self._on_confirmed = on_confirmed
+        self._statuses = statuses
+        self.min_interval = interval
+        self.max_interval = max(interval, max_interval)
+        self.interval = interval
+        self.batch_size = max(1, batch_size)
+        self._tracked: Dict[str, str] = {}
+        self._states: Dict[str, Optional[str]] = {}
+        self._last_checked: Dict[str, float] = {}
+        self._callbacks: Set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self.rounds = 0
+        self.checks = 0
+        self.errors = 0
+        self.confirmed = 0
+
+    def track(self, job_id: str, blockchain_identifier: str) -> None:
+        self._tracked[job_id] = blockchain_identifier
+        self.interval = self.min_interval
+        if self._wake:
+            self._wake.set()
+
+    def untrack(self, job_id: str) -> None:
+        self._tracked.pop(job_id, None)
+        self._states.pop(job_id, None)
+        self._last_checked.pop(job_id, None)
+
+    def is_tracking(self, job_id: str) -> bool:
+        return job_id in self._tracked
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        tasks = [t for t in [self._task, *self._callbacks] if t]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._wake = None
+
+    async def _run(self) -> None:
+        last_round = 0.0
+        while True:
+            self._wake.clear()
+            delay: Optional[float] = None
+            if self._tracked:
+                delay = last_round + self.interval - time.monotonic()
+                if delay <= 0:
+                    last_round = time.monotonic()
+                    try:
+                        await self.poll()
+                    except Exception as e:
+                        logger.error(f"Payment monitor round failed: {str(e)}", exc_info=True)
+                    continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def poll(self) -> None:
+        """ Resolve one batch of tracked payments and adapt the interval """
+        batch = sorted(self._tracked, key=lambda job_id: self._last_checked.get(job_id, 0.0))[:self.batch_size]
+        if not batch:
+            return
+        self.rounds += 1
+        changes = await asyncio.gather(*(self._check(job_id) for job_id in batch))
+        if any(changes):
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+        logger.debug(f"Checked {len(batch)} of {len(self._tracked)} payments, next round in {self.interval:.1f}s")
+
+    async def _check(self, job_id: str) -> bool:
+        """ Resolve one payment; True if its state changed """
+        identifier = self._tracked.get(job_id)
+        if identifier is None:
+            return False
+        self.checks += 1
+        self._last_checked[job_id] = time.monotonic()
+        try:
+            payment = await self._resolve(identifier)
+        except Exception as e:
+            self.errors += 1
+            UPSTREAM_ERRORS.inc(upstream="masumi", endpoint="resolve_payment")
+            logger.warning(f"Could not resolve payment {identifier[:8]}... for job {job_id}: {str(e)}")
+            return False
+        if job_id not in self._tracked:
+            # Untracked while the lookup was in flight
+            return False
+
+        # No on-chain state yet means the buyer has not paid
+        state = payment.get("onChainState")
+        changed = state != self._states.get(job_id)
+        self._states[job_id] = state
+        if self._statuses:
+            self._statuses.record(job_id, state)
+        if state == FUNDS_LOCKED:
+            self.untrack(job_id)
+            self.confirmed += 1
+            task = asyncio.create_task(self._confirm(job_id, identifier, payment))
+            self._callbacks.add(task)
+            task.add_done_callback(self._callbacks.discard)
+        return changed
+
+    async def _confirm(self, job_id: str, identifier: str, payment: Dict[str, Any]) -> None:
+        try:
+            await self._on_confirmed(job_id, payment)
+        except Exception as e:
+            # Track it again so the next round retries the dispatch
+            logger.error(f"Dispatching paid job {job_id} failed: {str(e)}", exc_info=True)
+            self._tracked.setdefault(job_id, identifier)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tracked": len(self._tracked),
+            "interval_seconds": round(self.interval, 2),
+            "rounds": self.rounds,
+            "checks": self.checks,
+            "errors": self.errors,
+            "confirmed": self.confirmed,
+        }
+
+
+def create_payment_monitor(resolve: Resolve, on_confirmed: OnConfirmed, statuses: Optional[PaymentStatusCache] = None) -> PaymentMonitor:
+    return PaymentMonitor(
+        resolve,
+        on_confirmed,
+        statuses=statuses,
+        interval=env_float("PAYMENT_MONITOR_INTERVAL", 10),
+        max_interval=env_float("PAYMENT_MONITOR_MAX_INTERVAL", 60),
+        batch_size=env_int("PAYMENT_MONITOR_BATCH_SIZE", 20),
+    )
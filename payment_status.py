@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from config import env_float
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# What a lookup reports when Masumi could not tell: the job's payment state is
+# unchanged, so these are never stored as one
+UNRESOLVED_STATUSES = ("unknown", "error")
+
+
+class PaymentStatusCache:
+    """
+    Last known Masumi payment state per job, for /status.
+
+    The payment monitor records states as it sees them; `get` serves the
+    recorded value while it is younger than `ttl` seconds and otherwise
+    refreshes it. Concurrent callers for the same job share one in-flight
+    refresh, so a crowd of pollers costs a single upstream call. A failed
+    lookup (UNRESOLVED_STATUSES) is only reused for `failure_ttl` seconds and
+    never replaces the last real state.
+    """
+
+    def __init__(self, ttl: float = 10.0, failure_ttl: float = 1.0) -> None:
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self._entries: Dict[str, Tuple[str, float]] = {}
+        self._failures: Dict[str, Tuple[str, float]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.fetches = 0
+        self.coalesced = 0
+
+    def record(self, job_id: str, status: Optional[str]) -> None:
+        if status is None:
+            return
+        if status in UNRESOLVED_STATUSES:
+            self._failures[job_id] = (status, time.monotonic())
+            return
+        self._entries[job_id] = (status, time.monotonic())
+        self._failures.pop(job_id, None)
+
+    def peek(self, job_id: str) -> Optional[str]:
+        entry = self._entries.get(job_id)
+        return entry[0] if entry else None
+
+    def forget(self, job_id: str) -> None:
+        self._entries.pop(job_id, None)
+        self._failures.pop(job_id, None)
+
+    async def get(self, job_id: str, fetch: Callable[[], Awaitable[str]]) -> str:
+        """ Cached status if fresh, else the result of one shared `fetch()` """
+        now = time.monotonic()
+        for entries, ttl in ((self._entries, self.ttl), (self._failures, self.failure_ttl)):
+            entry = entries.get(job_id)
+            if entry and now - entry[1] < ttl:
+                self.hits += 1
+                return entry[0]
+        task = self._inflight.get(job_id)
+        if task is None:
+            self.fetches += 1
+            task = asyncio.ensure_future(self._refresh(job_id, fetch))
+            self._inflight[job_id] = task
+        else:
+            self.coalesced += 1
+        # Shielded so one disconnecting poller does not cancel the others' refresh
+        return await asyncio.shield(task)
+
+    async def _refresh(self, job_id: str, fetch: Callable[[], Awaitable[str]]) -> str:
+        try:
+            status = await fetch()
+            self.record(job_id, status)
+            return status
+        finally:
+            self._inflight.pop(job_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "jobs": len(self._entries),
+            "hits": self.hits,
+            "fetches": self.fetches,
+            "coalesced": self.coalesced,
+        }
+
+
+_cache: Optional[PaymentStatusCache] = None
+
+
+def get_payment_status_cache() -> PaymentStatusCache:
+    global _cache
+    if _cache is None:
+        _cache = PaymentStatusCache(
+            ttl=env_float("PAYMENT_STATUS_TTL_SECONDS", 10),
+            failure_ttl=env_float("PAYMENT_STATUS_FAILURE_TTL_SECONDS", 1),
+        )
+    return _cache
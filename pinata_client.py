@@ -1,41 +1,134 @@
 from __future__ import annotations
 
+import asyncio
 import os
-from typing import Dict, Any
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Set
+
 import httpx
 
+from config import env_float, env_int
+from http_pool import get_client, run_sync
+from logging_config import get_logger
+from metrics import UPLOAD_BYTES, UPLOAD_THROUGHPUT, UPSTREAM_ERRORS, UPSTREAM_RETRIES
+from progress import emit
+
+logger = get_logger(__name__)
+
+PublishCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
 
 class PinataError(RuntimeError):
     pass
 
 
+class _RetryableError(PinataError):
+    """ Rate limited or a server-side failure; worth another attempt """
+
+
 def _jwt() -> str | None:
     return os.getenv("PINATA_JWT")
 
 
+def _api_base() -> str:
+    return os.getenv("PINATA_API_URL", "https://api.pinata.cloud").rstrip("/")
+
+
 def _gateway_base() -> str:
     return os.getenv("PINATA_GATEWAY", "https://gateway.pinata.cloud/ipfs")
 
 
-def upload_file(path: str, name: str | None = None) -> Dict[str, Any]:
+class _ProgressReader:
+    """ File wrapper that reports upload progress as httpx reads the multipart body """
+
+    def __init__(self, f, size: int) -> None:
+        self._f = f
+        self._size = max(size, 1)
+        self._sent = 0
+        self._reported = -1
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._f.read(size)
+        self._sent += len(chunk)
+        # Every 5%, not every chunk
+        step = int(self._sent * 20 / self._size)
+        if step != self._reported:
+            self._reported = step
+            emit("upload", bytes=self._sent, total=self._size, progress=round(min(self._sent / self._size, 1.0), 4))
+        return chunk
+
+    def __getattr__(self, name: str):
+        return getattr(self._f, name)
+
+
+def _timeout() -> httpx.Timeout:
+    # Per socket operation, not per request: a slow but steady upload never
+    # trips the write timeout, and the read timeout covers Pinata hashing and
+    # pinning a large file before it answers
+    return httpx.Timeout(
+        connect=env_float("PINATA_CONNECT_TIMEOUT", 10),
+        write=env_float("PINATA_WRITE_TIMEOUT", 60),
+        read=env_float("PINATA_READ_TIMEOUT", 600),
+        pool=env_float("PINATA_CONNECT_TIMEOUT", 10),
+    )
+
+
+def background_upload_enabled() -> bool:
+    return os.getenv("PINATA_BACKGROUND_UPLOAD", "false").lower() in ("1", "true", "yes")
+
+
+async def _pin_file(url: str, headers: Dict[str, str], path: str, file_name: str) -> Dict[str, Any]:
+    """ One upload attempt; the body is streamed from disk in chunks by httpx """
+    with open(path, "rb") as f:
+        files = {
+            "file": (file_name, _ProgressReader(f, os.fstat(f.fileno()).st_size)),
+        }
+        resp = await get_client("pinata").post(url, headers=headers, files=files, timeout=_timeout())
+    if resp.status_code == 429 or resp.status_code >= 500:
+        raise _RetryableError(f"Pinata answered {resp.status_code}: {resp.text}")
+    if resp.status_code >= 400:
+        raise PinataError(resp.text)
+    return resp.json()
+
+
+async def upload_file_async(path: str, name: str | None = None) -> Dict[str, Any]:
     jwt = _jwt()
     if not jwt:
         raise PinataError("PINATA_JWT is not set")
 
-    url = "https://api.pinata.cloud/pinning/pinFileToIPFS"
+    url = f"{_api_base()}/pinning/pinFileToIPFS"
     headers = {"Authorization": f"Bearer {jwt}"}
 
     file_name = name or os.path.basename(path)
+    size = os.path.getsize(path)
+    retries = env_int("PINATA_UPLOAD_RETRIES", 3)
+    backoff = env_float("PINATA_RETRY_BACKOFF", 2)
 
-    with open(path, "rb") as f:
-        files = {
-            "file": (file_name, f),
-        }
-        with httpx.Client(timeout=120) as client:
-            resp = client.post(url, headers=headers, files=files)
-            if resp.status_code >= 400:
-                raise PinataError(resp.text)
-            data = resp.json()
+    for attempt in range(retries + 1):
+        started = time.perf_counter()
+        try:
+            data = await _pin_file(url, headers, path, file_name)
+            break
+        except (httpx.TransportError, _RetryableError) as e:
+            UPSTREAM_ERRORS.inc(upstream="pinata", endpoint="pinFileToIPFS")
+            if attempt >= retries:
+                raise PinataError(f"Upload of {file_name} failed after {attempt + 1} attempts: {str(e)}") from e
+            # Exponential backoff with jitter, so parallel jobs do not retry in lockstep
+            delay = backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+            UPSTREAM_RETRIES.inc(upstream="pinata", endpoint="pinFileToIPFS")
+            logger.warning(f"Upload of {file_name} failed ({str(e)}), retrying in {delay:.1f}s")
+            emit("upload", state="retrying", attempt=attempt + 1, error=str(e))
+            await asyncio.sleep(delay)
+        except PinataError:
+            UPSTREAM_ERRORS.inc(upstream="pinata", endpoint="pinFileToIPFS")
+            raise
+
+    elapsed = time.perf_counter() - started
+    throughput = size / elapsed if elapsed > 0 else 0.0
+    UPLOAD_BYTES.inc(size, upstream="pinata")
+    UPLOAD_THROUGHPUT.observe(throughput, upstream="pinata")
+    logger.info(f"Uploaded {file_name} ({size / 1e6:.1f} MB) in {elapsed:.1f}s, {throughput / 1e6:.2f} MB/s")
 
     ipfs_hash = data.get("IpfsHash")
     if not ipfs_hash:
@@ -47,3 +140,50 @@ def upload_file(path: str, name: str | None = None) -> Dict[str, Any]:
         "gatewayUrl": f"{_gateway_base()}/{ipfs_hash}",
         "pinata": data,
     }
+
+
+# Uploads started by publish_in_background that have not finished yet
+_background: Set[asyncio.Task] = set()
+
+
+async def publish_in_background(path: str, on_publish: PublishCallback, name: str | None = None) -> None:
+    """
+    Pin `path` without waiting for the upload. `on_publish` is awaited with
+    {"status": "pending"} before this returns, and later with the pinned CID
+    ({"status": "pinned", "ipfsHash", "ipfsUrl", "gatewayUrl"}) or the error
+    ({"status": "failed", "error"}).
+    """
+    async def publish() -> None:
+        try:
+            data = await upload_file_async(path, name=name)
+            result = {"status": "pinned", **{key: data[key] for key in ("ipfsHash", "ipfsUrl", "gatewayUrl")}}
+        except asyncio.CancelledError:
+            result = {"status": "failed", "error": "Upload interrupted by shutdown"}
+        except Exception as e:
+            logger.error(f"Background upload of {path} failed: {str(e)}", exc_info=True)
+            result = {"status": "failed", "error": str(e)}
+        try:
+            await on_publish(result)
+        except Exception as e:
+            logger.error(f"Recording the upload of {path} failed: {str(e)}", exc_info=True)
+
+    await on_publish({"status": "pending"})
+    task = asyncio.create_task(publish())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def drain_background_uploads(timeout: float) -> None:
+    """ Let in-flight background uploads finish, cancelling any still running after `timeout` """
+    tasks = list(_background)
+    if not tasks:
+        return
+    logger.info(f"Waiting up to {timeout:.0f}s for {len(tasks)} background upload(s)")
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+
+def upload_file(path: str, name: str | None = None) -> Dict[str, Any]:
+    return run_sync(upload_file_async(path, name=name))
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import shutil
+import uuid
+import weakref
+from contextlib import ExitStack
+from typing import Any, Dict, List, Optional
+
+from config import env_int
+from logging_config import get_logger
+from slide_generation import stream_slides_async as stream_slides
+from tts_generation import attach_streamed_slide_audio
+from audio_assets import media_dir, media_url, public_dir
+from video_generation import RenderCancelledError, VideoGenerationError, default_engine, render_video_async
+from pinata_client import PublishCallback, background_upload_enabled, publish_in_background, upload_file_async as pinata_upload
+from metrics import stage_timer
+from stage_pipeline import Stage, StageFn, StagePipeline
+from result_cache import ResultCache, get_result_cache, result_key
+
+logger = get_logger(__name__)
+
+# Generation parameters; together with the topic and video engine they key the result cache
+SLIDE_COUNT = 5
+SLIDE_STYLE = "Modern"
+LANGUAGE = "en-US"
+
+
+def _published_result(ipfs_url: str) -> str:
+    return (
+        f"Presentation Generated Successfully!\n"
+        f"IPFS Backup URL (Pinata): {ipfs_url}"
+    )
+
+
+async def compose_stage(job: Dict[str, Any]) -> Dict[str, Any]:
+    """ Slides and narration: each slide is voiced as soon as Podio streams it """
+    # Slides are streamed from Podio and each one is voiced as soon as it
+    # arrives (concurrently, cached, order preserved), overlapping the two
+    # stages. Audio is written to per-slide files that the renderer references
+    logger.info(f"Generating slides and audio for topic: {job['topic']}")
+    with ExitStack() as tts_stage:
+        async def slide_stream():
+            received = 0
+            with stage_timer("slides"):
+                async for slide in stream_slides(topic=job["topic"], count=SLIDE_COUNT, style=SLIDE_STYLE):
+                    if not received:
+                        # The tts stage runs from the first slide to the last audio file
+                        tts_stage.enter_context(stage_timer("tts"))
+                    received += 1
+                    yield slide
+
+        job["slides"] = await attach_streamed_slide_audio(slide_stream(), language=LANGUAGE, audio_dir=job["audio_dir"])
+    return job
+
+
+async def render_stage(job: Dict[str, Any]) -> Dict[str, Any]:
+    """ Render the video (VIDEO_ENGINE: remotion or ffmpeg) """
+    # The render blocks on subprocesses, so it runs in a worker thread that a
+    # cancelled job stops (the engines time their own stages)
+    logger.info("Rendering video locally...")
+    job["video_path"], _ = await render_video_async(
+        topic=job["topic"],
+        slides=job["slides"],
+        output_dir=public_dir(),
+        generate_audio=False,
+        project_id=job["project_id"],
+    )
+    shutil.rmtree(job["audio_dir"], ignore_errors=True)
+    return job
+
+
+async def publish_stage(job: Dict[str, Any]) -> Dict[str, Any]:
+    """ Upload the rendered video to IPFS via Pinata """
+    video_path = job["video_path"]
+    on_publish = job.get("on_publish")
+    if on_publish is not None and background_upload_enabled():
+        logger.info("Uploading rendered video to IPFS via Pinata in the background...")
+        await publish_in_background(video_path, on_publish)
+        job["result"] = (
+            f"Presentation Generated Successfully!\n"
+            f"Video URL: {media_url(video_path)}\n"
+            f"IPFS Backup URL (Pinata): pending"
+        )
+        return job
+
+    logger.info("Uploading rendered video to IPFS via Pinata...")
+    with stage_timer("upload"):
+        ipfs_data = await pinata_upload(video_path)
+    if ipfs_data.get("ipfsUrl"):
+        job["ipfs"] = {"status": "pinned", **{key: ipfs_data.get(key) for key in ("ipfsHash", "ipfsUrl", "gatewayUrl")}}
+    job["result"] = _published_result(ipfs_data.get("ipfsUrl", "Generation completed, but IPFS missing."))
+    return job
+
+
+def _stage(name: str, run: StageFn, workers: int, retries: int = 0, **options: Any) -> Stage:
+    """ A stage sized by PIPELINE_<NAME>_WORKERS / PIPELINE_<NAME>_RETRIES, else `workers` / `retries` """
+    prefix = f"PIPELINE_{name.upper()}"
+    return Stage(
+        name,
+        run,
+        workers=env_int(f"{prefix}_WORKERS", workers, minimum=1),
+        retries=env_int(f"{prefix}_RETRIES", retries, minimum=0),
+        **options,
+    )
+
+
+def _stages() -> List[Stage]:
+    return [
+        # Mostly waiting on Podio, so several jobs can compose at once
+        _stage("compose", compose_stage, workers=4),
+        # CPU bound; concurrent renders split the CPUs between them (render_settings)
+        _stage(
+            "render", render_stage, workers=2, retries=1,
+            retry_on=(VideoGenerationError,), no_retry=(RenderCancelledError,), backoff=2.0,
+        ),
+        _stage("publish", publish_stage, workers=2),
+    ]
+
+
+def pipeline_capacity() -> int:
+    """ Jobs the stage pipeline keeps busy at once: the workers of every stage """
+    return sum(stage.workers for stage in _stages())
+
+
+# Workers and queues belong to an event loop, so each loop gets its own pipeline
+_pipelines: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, StagePipeline]" = weakref.WeakKeyDictionary()
+
+
+def get_pipeline() -> StagePipeline:
+    """ The stage pipeline of the running event loop """
+    loop = asyncio.get_running_loop()
+    stage_pipeline = _pipelines.get(loop)
+    if stage_pipeline is None:
+        stage_pipeline = _pipelines[loop] = StagePipeline(_stages(), queue_size=env_int("PIPELINE_QUEUE_SIZE", 4, minimum=1))
+    return stage_pipeline
+
+
+def pipeline_stats() -> Optional[Dict[str, Dict[str, int]]]:
+    try:
+        stage_pipeline = _pipelines.get(asyncio.get_running_loop())
+    except RuntimeError:
+        return None
+    return stage_pipeline.stats() if stage_pipeline else None
+
+
+async def shutdown_pipeline() -> None:
+    """ Stop the running loop's stage workers, cancelling jobs still in them """
+    stage_pipeline = _pipelines.pop(asyncio.get_running_loop(), None)
+    if stage_pipeline:
+        await stage_pipeline.stop()
+
+
+async def _generate(topic: str, on_publish: Optional[PublishCallback]) -> Dict[str, Any]:
+    project_id = str(uuid.uuid4())
+    audio_dir = os.path.join(media_dir(), f"{project_id}_assets")
+    job = {
+        "topic": topic,
+        "project_id": project_id,
+        "audio_dir": audio_dir,
+        "on_publish": on_publish,
+    }
+    try:
+        return await get_pipeline().run(job)
+    finally:
+        shutil.rmtree(audio_dir, ignore_errors=True)
+
+
+async def _generate_cached(cache: ResultCache, key: str, topic: str, publish: Optional[PublishCallback]) -> str:
+    """ Generate and store the result once its video is pinned """
+    async def record_publish(ipfs: Dict[str, Any]) -> None:
+        # Background uploads pin after the job result was returned
+        if ipfs.get("status") == "pinned":
+            cache.put(key, _published_result(ipfs["ipfsUrl"]), ipfs)
+        await publish(ipfs)
+
+    job = await _generate(topic, record_publish if publish is not None else None)
+    if job.get("ipfs"):
+        cache.put(key, job["result"], job["ipfs"])
+    return job["result"]
+
+
+async def execute_crew_task(input_data: str, on_publish: Optional[PublishCallback] = None) -> str:
+    """
+    Execute the multimedia generation pipeline (Slides, Audio, Video, IPFS) without CrewAI.
+
+    The job runs through the compose, render and publish stages of the
+    loop's stage pipeline, so concurrent jobs overlap (one rendering while
+    another uploads) instead of each running start to finish on its own.
+    With RESULT_CACHE_ENABLED, a topic that was already published returns
+    its IPFS result straight away and identical concurrent jobs run once.
+
+    With PINATA_BACKGROUND_UPLOAD enabled and an `on_publish` callback, the
+    result points at the local video as soon as it is rendered and the IPFS
+    pin is reported to `on_publish` when it lands.
+    """
+    logger.info(f"Starting execution with input: {input_data}")
+    topic = input_data.strip()
+
+    try:
+        cache = get_result_cache()
+        if cache is None:
+            result = (await _generate(topic, on_publish))["result"]
+        else:
+            key = result_key(topic, count=SLIDE_COUNT, style=SLIDE_STYLE, language=LANGUAGE, engine=default_engine())
+            result = await cache.run(key, lambda publish: _generate_cached(cache, key, topic, publish), on_publish)
+        logger.info("Multimedia pipeline completed.")
+        return result
+
+    except Exception as e:
+        logger.error(f"Error during multimedia generation: {str(e)}", exc_info=True)
+        return f"Error generating video presentation: {str(e)}"
@@ -1,39 +1,335 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import os
-from typing import Any, Dict
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
 import httpx
 
+from http_pool import get_client, run_sync
+from config import env_float, env_int
+from logging_config import get_logger
+from metrics import UPSTREAM_ERRORS, UPSTREAM_HEDGES, UPSTREAM_RETRIES
+from resilience import CircuitBreaker, LatencyWindow
+
+logger = get_logger(__name__)
+
 
 class PodioAIError(RuntimeError):
     pass
 
 
+class PodioUnavailableError(PodioAIError):
+    """ The circuit breaker is open: Podio AI failed repeatedly and is not being called """
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"Podio AI is unavailable, retrying in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class _ServerError(PodioAIError):
+    """ Podio AI or the network failed (as opposed to rejecting the request) """
+
+
+class _TransientError(_ServerError):
+    """ A failure the same request may not hit again: connection trouble, 429, 502-504 """
+
+
+_RETRY_STATUSES = {429, 502, 503, 504}
+# Whitespace and commas between elements of a streamed JSON array
+_ELEMENT_GAP = re.compile(r"[\s,]*")
+# Per-endpoint request timeouts (env var, default seconds); slide generation waits on an LLM
+_TIMEOUTS = {
+    "/api/slides/generate": ("PODIO_SLIDES_TIMEOUT", 60),
+    "/api/slides/update": ("PODIO_UPDATE_TIMEOUT", 45),
+    "/api/podcast/tts": ("PODIO_TTS_TIMEOUT", 45),
+}
+# Endpoints where a slow call is raced by a second one (PODIO_HEDGE_TTS)
+_HEDGED = {"/api/podcast/tts": "PODIO_HEDGE_TTS"}
+
+
 def _base_url() -> str:
     return os.getenv("PODIO_AI_BASE_URL", "http://localhost:3002").rstrip("/")
 
 
-def _post(path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+def _timeout(path: str) -> httpx.Timeout:
+    name, default = _TIMEOUTS.get(path, ("PODIO_TIMEOUT", 90))
+    return httpx.Timeout(env_float(name, default), connect=env_float("PODIO_CONNECT_TIMEOUT", 5))
+
+
+def _hedging(path: str) -> bool:
+    name = _HEDGED.get(path)
+    return bool(name) and os.getenv(name, "false").lower() in ("1", "true", "yes")
+
+
+_breaker: Optional[CircuitBreaker] = None
+_latencies: Dict[str, LatencyWindow] = {}
+
+
+def circuit_breaker() -> CircuitBreaker:
+    global _breaker
+    if _breaker is None:
+        _breaker = CircuitBreaker(
+            "podio",
+            failure_threshold=env_int("PODIO_BREAKER_FAILURES", 5),
+            reset_seconds=env_float("PODIO_BREAKER_RESET_SECONDS", 30),
+        )
+    return _breaker
+
+
+def _latency(path: str) -> LatencyWindow:
+    if path not in _latencies:
+        _latencies[path] = LatencyWindow()
+    return _latencies[path]
+
+
+def _status_error(status_code: int, text: str) -> Optional[PodioAIError]:
+    message = f"Podio AI request failed: {status_code} {text[:200]}"
+    if status_code in _RETRY_STATUSES:
+        return _TransientError(message)
+    if status_code >= 500:
+        return _ServerError(message)
+    if status_code >= 400:
+        return PodioAIError(message)
+    return None
+
+
+async def _attempt(url: str, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        resp = await get_client("podio").post(url, json=payload, timeout=_timeout(path))
+    except httpx.TransportError as exc:
+        raise _TransientError(f"Podio AI request failed: {exc!r}") from exc
+    error = _status_error(resp.status_code, resp.text)
+    if error:
+        raise error
+    try:
+        data = resp.json()
+    except ValueError as exc:
+        raise _ServerError(f"Podio AI returned invalid JSON: {exc}") from exc
+    _latency(path).add(time.perf_counter() - start)
+    return data
+
+
+async def _hedged_attempt(url: str, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """ Start a second identical call once the first runs past the endpoint's p95; first success wins """
+    deadline = _latency(path).percentile(95)
+    first = asyncio.ensure_future(_attempt(url, path, payload))
+    if deadline is None:
+        return await first
+    done, _ = await asyncio.wait({first}, timeout=max(deadline, env_float("PODIO_HEDGE_MIN_SECONDS", 0.5)))
+    if done:
+        return first.result()
+
+    UPSTREAM_HEDGES.inc(upstream="podio", endpoint=path)
+    calls = {first, asyncio.ensure_future(_attempt(url, path, payload))}
+    try:
+        error: Optional[BaseException] = None
+        for finished in asyncio.as_completed(calls):
+            try:
+                return await finished
+            except PodioAIError as exc:
+                error = exc
+        raise error
+    finally:
+        for call in calls:
+            call.cancel()
+
+
+async def _retry_or_raise(exc: PodioAIError, path: str, attempt: int, retries: int) -> None:
+    """ Account for a failed attempt, then sleep before the next one or re-raise `exc` """
+    breaker = circuit_breaker()
+    UPSTREAM_ERRORS.inc(upstream="podio", endpoint=path)
+    if not isinstance(exc, _ServerError):
+        # Podio answered and rejected the request: it is up, and a retry would fail the same way
+        breaker.record_success()
+        raise exc
+    breaker.record_failure()
+    if not isinstance(exc, _TransientError) or attempt >= retries:
+        raise exc
+    # Full jitter, so concurrent TTS calls do not retry in lockstep
+    delay = random.uniform(0, env_float("PODIO_RETRY_BACKOFF", 0.5) * (2 ** attempt))
+    UPSTREAM_RETRIES.inc(upstream="podio", endpoint=path)
+    logger.warning(f"{str(exc)}; retrying {path} in {delay:.2f}s")
+    await asyncio.sleep(delay)
+
+
+def _check_circuit(path: str) -> None:
+    breaker = circuit_breaker()
+    if not breaker.allow():
+        UPSTREAM_ERRORS.inc(upstream="podio", endpoint=path)
+        raise PodioUnavailableError(breaker.retry_after())
+
+
+async def _post_async(path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    POST to Podio AI with per-endpoint timeouts, retries with jittered
+    backoff on transient failures and a shared circuit breaker.
+    """
     url = f"{_base_url()}{path}"
+    retries = env_int("PODIO_RETRIES", 2)
+    call = _hedged_attempt if _hedging(path) else _attempt
+
+    for attempt in range(retries + 1):
+        _check_circuit(path)
+        try:
+            data = await call(url, path, payload)
+        except PodioAIError as exc:
+            await _retry_or_raise(exc, path, attempt, retries)
+            continue
+        circuit_breaker().record_success()
+        return data
+
+
+class _SlideStreamParser:
+    """
+    Slides out of a response body as it arrives.
+
+    NDJSON (one slide per line) and SSE (one slide per `data:` field) bodies
+    are split on their delimiters. A plain JSON body (`{"slides": [...]}` or
+    a bare list) is parsed incrementally: each element of the slides array is
+    returned as soon as its closing brace has been received.
+    """
+
+    def __init__(self, content_type: str) -> None:
+        content_type = content_type.split(";")[0].strip().lower()
+        self.mode = {"application/x-ndjson": "ndjson", "application/jsonl": "ndjson", "text/event-stream": "sse"}.get(content_type, "json")
+        self._buffer = ""
+        self._pos: Optional[int] = None  # JSON mode: next element of the slides array
+        self._array_done = False
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        self._buffer += text
+        if self.mode == "json":
+            return self._json_elements()
+        separator = "\n\n" if self.mode == "sse" else "\n"
+        *records, self._buffer = self._buffer.replace("\r\n", "\n").split(separator)
+        return [slide for record in records for slide in self._record(record)]
+
+    def close(self) -> List[Dict[str, Any]]:
+        if self.mode != "json":
+            return self._record(self._buffer)
+        if self._pos is None:
+            # Not a slides array after all: parse the whole body the plain way
+            return _slides_in(json.loads(self._buffer)) if self._buffer.strip() else []
+        if not self._array_done:
+            raise _ServerError("Podio AI response ended in the middle of the slides")
+        return []
+
+    def _record(self, record: str) -> List[Dict[str, Any]]:
+        if self.mode == "sse":
+            record = "\n".join(line[5:].lstrip() for line in record.split("\n") if line.startswith("data:"))
+        record = record.strip()
+        if not record or record == "[DONE]":
+            return []
+        return _slides_in(json.loads(record))
+
+    def _json_elements(self) -> List[Dict[str, Any]]:
+        if self._pos is None:
+            match = re.match(r'\s*\[', self._buffer) or re.search(r'"slides"\s*:\s*\[', self._buffer)
+            if not match:
+                return []
+            self._pos = match.end()
+        slides: List[Dict[str, Any]] = []
+        while not self._array_done:
+            pos = _ELEMENT_GAP.match(self._buffer, self._pos).end()
+            if pos >= len(self._buffer):
+                break
+            if self._buffer[pos] == "]":
+                self._array_done = True
+                break
+            try:
+                element, self._pos = self._decoder.raw_decode(self._buffer, pos)
+            except json.JSONDecodeError:
+                # The element is still arriving
+                break
+            slides.extend(_slides_in(element))
+        return slides
+
+
+def _slides_in(data: Any) -> List[Dict[str, Any]]:
+    """ Slide dicts in one decoded record: a slide, {"slide": ...}, {"slides": [...]} or a list """
+    if isinstance(data, list):
+        return [slide for item in data for slide in _slides_in(item)]
+    if not isinstance(data, dict):
+        return []
+    if isinstance(data.get("slides"), list):
+        return _slides_in(data["slides"])
+    if isinstance(data.get("slide"), dict):
+        return [data["slide"]]
+    return [data] if data else []
+
+
+async def _stream_attempt(url: str, path: str, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    headers = {"Accept": "application/x-ndjson, text/event-stream;q=0.9, application/json;q=0.8"}
     try:
-        with httpx.Client(timeout=90) as client:
-            resp = client.post(url, json=payload)
-            resp.raise_for_status()
-            return resp.json()
-    except Exception as exc:
-        raise PodioAIError(f"Podio AI request failed: {exc}") from exc
+        async with get_client("podio").stream("POST", url, json=payload, headers=headers, timeout=_timeout(path)) as resp:
+            if resp.status_code >= 400:
+                raise _status_error(resp.status_code, (await resp.aread()).decode("utf-8", "replace"))
+            parser = _SlideStreamParser(resp.headers.get("content-type", ""))
+            async for text in resp.aiter_text():
+                for slide in parser.feed(text):
+                    yield slide
+            for slide in parser.close():
+                yield slide
+    except httpx.TransportError as exc:
+        raise _TransientError(f"Podio AI request failed: {exc!r}") from exc
+    except ValueError as exc:
+        raise _ServerError(f"Podio AI returned invalid JSON: {exc}") from exc
 
 
-def generate_slides(topic: str, count: int = 5, style: str = "Modern") -> Dict[str, Any]:
-    return _post("/api/slides/generate", {
+async def _stream_slides(path: str, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Slides from Podio AI one by one as they are generated. Failures before
+    the first slide are retried like `_post_async`; later ones are raised,
+    since a retry would repeat slides the caller already has.
+    """
+    url = f"{_base_url()}{path}"
+    retries = env_int("PODIO_RETRIES", 2)
+
+    for attempt in range(retries + 1):
+        _check_circuit(path)
+        received = 0
+        try:
+            async for slide in _stream_attempt(url, path, payload):
+                received += 1
+                yield slide
+        except PodioAIError as exc:
+            if received:
+                UPSTREAM_ERRORS.inc(upstream="podio", endpoint=path)
+                circuit_breaker().record_failure()
+                raise
+            await _retry_or_raise(exc, path, attempt, retries)
+            continue
+        circuit_breaker().record_success()
+        return
+
+
+async def generate_slides_async(topic: str, count: int = 5, style: str = "Modern") -> Dict[str, Any]:
+    return await _post_async("/api/slides/generate", {
         "topic": topic,
         "count": count,
         "style": style,
     })
 
 
-def update_slide(topic: str, instruction: str, current_slide: Dict[str, Any], style: str = "Modern") -> Dict[str, Any]:
-    return _post("/api/slides/update", {
+async def stream_slides_async(topic: str, count: int = 5, style: str = "Modern") -> AsyncIterator[Dict[str, Any]]:
+    """ Like generate_slides_async, but yields each slide as soon as Podio AI has produced it """
+    async for slide in _stream_slides("/api/slides/generate", {
+        "topic": topic,
+        "count": count,
+        "style": style,
+    }):
+        yield slide
+
+
+async def update_slide_async(topic: str, instruction: str, current_slide: Dict[str, Any], style: str = "Modern") -> Dict[str, Any]:
+    return await _post_async("/api/slides/update", {
         "topic": topic,
         "instruction": instruction,
         "currentSlide": current_slide,
@@ -41,8 +337,39 @@ def update_slide(topic: str, instruction: str, current_slide: Dict[str, Any], st
     })
 
 
-def generate_tts(script: list[dict], language: str = "en-US") -> Dict[str, Any]:
-    return _post("/api/podcast/tts", {
+async def generate_tts_async(
+    script: list[dict],
+    language: str = "en-US",
+    provider: str | None = None,
+    voice: str | None = None,
+    voice_map: Dict[str, str] | None = None,
+) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {
         "script": script,
         "language": language,
-    })
+    }
+    if provider:
+        payload["provider"] = provider
+    if voice:
+        payload["voice"] = voice
+    if voice_map:
+        payload["voiceMap"] = voice_map
+    return await _post_async("/api/podcast/tts", payload)
+
+
+def generate_slides(topic: str, count: int = 5, style: str = "Modern") -> Dict[str, Any]:
+    return run_sync(generate_slides_async(topic, count=count, style=style))
+
+
+def update_slide(topic: str, instruction: str, current_slide: Dict[str, Any], style: str = "Modern") -> Dict[str, Any]:
+    return run_sync(update_slide_async(topic, instruction, current_slide, style=style))
+
+
+def generate_tts(
+    script: list[dict],
+    language: str = "en-US",
+    provider: str | None = None,
+    voice: str | None = None,
+    voice_map: Dict[str, str] | None = None,
+) -> Dict[str, Any]:
+    return run_sync(generate_tts_async(script, language=language, provider=provider, voice=voice, voice_map=voice_map))
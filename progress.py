@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+Sink = Callable[[Dict[str, Any]], None]
+
+
+class ProgressHub:
+    """
+    Per-job progress events for the push endpoints.
+
+    Each job keeps a bounded history (so late subscribers and reconnects with
+    Last-Event-ID catch up) and a set of live subscribers. `publish` is safe
+    to call from any thread; events are handed to each subscriber's loop.
+
+    Event ids are "<epoch>-<seq>". The epoch is new in every process, so ids
+    handed out before a restart are recognised and not mistaken for
+    positions in the new sequence.
+    """
+
+    def __init__(self, history: int = 200, max_jobs: int = 1000) -> None:
+        self.history = history
+        self.max_jobs = max_jobs
+        self.epoch = uuid.uuid4().hex[:8]
+        self._jobs: OrderedDict[str, Tuple[Deque[Tuple[int, Dict[str, Any]]], int]] = OrderedDict()
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, job_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            events, seq = self._jobs.pop(job_id, (deque(maxlen=self.history), 0))
+            event = {**event, "id": f"{self.epoch}-{seq + 1}"}
+            event.setdefault("ts", time.time())
+            events.append((seq + 1, event))
+            self._jobs[job_id] = (events, seq + 1)
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+            subscribers = list(self._subscribers.get(job_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # The subscriber's loop is gone; it unsubscribes on its own
+                pass
+        return event
+
+    def resume_after(self, job_id: str, last_event_id: Optional[str]) -> int:
+        """
+        Sequence number to resume `job_id` after. 0 (start over with a
+        snapshot) for missing ids, ids from another process and ids past the
+        job's last event, which would otherwise skip everything still to come.
+        """
+        epoch, _, seq = (last_event_id or "").partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return 0
+        with self._lock:
+            latest = self._jobs.get(job_id, ((), 0))[1]
+        return int(seq) if int(seq) <= latest else 0
+
+    @contextmanager
+    def subscribe(self, job_id: str, after: int = 0) -> Iterator["Subscription"]:
+        """ Events after `after` (history first, then live) for as long as the block runs """
+        subscription = Subscription()
+        entry = (asyncio.get_running_loop(), subscription.queue)
+        with self._lock:
+            # Registered under the same lock as the history read, so no event is missed or repeated
+            self._subscribers.setdefault(job_id, []).append(entry)
+            subscription.backlog = [event for seq, event in self._jobs.get(job_id, ((), 0))[0] if seq > after]
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(job_id, [])
+                if entry in subscribers:
+                    subscribers.remove(entry)
+                if not subscribers:
+                    self._subscribers.pop(job_id, None)
+
+
+class Subscription:
+    def __init__(self) -> None:
+        self.backlog: List[Dict[str, Any]] = []
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """ Next event, or None if nothing arrives within `timeout` """
+        if self.backlog:
+            return self.backlog.pop(0)
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+_hub: Optional[ProgressHub] = None
+_hub_lock = threading.Lock()
+
+
+def get_progress_hub() -> ProgressHub:
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = ProgressHub(history=int(os.getenv("PROGRESS_HISTORY", 200)))
+        return _hub
+
+
+_current_sink: contextvars.ContextVar[Optional[Sink]] = contextvars.ContextVar("progress_sink", default=None)
+
+
+@contextmanager
+def job_progress(job_id: str, sink: Optional[Sink] = None) -> Iterator[None]:
+    """
+    Route `emit` calls made inside the block (including child tasks and
+    asyncio.to_thread calls) to `sink`, or to the hub under `job_id`.
+    """
+    token = _current_sink.set(sink or (lambda event: get_progress_hub().publish(job_id, event)))
+    try:
+        yield
+    finally:
+        _current_sink.reset(token)
+
+
+def emit(event: str, **data: Any) -> None:
+    """ Report progress for the job running in this context; a no-op outside one """
+    sink = _current_sink.get()
+    if sink is None:
+        return
+    try:
+        sink({"event": event, "ts": time.time(), **data})
+    except Exception as e:
+        logger.warning(f"Dropping progress event {event}: {str(e)}")
+
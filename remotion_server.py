@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import json
+import os
+import socket
+import subprocess
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+
+from config import env_float
+from logging_config import get_logger
+from render_settings import render_workers
+
+logger = get_logger(__name__)
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "remotion_server", "server.mjs")
+_FINISHED = ("done", "failed", "cancelled")
+
+
+class RemotionServerError(RuntimeError):
+    pass
+
+
+class RenderCancelled(RemotionServerError):
+    pass
+
+
+def podio_dir() -> str:
+    """ Checkout of podio-ai that holds the Remotion composition and its node_modules """
+    return os.path.abspath(os.getenv("PODIO_AI_DIR", os.path.join(os.getcwd(), "../podio-ai")))
+
+
+def server_enabled() -> bool:
+    return os.getenv("REMOTION_SERVER", "true").lower() not in ("0", "false", "no")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class RemotionServer:
+    """
+    Client for the render sidecar in remotion_server/server.mjs.
+
+    With REMOTION_SERVER_URL set it talks to an already running sidecar;
+    otherwise it starts one as a child process on first use and keeps it
+    (with its bundle and browser) for the life of this process.
+    """
+
+    def __init__(self, url: Optional[str] = None) -> None:
+        self._external = url or os.getenv("REMOTION_SERVER_URL") or None
+        self._url: Optional[str] = None
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self._failed_at: Optional[float] = None
+        self._error: Optional[str] = None
+        self._client = httpx.Client(timeout=httpx.Timeout(30.0, read=None))
+
+    @property
+    def url(self) -> Optional[str]:
+        return self._url
+
+    def _spawn(self) -> str:
+        if not os.path.isdir(podio_dir()):
+            raise RemotionServerError(f"podio-ai checkout not found at {podio_dir()}; set PODIO_AI_DIR")
+        port = _free_port()
+        env = {**os.environ, "PODIO_DIR": podio_dir(), "REMOTION_SERVER_PORT": str(port)}
+        # As many sidecar jobs as renders the pipeline runs at once, each with
+        # its auto_concurrency share of the CPUs, instead of queueing them
+        env["REMOTION_SERVER_JOBS"] = os.getenv("REMOTION_SERVER_JOBS") or str(render_workers())
+        try:
+            self._process = subprocess.Popen([os.getenv("NODE_BINARY", "node"), SERVER_SCRIPT], cwd=podio_dir(), env=env)
+        except FileNotFoundError as e:
+            raise RemotionServerError("node not found; install Node.js or set NODE_BINARY") from e
+        logger.info(f"Started Remotion render server (pid {self._process.pid}) on port {port}")
+        return f"http://127.0.0.1:{port}"
+
+    def _wait_ready(self, url: str, timeout: float) -> None:
+        """ Bundling and opening the browser happen once, here """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._process is not None and self._process.poll() is not None:
+                raise RemotionServerError(f"Render server exited with code {self._process.returncode}")
+            try:
+                health = self._client.get(f"{url}/health").json()
+            except (httpx.HTTPError, ValueError):
+                health = {}
+            if health.get("error"):
+                raise RemotionServerError(f"Render server failed to start: {health['error']}")
+            if health.get("ready"):
+                return
+            time.sleep(0.25)
+        raise RemotionServerError(f"Render server not ready after {timeout:.0f}s")
+
+    def start(self) -> str:
+        """ Start (or reuse) the sidecar and block until it is ready; returns its URL """
+        with self._lock:
+            if self._url and (self._process is None or self._process.poll() is None):
+                return self._url
+            retry_after = env_float("REMOTION_SERVER_RETRY_SECONDS", 60)
+            if self._failed_at is not None and time.monotonic() - self._failed_at < retry_after:
+                raise RemotionServerError(self._error or "Render server unavailable")
+            self._stop_process()
+            try:
+                url = self._external or self._spawn()
+                self._wait_ready(url, env_float("REMOTION_SERVER_START_TIMEOUT", 300))
+            except RemotionServerError as e:
+                self._failed_at, self._error = time.monotonic(), str(e)
+                self._stop_process()
+                raise
+            self._url, self._failed_at, self._error = url, None, None
+            return url
+
+    def render(
+        self,
+        props: Dict[str, Any],
+        output: str,
+        options: Optional[Dict[str, Any]] = None,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> str:
+        """
+        Queue a render and follow its progress stream until it finishes.
+
+        `options` are encoder settings understood by server.mjs (concurrency,
+        codec, crf, fps, resolution); `on_progress` gets every state the sidecar reports; setting `cancel`
+        cancels the render on the sidecar and raises RenderCancelled.
+        """
+        url = self.start()
+        body: Dict[str, Any] = {**(options or {}), "props": props, "output": os.path.abspath(output)}
+        try:
+            response = self._client.post(f"{url}/renders", json=body)
+            response.raise_for_status()
+            render_id = response.json()["id"]
+            state: Dict[str, Any] = {}
+            finished = threading.Event()
+            if cancel is not None:
+                threading.Thread(
+                    target=self._cancel_on, args=(cancel, finished, f"{url}/renders/{render_id}"), daemon=True,
+                ).start()
+            try:
+                with self._client.stream("GET", f"{url}/renders/{render_id}/events") as events:
+                    # The sidecar ends the stream with a "cancelled" state once the watcher deletes the render
+                    for line in events.iter_lines():
+                        if not line.strip():
+                            continue
+                        state = json.loads(line)
+                        if on_progress:
+                            on_progress(state)
+                        if state.get("status") in _FINISHED:
+                            break
+            finally:
+                finished.set()
+        except httpx.HTTPError as e:
+            raise RemotionServerError(f"Render server request failed: {str(e)}") from e
+
+        if state.get("status") == "cancelled":
+            raise RenderCancelled(f"Render {render_id} cancelled")
+        if state.get("status") != "done":
+            raise RemotionServerError(f"Render failed: {state.get('error') or 'stream ended early'}")
+        return state.get("output") or output
+
+    def _cancel_on(self, cancel: threading.Event, finished: threading.Event, render_url: str) -> None:
+        """ Delete the render as soon as `cancel` is set, whether or not the sidecar is sending progress """
+        while not finished.is_set():
+            if cancel.wait(0.25):
+                try:
+                    self._client.delete(render_url)
+                except httpx.HTTPError as e:
+                    logger.warning(f"Cancelling render {render_url} failed: {str(e)}")
+                return
+
+    def _stop_process(self) -> None:
+        process, self._process = self._process, None
+        if process is None or process.poll() is not None:
+            return
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    def close(self) -> None:
+        with self._lock:
+            self._stop_process()
+            self._url = None
+        self._client.close()
+
+
+_server: Optional[RemotionServer] = None
+_server_lock = threading.Lock()
+
+
+def get_render_server() -> RemotionServer:
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = RemotionServer()
+        return _server
+
+
+def warm_render_server() -> None:
+    """ Bundle and open the browser at startup rather than on the first job (REMOTION_SERVER_PRELOAD) """
+    if not server_enabled() or os.getenv("REMOTION_SERVER_PRELOAD", "false").lower() not in ("1", "true", "yes"):
+        return
+    try:
+        get_render_server().start()
+    except RemotionServerError as e:
+        logger.warning(f"Remotion render server not started: {str(e)}")
+
+
+def shutdown_render_server() -> None:
+    global _server
+    with _server_lock:
+        server, _server = _server, None
+    if server is not None:
+        server.close()
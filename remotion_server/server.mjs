@@ -0,0 +1,244 @@
+// Long-lived Remotion render sidecar.
+//
+// Bundles the podio-ai composition once, keeps one browser open and renders
+// queued jobs against them. remotion_server.py starts it on demand and talks
+// to it over HTTP on 127.0.0.1:
+//
+//   GET    /health               -> {ready, error, queued, running}
+//   POST   /renders              -> {id}   body: {props, output, concurrency?, codec?, crf?, fps?, resolution?}
+//   GET    /renders/:id          -> job state
+//   GET    /renders/:id/events   -> NDJSON stream of job states until it finishes
+//   DELETE /renders/:id          -> cancel a queued or running job
+//
+// The Remotion packages are resolved from PODIO_DIR's node_modules, so this
+// file needs no install of its own.
+import http from "node:http";
+import path from "node:path";
+import { randomUUID } from "node:crypto";
+import { createRequire } from "node:module";
+
+const podioDir = path.resolve(process.env.PODIO_DIR || process.cwd());
+const entryPoint = path.resolve(podioDir, process.env.REMOTION_ENTRY || "app/remotion/index.ts");
+const compositionId = process.env.REMOTION_COMPOSITION || "SlideVideo";
+const port = Number(process.env.REMOTION_SERVER_PORT || 3100);
+// remotion_server.py sets this to the render stage worker count (PIPELINE_RENDER_WORKERS)
+const maxJobs = Math.max(1, Number(process.env.REMOTION_SERVER_JOBS || 1));
+const defaultConcurrency = Number(process.env.REMOTION_CONCURRENCY || 2);
+const gl = process.env.REMOTION_GL || "swiftshader";
+// Finished jobs stay queryable for this long
+const keepFinishedMs = 10 * 60 * 1000;
+
+const require = createRequire(path.join(podioDir, "package.json"));
+const { bundle } = require("@remotion/bundler");
+const { openBrowser, selectComposition, renderMedia, makeCancelSignal } = require("@remotion/renderer");
+
+const chromiumOptions = { gl };
+const state = { ready: false, error: null, serveUrl: null, browser: null };
+const jobs = new Map();
+const queue = [];
+let running = 0;
+
+function log(message) {
+  console.log(`[remotion-server] ${message}`);
+}
+
+function publicJob(job) {
+  const { id, status, progress, renderedFrames, encodedFrames, stage, output, error } = job;
+  return { id, status, progress, renderedFrames, encodedFrames, stage, output, error };
+}
+
+function update(job, changes) {
+  Object.assign(job, changes);
+  const event = JSON.stringify(publicJob(job)) + "\n";
+  for (const res of job.listeners) res.write(event);
+  if (["done", "failed", "cancelled"].includes(job.status)) {
+    for (const res of job.listeners) res.end();
+    job.listeners.clear();
+    setTimeout(() => jobs.delete(job.id), keepFinishedMs).unref();
+  }
+}
+
+async function getBrowser() {
+  if (!state.browser) {
+    state.browser = await openBrowser("chrome", { chromiumOptions });
+    state.browser.on?.("disconnected", () => {
+      log("browser disconnected; it will be reopened for the next job");
+      state.browser = null;
+    });
+  }
+  return state.browser;
+}
+
+async function warmUp() {
+  const started = Date.now();
+  state.serveUrl = await bundle({ entryPoint });
+  log(`bundled ${entryPoint} in ${Date.now() - started} ms`);
+  await getBrowser();
+  state.ready = true;
+  log(`ready after ${Date.now() - started} ms`);
+  pump();
+}
+
+async function run(job) {
+  update(job, { status: "rendering" });
+  try {
+    const puppeteerInstance = await getBrowser();
+    const inputProps = job.props;
+    let composition = await selectComposition({
+      serveUrl: state.serveUrl,
+      id: compositionId,
+      inputProps,
+      puppeteerInstance,
+      chromiumOptions,
+    });
+    if (job.fps && job.fps !== composition.fps) {
+      // Same running time at the requested frame rate
+      const durationInFrames = Math.max(1, Math.round((composition.durationInFrames * job.fps) / composition.fps));
+      composition = { ...composition, fps: job.fps, durationInFrames };
+    }
+    await renderMedia({
+      composition,
+      serveUrl: state.serveUrl,
+      codec: job.codec,
+      crf: job.crf ?? undefined,
+      // Rendering at a scale keeps the layout and only changes the pixel size
+      scale: job.resolution ? job.resolution / composition.height : 1,
+      outputLocation: job.output,
+      inputProps,
+      puppeteerInstance,
+      chromiumOptions,
+      concurrency: job.concurrency,
+      cancelSignal: job.cancel.cancelSignal,
+      onProgress: ({ progress, renderedFrames, encodedFrames, stitchStage }) => {
+        // Throttle to whole percents; the stream would otherwise carry every frame
+        if (Math.floor(progress * 100) !== Math.floor(job.progress * 100) || stitchStage !== job.stage) {
+          update(job, { progress, renderedFrames, encodedFrames, stage: stitchStage });
+        }
+      },
+    });
+    update(job, { status: "done", progress: 1 });
+  } catch (err) {
+    if (job.status === "cancelled") return;
+    update(job, { status: "failed", error: String(err && err.message ? err.message : err) });
+  }
+}
+
+function pump() {
+  while (state.ready && running < maxJobs && queue.length) {
+    const job = queue.shift();
+    if (job.status !== "queued") continue;
+    running += 1;
+    run(job).finally(() => {
+      running -= 1;
+      pump();
+    });
+  }
+}
+
+function send(res, status, payload) {
+  const data = JSON.stringify(payload);
+  res.writeHead(status, { "Content-Type": "application/json", "Content-Length": Buffer.byteLength(data) });
+  res.end(data);
+}
+
+function readJson(req) {
+  return new Promise((resolve, reject) => {
+    const chunks = [];
+    req.on("data", (chunk) => chunks.push(chunk));
+    req.on("end", () => {
+      try {
+        resolve(chunks.length ? JSON.parse(Buffer.concat(chunks).toString("utf8")) : {});
+      } catch (err) {
+        reject(err);
+      }
+    });
+    req.on("error", reject);
+  });
+}
+
+const server = http.createServer(async (req, res) => {
+  const [, resource, id, action] = req.url.split("?")[0].split("/");
+  try {
+    if (req.method === "GET" && resource === "health") {
+      return send(res, 200, { ready: state.ready, error: state.error, queued: queue.length, running });
+    }
+    if (resource !== "renders") return send(res, 404, { error: "not found" });
+
+    if (req.method === "POST" && !id) {
+      const body = await readJson(req);
+      if (!body.output || typeof body.props !== "object") {
+        return send(res, 400, { error: "props and output are required" });
+      }
+      const job = {
+        id: randomUUID(),
+        status: "queued",
+        progress: 0,
+        renderedFrames: 0,
+        encodedFrames: 0,
+        stage: null,
+        output: path.resolve(body.output),
+        error: null,
+        props: body.props,
+        concurrency: body.concurrency || defaultConcurrency,
+        codec: body.codec || "h264",
+        crf: body.crf ?? null,
+        fps: body.fps || null,
+        resolution: body.resolution || null,
+        cancel: makeCancelSignal(),
+        listeners: new Set(),
+      };
+      jobs.set(job.id, job);
+      queue.push(job);
+      pump();
+      return send(res, 202, publicJob(job));
+    }
+
+    const job = jobs.get(id);
+    if (!job) return send(res, 404, { error: "unknown render" });
+
+    if (req.method === "GET" && action === "events") {
+      res.writeHead(200, { "Content-Type": "application/x-ndjson", "Cache-Control": "no-cache" });
+      res.write(JSON.stringify(publicJob(job)) + "\n");
+      if (["done", "failed", "cancelled"].includes(job.status)) return res.end();
+      job.listeners.add(res);
+      // Keep-alive lines let the client notice cancellation between progress events
+      const heartbeat = setInterval(() => res.write("\n"), 1000);
+      res.on("close", () => {
+        clearInterval(heartbeat);
+        job.listeners.delete(res);
+      });
+      return;
+    }
+    if (req.method === "GET" && !action) return send(res, 200, publicJob(job));
+    if (req.method === "DELETE" && !action) {
+      if (job.status === "queued" || job.status === "rendering") {
+        job.cancel.cancel();
+        update(job, { status: "cancelled" });
+      }
+      return send(res, 200, publicJob(job));
+    }
+    return send(res, 405, { error: "method not allowed" });
+  } catch (err) {
+    return send(res, 500, { error: String(err && err.message ? err.message : err) });
+  }
+});
+
+server.listen(port, "127.0.0.1", () => {
+  log(`listening on 127.0.0.1:${port}`);
+  warmUp().catch((err) => {
+    state.error = String(err && err.message ? err.message : err);
+    log(`warm-up failed: ${state.error}`);
+  });
+});
+
+async function shutdown() {
+  server.close();
+  for (const job of jobs.values()) {
+    if (job.status === "queued" || job.status === "rendering") job.cancel.cancel();
+  }
+  if (state.browser) await state.browser.close({ silent: true }).catch(() => {});
+  process.exit(0);
+}
+
+process.on("SIGTERM", shutdown);
+process.on("SIGINT", shutdown);
@@ -1,40 +1,142 @@
 import json
 import os
+import shutil
 import subprocess
+import time
+from contextlib import nullcontext
+from audio_assets import materialize_slide_audio, serve_directory
+from logging_config import get_logger
+from metrics import VIDEO_BYTES, stage_timer
+from remotion_server import RemotionServerError, RenderCancelled, get_render_server, podio_dir, server_enabled
+from render_settings import resolve_render_settings, slide_frames
 
-def render_remotion_video(slides_dict_list, project_id):
-    podio_dir = os.path.abspath(os.path.join(os.getcwd(), "../podio-ai"))
-    
-    # Calculate duration in frames
-    total_frames = sum([int(max(150, (slider.get('duration') or 5) * 30)) for slider in slides_dict_list])
-    if total_frames <= 0:
-        total_frames = 150
+logger = get_logger(__name__)
+
+
+def _server_options(settings):
+    options = {"concurrency": settings.concurrency, "codec": settings.codec, "fps": settings.fps}
+    if settings.crf is not None:
+        options["crf"] = settings.crf
+    if settings.resolution:
+        options["resolution"] = settings.resolution
+    return options
+
+
+def _render_with_server(props, output_mp4, settings, on_progress=None, cancel=None):
+    """ Render through the warm sidecar; False when it is unavailable and the CLI should be used """
+    if not server_enabled():
+        return False
+    try:
+        get_render_server().start()
+    except RemotionServerError as e:
+        logger.warning(f"Remotion render server unavailable, falling back to npx: {str(e)}")
+        return False
+    get_render_server().render(props, output_mp4, options=_server_options(settings), on_progress=on_progress, cancel=cancel)
+    return True
+
+
+def render_remotion_video(slides_dict_list, project_id, on_progress=None, cancel=None, settings=None, output_dir=None):
+    """
+    Render the podio-ai SlideVideo composition to <output_dir>/<project_id>.mp4
+    (output_dir defaults to MEDIA_DIR).
+
+    Uses the long-lived render server (REMOTION_SERVER, on by default), which
+    reports progress to `on_progress` and stops when `cancel` is set; falls
+    back to one `npx remotion render` per call when it cannot be started.
+    `settings` (render_settings.RenderSettings) defaults to host-derived ones.
+    """
+    settings = settings or resolve_render_settings("remotion")
+    fps = settings.fps
+
+    # Frames at the requested fps for each slide's (measured) duration
+    total_frames = sum(slide_frames(slide.get('duration'), fps) for slide in slides_dict_list) or slide_frames(None, fps)
         
-    props = json.dumps({"slides": slides_dict_list})
-    
-    output_dir = os.getenv("MEDIA_DIR", os.path.join(os.getcwd(), "outputs"))
+    work_dir = os.getenv("MEDIA_DIR", os.path.join(os.getcwd(), "outputs"))
+    output_dir = output_dir or work_dir
     os.makedirs(output_dir, exist_ok=True)
     
     output_mp4 = os.path.abspath(os.path.join(output_dir, f"{project_id}.mp4"))
+
+    # Audio goes to per-slide files served over localhost, so the props only
+    # carry short URLs instead of megabytes of base64. The directory is this
+    # render's own: the caller's audio files (often {project_id}_assets) are
+    # linked in, and must survive this render for a retry to have them
+    asset_dir = os.path.abspath(os.path.join(work_dir, f"{project_id}_render"))
+    audio_files = materialize_slide_audio(slides_dict_list, asset_dir)
     
     print(f"Running Remotion render... total frames: {total_frames}")
+    try:
+        with serve_directory(asset_dir) if any(audio_files) else nullcontext() as asset_base:
+            with stage_timer("props"):
+                props_slides = []
+                for slide, audio_file in zip(slides_dict_list, audio_files):
+                    slide = {k: v for k, v in slide.items() if k != "audioPath"}
+                    if audio_file:
+                        slide["audioUrl"] = f"{asset_base}/{audio_file}"
+                    elif (slide.get("audioUrl") or "").startswith("data:"):
+                        slide["audioUrl"] = None
+                    props_slides.append(slide)
+
+                props = {"slides": props_slides, "fps": fps}
+
+            with stage_timer("render", frames=total_frames, concurrency=settings.concurrency):
+                if not _render_with_server(props, output_mp4, settings, on_progress=on_progress, cancel=cancel):
+                    _render_with_cli(props, output_mp4, project_id, work_dir, settings, cancel=cancel)
+        if os.path.exists(output_mp4):
+            VIDEO_BYTES.inc(os.path.getsize(output_mp4))
+        return output_mp4
+    except subprocess.CalledProcessError as e:
+        print(f"Error rendering video: {e}")
+        raise e
+    finally:
+        shutil.rmtree(asset_dir, ignore_errors=True)
+
+
+def _render_with_cli(props, output_mp4, project_id, output_dir, settings, cancel=None):
+    """
+    One-off render: npx resolves, bundles and launches a browser every time.
+    The CLI cannot change the composition's fps or scale it to a height, so
+    those two settings only take effect through the render server. Setting
+    `cancel` terminates the npx process and raises RenderCancelled.
+    """
     # Write props to a file to avoid command-line length limits
     props_path = os.path.abspath(os.path.join(output_dir, f"{project_id}_props.json"))
     with open(props_path, "w") as f:
-        f.write(props)
-        
+        json.dump(props, f)
+
     cmd = [
         "npx", "remotion", "render", 
         "app/remotion/index.ts", "SlideVideo", 
         output_mp4,
         "--props", props_path,
-        "--concurrency", "2",
-        "--gl", "swiftshader"
+        "--concurrency", str(settings.concurrency),
+        "--gl", settings.gl or "swiftshader",
+        "--codec", settings.codec,
     ]
-    
+    if settings.crf is not None:
+        cmd += ["--crf", str(settings.crf)]
     try:
-        subprocess.run(cmd, cwd=podio_dir, check=True)
-        return output_mp4
-    except subprocess.CalledProcessError as e:
-        print(f"Error rendering video: {e}")
-        raise e
+        if cancel is None:
+            subprocess.run(cmd, cwd=podio_dir(), check=True)
+        else:
+            _run_cancellable(cmd, cancel)
+    finally:
+        os.remove(props_path)
+
+
+def _run_cancellable(cmd, cancel):
+    process = subprocess.Popen(cmd, cwd=podio_dir())
+    try:
+        while process.poll() is None:
+            if cancel.is_set():
+                raise RenderCancelled("npx remotion render cancelled")
+            time.sleep(0.5)
+    finally:
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, cmd)
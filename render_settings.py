@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import math
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from config import env_int
+from logging_config import get_logger
+from schemas import RenderSettings
+
+logger = get_logger(__name__)
+
+_CGROUP = "/sys/fs/cgroup"
+_DEFAULT_CODECS = {"mp4": "h264", "webm": "vp9"}
+CONTAINER_CODECS = {"mp4": ("h264", "h265"), "webm": ("vp8", "vp9")}
+# Rough resident memory of one Chromium render tab / one ffmpeg encode
+_MEMORY_PER_WORKER_MB = {"remotion": 400, "ffmpeg": 150}
+# Slides without narration are shown this long
+DEFAULT_SLIDE_SECONDS = 5.0
+
+_active = 0
+_active_lock = threading.Lock()
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def render_workers() -> int:
+    """
+    Renders run at once on this host: the pipeline's render stage workers,
+    and the jobs the Remotion sidecar runs side by side. auto_concurrency
+    splits the CPUs between that many renders.
+    """
+    return env_int("PIPELINE_RENDER_WORKERS", 2, minimum=1)
+
+
+def slide_frames(duration: Optional[float], fps: int) -> int:
+    """ Frames a slide of `duration` seconds needs at `fps`; slides without audio get DEFAULT_SLIDE_SECONDS """
+    # Whole frames, so audio slots and video segments stay aligned
+    return max(1, round((duration or DEFAULT_SLIDE_SECONDS) * fps))
+
+
+def available_cpus() -> float:
+    """ CPUs this process may use: affinity mask, capped by a cgroup v2 CPU quota """
+    try:
+        cpus: float = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = (_read(f"{_CGROUP}/cpu.max") or "max").split()
+    if quota[0] != "max" and len(quota) == 2:
+        cpus = min(cpus, int(quota[0]) / int(quota[1]))
+    return max(cpus, 1.0)
+
+
+def available_memory() -> Optional[int]:
+    """ Bytes that can still be allocated: MemAvailable, capped by the cgroup v2 limit """
+    available = None
+    for line in (_read("/proc/meminfo") or "").splitlines():
+        if line.startswith("MemAvailable:"):
+            available = int(line.split()[1]) * 1024
+    limit, current = _read(f"{_CGROUP}/memory.max"), _read(f"{_CGROUP}/memory.current")
+    if limit and limit != "max" and current:
+        headroom = max(0, int(limit) - int(current))
+        available = headroom if available is None else min(available, headroom)
+    return available
+
+
+def active_renders() -> int:
+    return _active
+
+
+@contextmanager
+def render_slot() -> Iterator[None]:
+    """ Count a render as running, so settings resolved meanwhile share the host with it """
+    global _active
+    with _active_lock:
+        _active += 1
+    try:
+        yield
+    finally:
+        with _active_lock:
+            _active -= 1
+
+
+def auto_concurrency(engine: str, running: Optional[int] = None) -> int:
+    """
+    Parallel workers (browser tabs or ffmpeg encodes) for one more render:
+    this render's share of the CPUs, bounded by the memory that is free.
+    """
+    running = active_renders() if running is None else running
+    share = math.floor(available_cpus() / (running + 1))
+    memory = available_memory()
+    if memory is not None:
+        per_worker = env_int(f"{engine.upper()}_MEMORY_PER_WORKER_MB", _MEMORY_PER_WORKER_MB[engine], minimum=1) << 20
+        share = min(share, memory // per_worker)
+    return max(1, int(share))
+
+
+def resolve_render_settings(
+    engine: str,
+    fps: int = 30,
+    output_format: str = "mp4",
+    codec: Optional[str] = None,
+    crf: Optional[int] = None,
+    resolution: Optional[int] = None,
+    concurrency: Optional[int] = None,
+) -> RenderSettings:
+    """
+    Request overrides first, then REMOTION_CONCURRENCY / FFMPEG_CONCURRENCY,
+    then values derived from the host and the renders already running. A
+    requested concurrency is capped at what the whole host could run.
+    """
+    codec = codec or _DEFAULT_CODECS.get(output_format, "h264")
+    if codec not in CONTAINER_CODECS.get(output_format, ()):
+        raise ValueError(f"Codec {codec} cannot be written to {output_format}")
+    if concurrency:
+        concurrency = min(concurrency, auto_concurrency(engine, running=0))
+    else:
+        concurrency = env_int(f"{engine.upper()}_CONCURRENCY", 0)
+    settings = RenderSettings(
+        engine=engine,
+        fps=fps,
+        codec=codec,
+        crf=crf,
+        resolution=resolution,
+        concurrency=max(1, concurrency or auto_concurrency(engine)),
+        gl=os.getenv("REMOTION_GL", "swiftshader") if engine == "remotion" else None,
+    )
+    logger.info(f"Render settings: {settings.model_dump(exclude_none=True)}")
+    return settings
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Fails calls to an upstream fast while it is down.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    `allow` refuses calls for `reset_seconds`. Then a single probe call is
+    let through (half-open): its success closes the circuit, its failure
+    opens it for another `reset_seconds`. A probe that reports neither
+    (cancelled, say) only holds the half-open slot for `reset_seconds`;
+    after that the next call probes again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0) -> None:
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == OPEN and now - self._opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+                self._probe_at = now
+                logger.info(f"Circuit for {self.name} half-open, probing")
+                return True
+            if self.state == HALF_OPEN and now - self._probe_at >= self.reset_seconds:
+                # The last probe never reported back; let another one through
+                self._probe_at = now
+                logger.info(f"Circuit for {self.name} probe timed out, probing again")
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"Circuit for {self.name} closed")
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                logger.warning(f"Circuit for {self.name} open after {self.failures} failures")
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+    def retry_after(self) -> float:
+        """ Seconds until the next probe is allowed (0 while closed) """
+        with self._lock:
+            if self.state == CLOSED:
+                return 0.0
+            since = self._opened_at if self.state == OPEN else self._probe_at
+            return max(0.0, self.reset_seconds - (time.monotonic() - since))
+
+    def stats(self) -> Dict[str, Any]:
+        retry_after = self.retry_after()
+        return {"state": self.state, "failures": self.failures, "retry_after": round(retry_after, 1)}
+
+
+class LatencyWindow:
+    """ Recent successful call durations, for deadline-based hedging """
+
+    def __init__(self, size: int = 200, min_samples: int = 20) -> None:
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """ Nearest-rank percentile, or None until `min_samples` calls were seen """
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        rank = max(1, math.ceil(pct / 100 * len(ordered)))
+        return ordered[rank - 1]
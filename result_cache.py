@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import env_float, env_int
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+PublishCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+Produce = Callable[[Optional[PublishCallback]], Awaitable[str]]
+
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(topic.split()).casefold()
+
+
+def result_key(topic: str, **params: Any) -> str:
+    """ Hash of the normalized topic and every generation parameter that changes the video """
+    material = json.dumps({"topic": normalize_topic(topic), **params}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """ One running generation and the jobs waiting on its IPFS publish events """
+
+    def __init__(self) -> None:
+        self.task: Optional[asyncio.Future] = None
+        self.subscribers: List[PublishCallback] = []
+        self.last: Optional[Dict[str, Any]] = None
+
+    async def subscribe(self, on_publish: PublishCallback) -> None:
+        self.subscribers.append(on_publish)
+        if self.last is not None:
+            await self._deliver(on_publish, self.last)
+
+    async def publish(self, ipfs: Dict[str, Any]) -> None:
+        self.last = ipfs
+        for on_publish in list(self.subscribers):
+            await self._deliver(on_publish, ipfs)
+
+    @staticmethod
+    async def _deliver(on_publish: PublishCallback, ipfs: Dict[str, Any]) -> None:
+        try:
+            await on_publish(ipfs)
+        except Exception as e:
+            logger.error(f"Recording a shared publish event failed: {str(e)}", exc_info=True)
+
+
+class ResultCache:
+    """
+    Finished presentations by generation input, so repeated topics skip the pipeline.
+
+    Entries (the result text and the pinned IPFS record) live for `ttl`
+    seconds, and the least recently used are evicted beyond `max_entries`.
+    Concurrent misses for the same key share one generation; every caller
+    gets its result and, when it passed `on_publish`, its publish events.
+    Only results with a pinned CID are stored, by the producer via `put`.
+    """
+
+    def __init__(self, ttl: float = 86400.0, max_entries: int = 1000) -> None:
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._entries: OrderedDict[str, Tuple[Dict[str, Any], float]] = OrderedDict()
+        self._inflight: Dict[str, _Flight] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[1] >= self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: str, result: str, ipfs: Dict[str, Any]) -> None:
+        self._entries[key] = ({"result": result, "ipfs": ipfs}, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def run(self, key: str, produce: Produce, on_publish: Optional[PublishCallback] = None) -> str:
+        """
+        The cached result for `key`, else the result of one shared
+        `produce(publish)`. `publish` is None unless the first caller passed
+        `on_publish`, matching what an uncached run would have done.
+        """
+        entry = self.lookup(key)
+        if entry is not None:
+            self.hits += 1
+            if on_publish is not None:
+                await on_publish(entry["ipfs"])
+            return entry["result"]
+
+        flight = self._inflight.get(key)
+        if flight is None:
+            self.misses += 1
+            flight = self._inflight[key] = _Flight()
+            publish = flight.publish if on_publish is not None else None
+            flight.task = asyncio.ensure_future(self._produce(key, produce, publish))
+        else:
+            self.coalesced += 1
+        if on_publish is not None:
+            await flight.subscribe(on_publish)
+        # Shielded so one cancelled job does not cancel the generation the others wait on
+        return await asyncio.shield(flight.task)
+
+    async def _produce(self, key: str, produce: Produce, publish: Optional[PublishCallback]) -> str:
+        try:
+            return await produce(publish)
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+        }
+
+
+_cache: Optional[ResultCache] = None
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """ Process-wide cache, or None unless RESULT_CACHE_ENABLED is true """
+    global _cache
+    if os.getenv("RESULT_CACHE_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+    if _cache is None:
+        _cache = ResultCache(
+            ttl=env_float("RESULT_CACHE_TTL_SECONDS", 86400),
+            max_entries=env_int("RESULT_CACHE_MAX_ENTRIES", 1000),
+        )
+    return _cache
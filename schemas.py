@@ -14,6 +14,17 @@ LayoutType = Literal[
     'conclusion',
 ]
 
+# 'inline' carries audio as base64 in the payload; 'reference' writes it to a
+# public media file and returns its /media URL instead
+AudioMode = Literal['inline', 'reference']
+
+# 'remotion' renders the animated podio-ai composition; 'ffmpeg' encodes the
+# Pillow slide images natively (static layouts, much faster)
+VideoEngine = Literal['remotion', 'ffmpeg']
+
+# h264 / h265 go in mp4, vp8 / vp9 in webm
+VideoCodec = Literal['h264', 'h265', 'vp8', 'vp9']
+
 
 class BrandKit(BaseModel):
     name: Optional[str] = None
@@ -38,6 +49,7 @@ class Slide(BaseModel):
     icon: Optional[str] = None
     htmlContent: Optional[str] = None
     audioUrl: Optional[str] = None
+    audioPath: Optional[str] = None
     duration: Optional[float] = None
 
     @field_validator('layoutType', mode='before')
@@ -83,10 +95,12 @@ class TTSRequest(BaseModel):
     provider: Optional[str] = None
     voice: Optional[str] = None
     voiceMap: Optional[Dict[str, str]] = None
+    audioMode: AudioMode = 'inline'
 
 
 class TTSResponse(BaseModel):
-    audio: str
+    audio: Optional[str] = None
+    audioUrl: Optional[str] = None
 
 
 class VideoRenderRequest(BaseModel):
@@ -94,12 +108,29 @@ class VideoRenderRequest(BaseModel):
     slides: List[Slide]
     format: Literal['16:9', '4:5', '9:16'] = '16:9'
     brand: Optional[BrandKit] = None
-    fps: int = 30
+    fps: int = Field(30, ge=1, le=120)
     outputFormat: Literal['mp4', 'webm'] = 'mp4'
     generateAudio: bool = True
     ttsLanguage: str = 'en-US'
     ttsProvider: Optional[str] = None
     ttsVoice: Optional[str] = None
+    engine: Optional[VideoEngine] = None
+    # Encoder overrides; unset means derived from outputFormat and the host
+    codec: Optional[VideoCodec] = None
+    crf: Optional[int] = Field(None, ge=0, le=63)
+    resolution: Optional[int] = Field(None, ge=144, le=2160, description='Output height in pixels')
+    concurrency: Optional[int] = Field(None, ge=1)
+
+
+class RenderSettings(BaseModel):
+    """ Settings a render actually used, derived from the host and request overrides """
+    engine: VideoEngine
+    fps: int
+    codec: VideoCodec
+    crf: Optional[int] = None
+    resolution: Optional[int] = None
+    concurrency: int
+    gl: Optional[str] = None
 
 
 class VideoRenderResponse(BaseModel):
@@ -108,3 +139,4 @@ class VideoRenderResponse(BaseModel):
     ipfsUrl: Optional[str] = None
     gatewayUrl: Optional[str] = None
     ipfsHash: Optional[str] = None
+    settings: Optional[RenderSettings] = None
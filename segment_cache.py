@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from config import env_int
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Bump when slide drawing or segment encoding changes, so stale clips are not reused
+SEGMENT_VERSION = 1
+# Slide fields that only affect audio or timing, not the picture
+_NON_VISUAL_FIELDS = {"speakerNotes", "audioUrl", "audioPath", "duration"}
+
+
+def _digest(material: Any) -> str:
+    return hashlib.sha256(json.dumps(material, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def segment_key(slide: Dict[str, Any], frames: int, format: str, brand: Optional[Dict[str, Any]], settings: Dict[str, Any]) -> str:
+    """ Content hash of everything that changes one slide's encoded clip """
+    return _digest({
+        "version": SEGMENT_VERSION,
+        "slide": {k: v for k, v in slide.items() if k not in _NON_VISUAL_FIELDS},
+        "frames": frames,
+        "format": format,
+        "brand": brand or {},
+        "settings": settings,
+    })
+
+
+def file_digest(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def audio_track_key(audio_files: Iterable[Optional[str]], seconds: Iterable[float], output_format: str) -> str:
+    """ Content hash of a deck's audio track: each slide's audio bytes and its slot length """
+    return _digest({
+        "version": SEGMENT_VERSION,
+        "audio": [file_digest(path) if path else None for path in audio_files],
+        "seconds": [round(value, 6) for value in seconds],
+        "format": output_format,
+    })
+
+
+def link_or_copy(source: str, target: str) -> str:
+    if os.path.lexists(target):
+        os.remove(target)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+    return target
+
+
+class SegmentCache:
+    """
+    Content-addressed directory of encoded video segments and audio tracks.
+
+    Files are stored as `<key[:2]>/<key>.<ext>` and bounded by `disk_bytes`;
+    the least recently used (by mtime, refreshed on every hit) are evicted
+    first. Callers hard-link hits into their own work directory, so an
+    eviction never pulls a file out from under a running render.
+    """
+
+    def __init__(self, directory: str, disk_bytes: int):
+        self.directory = directory
+        self.disk_bytes = disk_bytes
+        self._disk_size: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{ext}")
+
+    def fetch(self, key: str, ext: str, target: str) -> bool:
+        """ Link the cached file to `target`; False on a miss """
+        path = self._path(key, ext)
+        try:
+            link_or_copy(path, target)
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def put(self, key: str, ext: str, source: str) -> None:
+        """ Store a copy of `source` (it stays where it is) """
+        path = self._path(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            link_or_copy(source, tmp_path)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            logger.warning(f"Could not write segment cache entry {key[:12]}: {str(e)}")
+            return
+
+        with self._lock:
+            if self._disk_size is None:
+                self._disk_size = self._scan_disk_size()
+            else:
+                self._disk_size += size
+            if self._disk_size > self.disk_bytes:
+                self._evict_disk()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_bytes": self._disk_size or 0,
+            }
+
+    def _cache_files(self) -> List[os.DirEntry]:
+        entries: List[os.DirEntry] = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for shard in os.scandir(self.directory):
+            if shard.is_dir():
+                entries.extend(e for e in os.scandir(shard.path) if not e.name.endswith(".tmp"))
+        return entries
+
+    def _scan_disk_size(self) -> int:
+        return sum(e.stat().st_size for e in self._cache_files())
+
+    def _evict_disk(self) -> None:
+        # Trim to 90% of the budget so we do not rescan on every put
+        target = int(self.disk_bytes * 0.9)
+        files = sorted(self._cache_files(), key=lambda e: e.stat().st_mtime)
+        size = sum(e.stat().st_size for e in files)
+        for entry in files:
+            if size <= target:
+                break
+            try:
+                entry_size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            size -= entry_size
+            self.evictions += 1
+        self._disk_size = size
+
+
+_cache: Optional[SegmentCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_segment_cache() -> Optional[SegmentCache]:
+    """ Process-wide cache, or None when SEGMENT_CACHE_ENABLED is false """
+    global _cache
+    if os.getenv("SEGMENT_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            media_dir = os.getenv("MEDIA_DIR", os.path.join(os.getcwd(), "outputs"))
+            _cache = SegmentCache(
+                directory=os.path.join(media_dir, "segment_cache"),
+                disk_bytes=env_int("SEGMENT_CACHE_DISK_BYTES", 2 * 1024 * 1024 * 1024),
+            )
+        return _cache
@@ -1,17 +1,43 @@
 from __future__ import annotations
 
-from typing import List
+from typing import Any, AsyncIterator, Dict, List
 from schemas import Slide
-from podio_client import generate_slides as podio_generate_slides, update_slide as podio_update_slide
+from podio_client import (
+    generate_slides_async as podio_generate_slides,
+    stream_slides_async as podio_stream_slides,
+    update_slide_async as podio_update_slide,
+)
+from http_pool import run_sync
 
 
-def generate_slides(topic: str, count: int = 5, style: str = "Modern") -> List[Slide]:
-    payload = podio_generate_slides(topic=topic, count=count, style=style)
-    slides = [Slide(**s) for s in payload.get("slides", [])]
-    return slides
+def _to_slides(payload: Dict[str, Any]) -> List[Slide]:
+    return [Slide(**s) for s in payload.get("slides", [])]
 
 
-def update_slide(topic: str, instruction: str, current_slide: Slide, style: str = "Modern") -> Slide:
-    payload = podio_update_slide(topic=topic, instruction=instruction, current_slide=current_slide.model_dump(), style=style)
+def _to_slide(payload: Dict[str, Any]) -> Slide:
     slide_data = payload.get("slide") or payload
     return Slide(**slide_data)
+
+
+async def generate_slides_async(topic: str, count: int = 5, style: str = "Modern") -> List[Slide]:
+    payload = await podio_generate_slides(topic=topic, count=count, style=style)
+    return _to_slides(payload)
+
+
+async def stream_slides_async(topic: str, count: int = 5, style: str = "Modern") -> AsyncIterator[Slide]:
+    """ Slides in deck order, each as soon as Podio AI has generated it """
+    async for slide in podio_stream_slides(topic=topic, count=count, style=style):
+        yield Slide(**slide)
+
+
+async def update_slide_async(topic: str, instruction: str, current_slide: Slide, style: str = "Modern") -> Slide:
+    payload = await podio_update_slide(topic=topic, instruction=instruction, current_slide=current_slide.model_dump(), style=style)
+    return _to_slide(payload)
+
+
+def generate_slides(topic: str, count: int = 5, style: str = "Modern") -> List[Slide]:
+    return run_sync(generate_slides_async(topic, count=count, style=style))
+
+
+def update_slide(topic: str, instruction: str, current_slide: Slide, style: str = "Modern") -> Slide:
+    return run_sync(update_slide_async(topic, instruction, current_slide, style=style))
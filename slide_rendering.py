@@ -1,10 +1,17 @@
 from __future__ import annotations
 
+import io
+import math
+import multiprocessing
 import os
 import re
-from typing import List, Tuple, Optional
-from PIL import Image, ImageDraw, ImageFont
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Literal, Tuple, Optional, Union
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+from config import env_int
 from schemas import Slide, BrandKit
+from font_registry import get_font, preload_fonts, text_length
 
 
 DIMENSIONS = {
@@ -14,23 +21,36 @@ DIMENSIONS = {
 }
 
 
+ImageEncoding = Literal["png", "jpeg", "webp"]
+
+_EXTENSIONS = {"png": "png", "jpeg": "jpg", "webp": "webp"}
+
+
 def render_slide(slide: Slide, output_path: str, format: str = "16:9", brand: Optional[BrandKit] = None) -> str:
+    image = draw_slide(slide, format=format, brand=brand)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    image.save(output_path)
+    return output_path
+
+
+def draw_slide(slide: Slide, format: str = "16:9", brand: Optional[BrandKit] = None) -> Image.Image:
     width, height = DIMENSIONS.get(format, DIMENSIONS["16:9"])
     image = Image.new("RGB", (width, height), slide.backgroundColor or "#0a0a0f")
 
     if slide.gradient:
-        colors = _extract_gradient_colors(slide.gradient)
-        if colors:
-            image = _draw_vertical_gradient(width, height, colors[0], colors[-1])
+        gradient = _parse_linear_gradient(slide.gradient)
+        if gradient:
+            image = _draw_linear_gradient(width, height, *gradient)
 
     draw = ImageDraw.Draw(image)
 
     accent = (brand.primaryColor if brand and brand.primaryColor else slide.accentColor) or "#ec4899"
     text_color = slide.textColor or "#ffffff"
 
-    title_font = _load_font(54, bold=True)
-    body_font = _load_font(28, bold=False)
-    small_font = _load_font(20, bold=False)
+    family = brand.fontFamily if brand else None
+    title_font = _load_font(54, bold=True, family=family)
+    body_font = _load_font(28, bold=False, family=family)
+    small_font = _load_font(20, bold=False, family=family)
 
     padding_x = 80
     padding_y = 60
@@ -59,7 +79,7 @@ def render_slide(slide: Slide, output_path: str, format: str = "16:9", brand: Op
         _draw_centered_text(draw, slide.title, title_font, text_color, width, height * 0.35)
         tags = slide.bullets
         if tags:
-            _draw_tag_cloud(draw, tags, width, height * 0.55, accent, text_color)
+            _draw_tag_cloud(draw, tags, width, height * 0.55, accent, text_color, _load_font(24, family=family))
     else:
         draw.text((padding_x, padding_y), slide.title, font=title_font, fill=text_color)
         content_top = padding_y + 120
@@ -76,24 +96,132 @@ def render_slide(slide: Slide, output_path: str, format: str = "16:9", brand: Op
     if brand and brand.name:
         draw.text((padding_x, height - 40), brand.name.upper(), font=small_font, fill=accent)
 
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    image.save(output_path)
-    return output_path
+    return image
+
+
+def encode_image(image: Image.Image, encoding: ImageEncoding = "png", quality: int = 85, compress_level: int = 1) -> bytes:
+    """
+    Encode a rendered slide, favouring speed over size.
+
+    PNG defaults to zlib level 1 (Pillow's default of 6 is several times
+    slower for a few percent smaller files); WebP uses its fastest method.
+    """
+    buffer = io.BytesIO()
+    if encoding == "jpeg":
+        image.save(buffer, format="JPEG", quality=quality)
+    elif encoding == "webp":
+        image.save(buffer, format="WEBP", quality=quality, method=0)
+    else:
+        image.save(buffer, format="PNG", compress_level=compress_level)
+    return buffer.getvalue()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Batch rendering
+# ─────────────────────────────────────────────────────────────────────────────
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _render_workers() -> int:
+    return env_int("SLIDE_RENDER_WORKERS", os.cpu_count() or 1, minimum=1)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """ The process-wide pool, sized once from SLIDE_RENDER_WORKERS and reused for every deck """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that runs threads (uvicorn, HTTP pools) is unsafe
+            _pool = ProcessPoolExecutor(
+                max_workers=_render_workers(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=preload_fonts,
+            )
+        return _pool
+
+
+def shutdown_render_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+def _render_job(job: Dict[str, Any]) -> Union[str, bytes]:
+    slide = Slide(**job["slide"])
+    brand = BrandKit(**job["brand"]) if job["brand"] else None
+    data = encode_image(draw_slide(slide, job["format"], brand), job["encoding"], job["quality"], job["compress_level"])
+    if job["path"] is None:
+        return data
+    with open(job["path"], "wb") as f:
+        f.write(data)
+    return job["path"]
 
 
-def _load_font(size: int, bold: bool = False) -> ImageFont.FreeTypeFont:
-    candidates = [
-        "/Library/Fonts/Arial.ttf",
-        "/System/Library/Fonts/Supplemental/Arial.ttf",
-        "/System/Library/Fonts/Supplemental/Helvetica.ttf",
+def render_slides(
+    slides: List[Slide],
+    output_dir: Optional[str] = None,
+    format: str = "16:9",
+    brand: Optional[BrandKit] = None,
+    encoding: ImageEncoding = "png",
+    quality: int = 85,
+    compress_level: int = 1,
+    workers: Optional[int] = None,
+) -> List[Union[str, bytes]]:
+    """
+    Render a whole deck in parallel, preserving slide order.
+
+    With `output_dir` each slide is written to `slide-NN.<ext>` and the paths
+    are returned; without it the encoded images are returned as bytes.
+    Slides are spread over a shared process pool (SLIDE_RENDER_WORKERS,
+    default: one per core) that lives as long as the process, whatever the
+    deck size. At most `workers` of this deck's slides are in the pool at
+    once, so one deck can leave room for others; single slides and
+    `workers=1` render inline.
+    """
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    brand_data = brand.model_dump() if brand else None
+    jobs = [
+        {
+            "slide": slide.model_dump(),
+            "brand": brand_data,
+            "format": format,
+            "encoding": encoding,
+            "quality": quality,
+            "compress_level": compress_level,
+            "path": os.path.join(output_dir, f"slide-{idx + 1:02d}.{_EXTENSIONS[encoding]}") if output_dir else None,
+        }
+        for idx, slide in enumerate(slides)
     ]
-    for path in candidates:
-        if os.path.exists(path):
-            try:
-                return ImageFont.truetype(path, size=size)
-            except Exception:
-                continue
-    return ImageFont.load_default()
+    window = min(workers or _render_workers(), len(jobs))
+    if window <= 1:
+        return [_render_job(job) for job in jobs]
+
+    pool = _get_pool()
+    results: List[Union[str, bytes]] = [b""] * len(jobs)
+    queued = iter(enumerate(jobs))
+    running: Dict[Future, int] = {}
+
+    def submit_next() -> None:
+        item = next(queued, None)
+        if item is not None:
+            running[pool.submit(_render_job, item[1])] = item[0]
+
+    for _ in range(window):
+        submit_next()
+    while running:
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[running.pop(future)] = future.result()
+            submit_next()
+    return results
+
+
+def _load_font(size: int, bold: bool = False, family: Optional[str] = None) -> ImageFont.FreeTypeFont:
+    return get_font(size, bold=bold, family=family)
 
 
 def _wrap_text(text: str, font: ImageFont.FreeTypeFont, max_width: int) -> List[str]:
@@ -103,7 +231,7 @@ def _wrap_text(text: str, font: ImageFont.FreeTypeFont, max_width: int) -> List[
     for word in words:
         current.append(word)
         line = " ".join(current)
-        if font.getlength(line) > max_width:
+        if text_length(font, line) > max_width:
             current.pop()
             lines.append(" ".join(current))
             current = [word]
@@ -117,7 +245,7 @@ def _draw_centered_text(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.Fr
     total_height = len(lines) * (font.size + 8)
     start_y = y - total_height / 2
     for idx, line in enumerate(lines):
-        line_width = font.getlength(line)
+        line_width = text_length(font, line)
         draw.text(((width - line_width) / 2, start_y + idx * (font.size + 8)), line, font=font, fill=fill)
 
 
@@ -125,16 +253,145 @@ def _extract_gradient_colors(gradient: str) -> List[str]:
     return re.findall(r"#(?:[0-9a-fA-F]{3}){1,2}", gradient)
 
 
-def _draw_vertical_gradient(width: int, height: int, start_color: str, end_color: str) -> Image.Image:
-    base = Image.new("RGB", (width, height), start_color)
-    top = Image.new("RGB", (width, height), end_color)
-    mask = Image.new("L", (width, height))
-    mask_data = []
-    for y in range(height):
-        mask_data.extend([int(255 * (y / height))] * width)
-    mask.putdata(mask_data)
-    base.paste(top, (0, 0), mask)
-    return base
+_SIDES = {"top": (0, -1), "bottom": (0, 1), "left": (-1, 0), "right": (1, 0)}
+_STOP = re.compile(r"^(.*?)(?:\s+(-?[\d.]+)%)?(?:\s+(-?[\d.]+)%)?$")
+
+Direction = Union[float, Tuple[int, int]]
+Stop = Tuple[Tuple[int, int, int], float]
+
+
+def _split_args(text: str) -> List[str]:
+    """ Split on commas that are not inside parentheses, e.g. rgb(...) """
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        depth += {"(": 1, ")": -1}.get(char, 0)
+        current.append(char)
+    parts.append("".join(current).strip())
+    return [part for part in parts if part]
+
+
+def _parse_linear_gradient(gradient: str) -> Optional[Tuple[Direction, List[Stop]]]:
+    """
+    Parse a CSS `linear-gradient(...)` into a direction and color stops.
+
+    The direction is an angle in CSS degrees (0 points up, 90 right) or a
+    (x, y) side/corner from a `to ...` keyword. Anything we cannot parse
+    (radial gradients, unknown colors) falls back to the first and last hex
+    colors as a top-to-bottom gradient.
+    """
+    match = re.search(r"linear-gradient\((.*)\)", gradient, re.S)
+    args = _split_args(match.group(1)) if match else []
+    direction: Direction = 180.0
+    if args and (args[0].startswith("to ") or re.match(r"^-?[\d.]+(deg|turn|rad)$", args[0])):
+        head = args.pop(0)
+        if head.startswith("to "):
+            x = sum(_SIDES.get(word, (0, 0))[0] for word in head.split()[1:])
+            y = sum(_SIDES.get(word, (0, 0))[1] for word in head.split()[1:])
+            direction = (x, y) if (x, y) != (0, 0) else 180.0
+        else:
+            value = float(re.match(r"^-?[\d.]+", head).group(0))
+            direction = value * 360 if head.endswith("turn") else math.degrees(value) if head.endswith("rad") else value
+
+    colors: List[Tuple[int, int, int]] = []
+    positions: List[Optional[float]] = []
+    try:
+        for arg in args:
+            color, first, second = _STOP.match(arg).groups()
+            rgb = ImageColor.getrgb(color.strip())[:3]
+            for pos in (first, second) if second is not None else (first,):
+                colors.append(rgb)
+                positions.append(float(pos) / 100 if pos is not None else None)
+    except ValueError:
+        colors = []
+
+    if len(colors) < 2:
+        hex_colors = _extract_gradient_colors(gradient)
+        if not hex_colors:
+            return None
+        return 180.0, [(ImageColor.getrgb(hex_colors[0]), 0.0), (ImageColor.getrgb(hex_colors[-1]), 1.0)]
+    return direction, list(zip(colors, _resolve_positions(positions)))
+
+
+def _resolve_positions(positions: List[Optional[float]]) -> List[float]:
+    """ Fill in missing stop positions the way CSS does """
+    resolved = list(positions)
+    if resolved[0] is None:
+        resolved[0] = 0.0
+    if resolved[-1] is None:
+        resolved[-1] = 1.0
+    # Positions never go backwards
+    for idx in range(1, len(resolved)):
+        if resolved[idx] is not None:
+            resolved[idx] = max(resolved[idx], max(p for p in resolved[:idx] if p is not None))
+    # Runs of missing positions are spread evenly between their neighbours
+    idx = 1
+    while idx < len(resolved):
+        if resolved[idx] is None:
+            end = idx
+            while resolved[end] is None:
+                end += 1
+            start_pos, end_pos = resolved[idx - 1], resolved[end]
+            for offset in range(idx, end):
+                resolved[offset] = start_pos + (end_pos - start_pos) * (offset - idx + 1) / (end - idx + 1)
+            idx = end
+        idx += 1
+    return resolved
+
+
+def _color_at(stops: List[Stop], t: float) -> Tuple[int, int, int]:
+    if t <= stops[0][1]:
+        return stops[0][0]
+    for (left, left_pos), (right, right_pos) in zip(stops, stops[1:]):
+        if t <= right_pos:
+            span = right_pos - left_pos
+            f = (t - left_pos) / span if span > 0 else 1.0
+            return tuple(int(round(a + (b - a) * f)) for a, b in zip(left, right))
+    return stops[-1][0]
+
+
+def _draw_linear_gradient(width: int, height: int, direction: Direction, stops: List[Stop]) -> Image.Image:
+    """
+    Render a CSS linear gradient with native Pillow operations.
+
+    Only one row of colors along the gradient line is computed in Python
+    (a few hundred to a few thousand pixels); a single affine transform in C
+    then projects every slide pixel onto that row.
+    """
+    if isinstance(direction, tuple):
+        # `to <corner>`: the gradient line is perpendicular to the diagonal
+        # through the two neighbouring corners, so it depends on the aspect
+        dx, dy = direction[0] * height, direction[1] * width
+        angle = math.degrees(math.atan2(dx, -dy))
+    else:
+        angle = direction
+    theta = math.radians(angle)
+    sin_t, cos_t = math.sin(theta), -math.cos(theta)
+    # CSS gradient line length, centred on the slide
+    line = abs(width * sin_t) + abs(height * cos_t)
+    length = max(2, int(math.ceil(line)))
+
+    strip = Image.new("RGB", (length, 1))
+    strip.putdata([_color_at(stops, (x + 0.5) / length) for x in range(length)])
+
+    # The strip has one sample per pixel of the gradient line, so nearest
+    # sampling is as smooth as bilinear and several times faster
+    quarter = angle % 90 == 0
+    if quarter and angle % 180 == 90:
+        strip = strip if angle % 360 == 90 else strip.transpose(Image.FLIP_LEFT_RIGHT)
+        return strip.resize((width, height), Image.NEAREST)
+    if quarter:
+        column = strip.transpose(Image.ROTATE_270 if angle % 360 == 180 else Image.ROTATE_90)
+        return column.resize((width, height), Image.NEAREST)
+
+    # Strip x for the pixel centre (x + .5, y + .5): its projection on the line
+    scale = length / line
+    a, b = sin_t * scale, cos_t * scale
+    c = length / 2 - a * width / 2 - b * height / 2
+    return strip.transform((width, height), Image.AFFINE, (a, b, c, 0, 0, 0.5), resample=Image.NEAREST)
 
 
 def _split_stat(text: str) -> Tuple[str, str]:
@@ -144,12 +401,19 @@ def _split_stat(text: str) -> Tuple[str, str]:
     return text.strip(), ""
 
 
-def _draw_tag_cloud(draw: ImageDraw.ImageDraw, tags: List[str], width: int, start_y: float, accent: str, text_color: str) -> None:
+def _draw_tag_cloud(
+    draw: ImageDraw.ImageDraw,
+    tags: List[str],
+    width: int,
+    start_y: float,
+    accent: str,
+    text_color: str,
+    font: ImageFont.FreeTypeFont,
+) -> None:
     x = 80
     y = start_y
-    font = _load_font(24)
     for tag in tags:
-        w = font.getlength(tag) + 32
+        w = text_length(font, tag) + 32
         h = font.size + 16
         if x + w > width - 80:
             x = 80
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type
+
+from logging_config import get_logger
+from metrics import PIPELINE_STAGE_RETRIES, record_span
+
+logger = get_logger(__name__)
+
+StageFn = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class Stage:
+    """
+    One step of a StagePipeline: `run(job)` takes the job dict and returns it
+    (updated) for the next stage. `workers` jobs can be in this stage at once;
+    failures matching `retry_on` but not `no_retry` are retried `retries`
+    times with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run: StageFn,
+        workers: int = 1,
+        retries: int = 0,
+        retry_on: Tuple[Type[BaseException], ...] = (),
+        no_retry: Tuple[Type[BaseException], ...] = (),
+        backoff: float = 1.0,
+    ) -> None:
+        self.name = name
+        self.run = run
+        self.workers = max(1, workers)
+        self.retries = max(0, retries)
+        self.retry_on = retry_on
+        self.no_retry = no_retry
+        self.backoff = backoff
+
+
+class _Item:
+    """ A job travelling through the pipeline, run in its submitter's context """
+
+    def __init__(self, job: Dict[str, Any], future: asyncio.Future) -> None:
+        self.job = job
+        self.future = future
+        # Stage code runs in the submitter's context, so job traces and
+        # progress events land on the right job
+        self.context = contextvars.copy_context()
+        self.task: Optional[asyncio.Task] = None
+        self.cancelled = False
+        self.queued_at = time.perf_counter()
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        if self.task:
+            self.task.cancel()
+
+
+class StagePipeline:
+    """
+    Runs jobs through a fixed sequence of stages.
+
+    Every stage has its own worker tasks and a bounded queue in front of it,
+    so different jobs occupy different stages at the same time (one job
+    rendering while another uploads) and a slow stage pushes back on the
+    stages before it instead of piling up work. Throughput is bounded by the
+    slowest stage rather than the sum of all of them. Cancelling `run`
+    cancels the job wherever it is: dropped if queued, cancelled if running.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 4) -> None:
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self._queues: List[asyncio.Queue[_Item]] = []
+        self._tasks: List[asyncio.Task] = []
+        self._busy: Dict[str, int] = {stage.name: 0 for stage in stages}
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        self._tasks = [
+            asyncio.create_task(self._worker(idx), name=f"{stage.name}-worker-{n}")
+            for idx, stage in enumerate(self.stages)
+            for n in range(stage.workers)
+        ]
+        layout = ", ".join(f"{stage.name} x{stage.workers}" for stage in self.stages)
+        logger.info(f"Stage pipeline started: {layout}")
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for queue in self._queues:
+            while not queue.empty():
+                queue.get_nowait().future.cancel()
+
+    async def run(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """ Push `job` through every stage and return it as the last stage left it """
+        self.start()
+        item = _Item(job, asyncio.get_running_loop().create_future())
+        await self._queues[0].put(item)
+        try:
+            return await item.future
+        except asyncio.CancelledError:
+            item.cancel()
+            raise
+
+    async def _worker(self, index: int) -> None:
+        stage = self.stages[index]
+        queue = self._queues[index]
+        while True:
+            item = await queue.get()
+            if item.cancelled or item.future.done():
+                continue
+            item.context.run(record_span, f"wait:{stage.name}", time.perf_counter() - item.queued_at)
+            self._busy[stage.name] += 1
+            try:
+                item.job = await self._attempt(stage, item)
+            except asyncio.CancelledError:
+                if not item.cancelled:
+                    # The pipeline is stopping
+                    if item.task:
+                        item.task.cancel()
+                    item.future.cancel()
+                    raise
+                continue
+            except Exception as exc:
+                if not item.future.done():
+                    item.future.set_exception(exc)
+                continue
+            finally:
+                self._busy[stage.name] -= 1
+                item.task = None
+
+            if index + 1 == len(self.stages):
+                if not item.future.done():
+                    item.future.set_result(item.job)
+                continue
+            item.queued_at = time.perf_counter()
+            # Waits while the next stage is backed up
+            await self._queues[index + 1].put(item)
+
+    async def _attempt(self, stage: Stage, item: _Item) -> Dict[str, Any]:
+        attempt = 0
+        while True:
+            item.task = asyncio.create_task(stage.run(item.job), context=item.context)
+            try:
+                return await item.task
+            except stage.retry_on as exc:
+                if attempt >= stage.retries or isinstance(exc, stage.no_retry):
+                    raise
+                delay = stage.backoff * (2 ** attempt)
+                attempt += 1
+                PIPELINE_STAGE_RETRIES.inc(stage=stage.name)
+                logger.warning(f"Stage {stage.name} failed ({str(exc)}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                if item.cancelled:
+                    raise asyncio.CancelledError()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            stage.name: {
+                "workers": stage.workers,
+                "busy": self._busy[stage.name],
+                "queued": self._queues[idx].qsize() if self._queues else 0,
+            }
+            for idx, stage in enumerate(self.stages)
+        }
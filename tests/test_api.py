@@ -1,16 +1,21 @@
 import os
+import tempfile
+import threading
 import unittest
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 from fastapi.testclient import TestClient
 
+os.environ.setdefault('JOB_STORE', 'memory')
+
 import main
+from resilience import CircuitBreaker
 
 
 class AgentApiTests(unittest.TestCase):
     def setUp(self):
         self.client = TestClient(main.app)
 
-    @patch('main.generate_slides')
+    @patch('main.generate_slides', new_callable=AsyncMock)
     def test_generate_slides(self, mock_generate):
         mock_generate.return_value = []
         resp = self.client.post('/tools/slides/generate', json={
@@ -21,7 +26,118 @@ class AgentApiTests(unittest.TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertIn('slides', resp.json())
 
-    @patch('main.generate_tts')
+    def test_availability_reports_queue(self):
+        resp = self.client.get('/availability')
+        self.assertEqual(resp.status_code, 200)
+        body = resp.json()
+        self.assertEqual(body['status'], 'available')
+        self.assertIn('queue_depth', body['queue'])
+        self.assertIn('free_slots', body['queue'])
+
+    def test_availability_reports_open_podio_circuit(self):
+        breaker = CircuitBreaker('podio', failure_threshold=1, reset_seconds=60)
+        breaker.record_failure()
+        with patch('main.podio_circuit', return_value=breaker):
+            body = self.client.get('/availability').json()
+        self.assertEqual(body['status'], 'unavailable')
+        self.assertEqual(body['upstreams']['podio']['state'], 'open')
+
+    def test_status_reads_job_store(self):
+        main.job_store.create({
+            'job_id': 'status-job',
+            'status': 'completed',
+            'payment_status': 'completed',
+            'payment_id': 'pay-status',
+            'input_data': {'text': 'AI'},
+            'result': 'done',
+            'identifier_from_purchaser': 'buyer',
+        })
+        resp = self.client.get('/status', params={'job_id': 'status-job'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['result'], 'done')
+        self.assertEqual(self.client.get('/status', params={'job_id': 'missing'}).status_code, 404)
+
+    def test_status_serves_cached_payment_state(self):
+        main.job_store.create({
+            'job_id': 'paying-job',
+            'status': 'awaiting_payment',
+            'payment_status': 'pending',
+            'payment_id': 'pay-paying',
+            'input_data': {'text': 'AI'},
+            'result': None,
+            'identifier_from_purchaser': 'buyer',
+        })
+        main.start_payment_monitoring('paying-job', 'pay-paying')
+        self.addCleanup(main.stop_payment_monitoring, 'paying-job')
+
+        with patch('main.resolve_payment', new_callable=AsyncMock) as mock_resolve:
+            mock_resolve.return_value = {'onChainState': 'FundsLocked'}
+            for _ in range(3):
+                body = self.client.get('/status', params={'job_id': 'paying-job'}).json()
+                self.assertEqual(body['payment_status'], 'FundsLocked')
+        mock_resolve.assert_awaited_once_with('pay-paying')
+        self.assertEqual(main.job_store.get('paying-job')['payment_status'], 'FundsLocked')
+
+    def test_status_can_include_trace(self):
+        main.job_store.create({
+            'job_id': 'trace-job',
+            'status': 'completed',
+            'payment_status': 'completed',
+            'payment_id': 'pay-trace',
+            'input_data': {'text': 'AI'},
+            'result': 'done',
+            'identifier_from_purchaser': 'buyer',
+            'trace': {'spans': [{'name': 'render', 'seconds': 1.5}]},
+        })
+        plain = self.client.get('/status', params={'job_id': 'trace-job'}).json()
+        self.assertNotIn('trace', plain)
+        traced = self.client.get('/status', params={'job_id': 'trace-job', 'trace': 'true'}).json()
+        self.assertEqual(traced['trace']['spans'][0]['name'], 'render')
+
+    def test_status_stream_replays_progress_until_finished(self):
+        main.job_store.create({
+            'job_id': 'stream-job',
+            'status': 'running',
+            'payment_status': 'completed',
+            'payment_id': 'pay-stream',
+            'input_data': {'text': 'AI'},
+            'result': None,
+            'identifier_from_purchaser': 'buyer',
+        })
+        main.publish_status('stream-job', 'running')
+        main.get_progress_hub().publish('stream-job', {'event': 'render', 'progress': 0.5})
+        main.publish_status('stream-job', 'completed', result='ipfs://Qm')
+
+        with self.client.stream('GET', '/status/stream', params={'job_id': 'stream-job'}) as resp:
+            self.assertEqual(resp.status_code, 200)
+            self.assertTrue(resp.headers['content-type'].startswith('text/event-stream'))
+            events = [line[len('event: '):] for line in resp.iter_lines() if line.startswith('event: ')]
+        self.assertEqual(events, ['snapshot', 'status', 'render', 'status'])
+
+        epoch = main.get_progress_hub().epoch
+        resumed = self.client.get('/status/stream', params={'job_id': 'stream-job'}, headers={'Last-Event-ID': f'{epoch}-2'})
+        self.assertNotIn('event: snapshot', resumed.text)
+        self.assertIn('"result": "ipfs://Qm"', resumed.text)
+
+        # An id from before a restart, or past the kept history, still ends with the final state
+        for last_event_id in ('57', f'{epoch}-57'):
+            resp = self.client.get('/status/stream', params={'job_id': 'stream-job'}, headers={'Last-Event-ID': last_event_id})
+            self.assertIn('event: snapshot', resp.text)
+            self.assertIn('"status": "completed"', resp.text)
+
+        # Resuming a finished job after its last event ends instead of waiting for more
+        main.job_store.transition('stream-job', 'completed', result='ipfs://Qm')
+        resp = self.client.get('/status/stream', params={'job_id': 'stream-job'}, headers={'Last-Event-ID': f'{epoch}-3'})
+        self.assertIn('event: snapshot', resp.text)
+        self.assertEqual(self.client.get('/status/stream', params={'job_id': 'missing'}).status_code, 404)
+
+    def test_metrics_endpoint(self):
+        resp = self.client.get('/metrics')
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('# TYPE pitch_stage_seconds histogram', resp.text)
+        self.assertIn('pitch_job_queue_depth 0', resp.text)
+
+    @patch('main.generate_tts', new_callable=AsyncMock)
     def test_tts(self, mock_tts):
         mock_tts.return_value = 'dGVzdA=='
         resp = self.client.post('/tools/tts', json={
@@ -31,8 +147,8 @@ class AgentApiTests(unittest.TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(resp.json()['audio'], 'dGVzdA==')
 
-    @patch('main.render_video')
-    @patch('main.pinata_upload')
+    @patch('video_generation.render_video')
+    @patch('main.pinata_upload', new_callable=AsyncMock)
     def test_video_render_with_ipfs(self, mock_pinata, mock_render):
         mock_render.return_value = ('/tmp/video.mp4', 'video.mp4')
         mock_pinata.return_value = {
@@ -53,6 +169,47 @@ class AgentApiTests(unittest.TestCase):
         body = resp.json()
         self.assertEqual(body['ipfsUrl'], 'ipfs://QmTest')
         self.assertEqual(body['gatewayUrl'], 'https://gateway.pinata.cloud/ipfs/QmTest')
+        self.assertEqual(body['settings']['fps'], 30)
+        self.assertEqual(body['settings']['codec'], 'h264')
+        self.assertGreaterEqual(body['settings']['concurrency'], 1)
+        # The render runs in a thread that a cancelled request can stop
+        self.assertIsInstance(mock_render.call_args.kwargs['cancel'], threading.Event)
+
+    @patch('main.generate_tts_bytes_async', new_callable=AsyncMock)
+    def test_reference_tts_returns_only_a_media_url(self, mock_tts):
+        mock_tts.return_value = b'ID3-audio'
+        with tempfile.TemporaryDirectory() as tmp, patch.dict(os.environ, {'MEDIA_DIR': tmp}):
+            resp = self.client.post('/tools/tts', json={
+                'script': [{'speaker': 'Presenter', 'line': 'Hello'}], 'audioMode': 'reference',
+            })
+            self.assertEqual(resp.status_code, 200)
+            body = resp.json()
+            self.assertNotIn('audioPath', body)
+            self.assertTrue(body['audioUrl'].startswith('/media/audio/'))
+            self.assertTrue(os.path.isfile(os.path.join(tmp, 'public', body['audioUrl'][len('/media/'):])))
+
+    @patch('video_generation.render_video')
+    def test_video_render_only_reads_public_audio(self, mock_render):
+        mock_render.return_value = ('/tmp/video.mp4', 'video.mp4')
+        with tempfile.TemporaryDirectory() as tmp, patch.dict(os.environ, {'MEDIA_DIR': tmp}), \
+                patch('main.pinata_upload', new_callable=AsyncMock, return_value={}):
+            for private in ('tts_cache/ab/abc.mp3', 'p1_assets/slide-01.mp3', 'public/../work_queue.db', '/etc/passwd'):
+                resp = self.client.post('/tools/video/render', json={
+                    'topic': 'AI', 'slides': [{'title': 'A', 'audioPath': os.path.join(tmp, private)}],
+                })
+                self.assertEqual(resp.status_code, 400, private)
+            mock_render.assert_not_called()
+
+            resp = self.client.post('/tools/video/render', json={
+                'topic': 'AI', 'slides': [{'title': 'A', 'audioPath': os.path.join(tmp, 'public', 'audio', 'a.mp3')}],
+            })
+            self.assertEqual(resp.status_code, 200)
+
+    def test_video_render_rejects_codec_for_container(self):
+        resp = self.client.post('/tools/video/render', json={
+            'topic': 'AI', 'slides': [], 'outputFormat': 'webm', 'codec': 'h264', 'engine': 'ffmpeg',
+        })
+        self.assertEqual(resp.status_code, 400)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,77 @@
+import base64
+import json
+import os
+import tempfile
+import unittest
+import urllib.request
+from unittest.mock import patch
+
+from audio_assets import materialize_slide_audio, media_path, media_url, public_dir, write_audio_file, write_data_uri
+import render_remotion
+
+
+class AudioAssetTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = patch.dict(os.environ, {'MEDIA_DIR': self.tmp.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_write_data_uri_decodes_in_chunks(self):
+        audio = os.urandom(700 * 1024)
+        uri = 'data:audio/mp3;base64,' + base64.b64encode(audio).decode()
+        path = write_data_uri(uri, os.path.join(self.tmp.name, 'a.mp3'))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), audio)
+
+    def test_only_public_files_get_media_urls(self):
+        self.assertEqual(media_url(os.path.join(public_dir(), 'audio', 'a.mp3')), '/media/audio/a.mp3')
+        for private in ('tts_cache/ab/abc.mp3', 'project_assets/slide-01.mp3', 'public/../segment_cache/x.ts'):
+            with self.assertRaises(ValueError):
+                media_url(os.path.join(self.tmp.name, private))
+
+    def test_ignores_audio_paths_outside_media_dir(self):
+        with tempfile.NamedTemporaryFile(suffix='.mp3') as outside:
+            names = materialize_slide_audio([{'audioPath': outside.name}], os.path.join(self.tmp.name, 'assets'))
+        self.assertEqual(names, [None])
+
+    def test_media_urls_resolve_to_public_files(self):
+        path = write_audio_file(b'narration', os.path.join(public_dir(), 'audio', 'a b.mp3'))
+        self.assertEqual(media_path(media_url(path)), path)
+        self.assertIsNone(media_path('/media/../tts_cache/ab/abc.mp3'))
+        self.assertIsNone(media_path('https://cdn.example.com/media/a.mp3'))
+
+        asset_dir = os.path.join(self.tmp.name, 'assets')
+        self.assertEqual(materialize_slide_audio([{'audioUrl': '/media/audio/a%20b.mp3'}], asset_dir), ['slide-01.mp3'])
+        with open(os.path.join(asset_dir, 'slide-01.mp3'), 'rb') as f:
+            self.assertEqual(f.read(), b'narration')
+
+    def test_remotion_props_reference_served_audio(self):
+        audio = b'ID3-fake-mp3'
+        slides = [
+            {'title': 'One', 'audioUrl': 'data:audio/mp3;base64,' + base64.b64encode(audio).decode(), 'duration': 5},
+            {'title': 'Two', 'audioUrl': None, 'duration': 5},
+        ]
+        seen = {}
+
+        def fake_run(cmd, cwd, check):
+            props_path = cmd[cmd.index('--props') + 1]
+            with open(props_path) as f:
+                props = json.load(f)
+            seen['props'] = props
+            with urllib.request.urlopen(props['slides'][0]['audioUrl']) as resp:
+                seen['audio'] = resp.read()
+
+        with patch.object(render_remotion.subprocess, 'run', side_effect=fake_run), \
+                patch.dict(os.environ, {'REMOTION_SERVER': 'false'}):
+            render_remotion.render_remotion_video(slides, 'project')
+
+        self.assertTrue(seen['props']['slides'][0]['audioUrl'].startswith('http://127.0.0.1:'))
+        self.assertIsNone(seen['props']['slides'][1]['audioUrl'])
+        self.assertEqual(seen['audio'], audio)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, 'project_assets')))
+
+
+if __name__ == '__main__':
+    unittest.main()
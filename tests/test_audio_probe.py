@@ -0,0 +1,54 @@
+import io
+import struct
+import unittest
+import wave
+
+from audio_probe import audio_duration
+from render_settings import slide_frames
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, stereo: 417-byte frames of 1152 samples
+FRAME_HEADER = b'\xff\xfb\x90\x00'
+FRAME_BYTES = 417
+
+
+def mp3(frames, xing_frames=None, id3=False):
+    body = b''
+    if xing_frames is not None:
+        first = FRAME_HEADER + bytes(32) + b'Xing' + struct.pack('>II', 1, xing_frames)
+        body += first.ljust(FRAME_BYTES, b'\x00')
+    body += (FRAME_HEADER + bytes(FRAME_BYTES - 4)) * frames
+    if id3:
+        # 20-byte ID3v2 tag (syncsafe size) in front, ID3v1 tag behind
+        body = b'ID3\x04\x00\x00\x00\x00\x00\x14' + bytes(20) + body + b'TAG' + bytes(125)
+    return body
+
+
+class AudioDurationTests(unittest.TestCase):
+    def test_mp3_frames_are_counted(self):
+        self.assertAlmostEqual(audio_duration(mp3(100)), 100 * 1152 / 44100)
+        self.assertAlmostEqual(audio_duration(mp3(100, id3=True)), 100 * 1152 / 44100)
+
+    def test_vbr_header_gives_the_frame_count(self):
+        self.assertAlmostEqual(audio_duration(mp3(3, xing_frames=500)), 500 * 1152 / 44100)
+
+    def test_wav_duration_from_data_chunk(self):
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(24000)
+            out.writeframes(bytes(2 * 36000))
+        self.assertAlmostEqual(audio_duration(buffer.getvalue()), 1.5)
+
+    def test_unknown_bytes(self):
+        self.assertIsNone(audio_duration(b'not audio at all'))
+        self.assertIsNone(audio_duration(b''))
+
+    def test_slide_frames_follow_fps(self):
+        self.assertEqual(slide_frames(2.61, 30), 78)
+        self.assertEqual(slide_frames(2.61, 60), 157)
+        self.assertEqual(slide_frames(None, 24), 120)
+
+
+if __name__ == '__main__':
+    unittest.main()
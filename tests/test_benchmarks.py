@@ -0,0 +1,41 @@
+import unittest
+
+import httpx
+
+from benchmarks.fake_services import FakeServiceConfig, run_fake_services
+from benchmarks.run import format_table, percentile
+
+
+class BenchmarkHarnessTests(unittest.TestCase):
+    def test_percentile_nearest_rank(self):
+        values = [float(v) for v in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 50.0)
+        self.assertEqual(percentile(values, 99), 99.0)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_fake_services_mimic_upstreams(self):
+        with run_fake_services(FakeServiceConfig.scaled(0, audio_bytes=400)) as fake:
+            with httpx.Client(base_url=fake.url) as client:
+                slides = client.post('/api/slides/generate', json={'topic': 'AI', 'count': 3}).json()['slides']
+                self.assertEqual(len(slides), 3)
+                self.assertTrue(slides[0]['speakerNotes'])
+                self.assertTrue(client.post('/api/podcast/tts', json={'script': []}).json()['audio'])
+
+                payment = client.post('/payment/', json={}).json()['data']['blockchainIdentifier']
+                resolve = {'blockchainIdentifier': payment}
+                state = client.post('/payment/resolve-blockchain-identifier', json=resolve).json()
+                self.assertEqual(state['data']['onChainState'], 'FundsLocked')
+                client.post('/payment/submit-result', json=resolve)
+                state = client.post('/payment/resolve-blockchain-identifier', json=resolve).json()
+                self.assertEqual(state['data']['onChainState'], 'ResultSubmitted')
+            self.assertEqual(fake.requests['/payment/resolve-blockchain-identifier'], 2)
+
+    def test_table_compares_against_baseline(self):
+        row = {'scenario': 'pipeline', 'concurrency': 1, 'requests': 4, 'errors': 0, 'p50': 1.0,
+               'p95': 2.0, 'p99': 2.0, 'throughput_rps': 1.0, 'peak_rss_mb': 100.0}
+        table = format_table([dict(row, p50=0.5)], [row])
+        self.assertIn('-50%', table)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from config import env_float, env_int
+
+
+class EnvSettingTests(unittest.TestCase):
+    def test_unset_empty_and_invalid_values_fall_back_to_the_default(self):
+        with patch.dict(os.environ, {'EMPTY': '', 'BLANK': '  ', 'WORDS': 'four'}):
+            for name in ('UNSET_SETTING', 'EMPTY', 'BLANK', 'WORDS'):
+                self.assertEqual(env_int(name, 3), 3)
+                self.assertEqual(env_float(name, 1.5), 1.5)
+
+    def test_values_are_parsed_and_clamped(self):
+        with patch.dict(os.environ, {'WORKERS': ' 0 ', 'TIMEOUT': '2.5'}):
+            self.assertEqual(env_int('WORKERS', 2), 0)
+            self.assertEqual(env_int('WORKERS', 2, minimum=1), 1)
+            self.assertEqual(env_float('TIMEOUT', 10), 2.5)
+            # Integers must be written as integers
+            self.assertEqual(env_int('TIMEOUT', 4), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+from PIL import ImageFont
+
+from font_registry import FontRegistry, text_length
+
+DEJAVU_DIR = '/usr/share/fonts/truetype/dejavu'
+
+
+class FontRegistryTests(unittest.TestCase):
+    def test_fonts_are_opened_once_per_key(self):
+        registry = FontRegistry(directories=[])
+        self.assertIs(registry.get(24), registry.get(24))
+        self.assertIsNot(registry.get(24), registry.get(28))
+
+    def test_unknown_directories_fall_back_to_default_font(self):
+        registry = FontRegistry(directories=['/nonexistent'])
+        self.assertIsNone(registry.resolve('Inter'))
+        self.assertIsNotNone(registry.get(20, family='Inter'))
+
+    @unittest.skipUnless(FontRegistry([DEJAVU_DIR]).resolve('DejaVu Sans'), 'DejaVu fonts not installed')
+    def test_resolves_family_and_weight(self):
+        registry = FontRegistry(directories=[DEJAVU_DIR])
+        self.assertTrue(registry.resolve('dejavu sans').endswith('DejaVuSans.ttf'))
+        self.assertTrue(registry.resolve('DejaVu Sans', bold=True).endswith('DejaVuSans-Bold.ttf'))
+        # Unknown brand fonts fall back to the default families
+        self.assertTrue(registry.resolve('Brand Sans').endswith('DejaVuSans.ttf'))
+        self.assertIsInstance(registry.get(54, bold=True, family='Brand Sans'), ImageFont.FreeTypeFont)
+
+    def test_text_length_is_memoized(self):
+        font = FontRegistry(directories=[]).get(20)
+        text_length.cache_clear()
+        first = text_length(font, 'Market size')
+        self.assertEqual(text_length(font, 'Market size'), first)
+        self.assertEqual(text_length.cache_info().hits, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import asyncio
+import unittest
+
+from job_scheduler import JobScheduler, SchedulerFullError
+
+
+class JobSchedulerTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.scheduler = JobScheduler(workers=1, queue_size=1)
+        await self.scheduler.start()
+
+    async def asyncTearDown(self):
+        await self.scheduler.stop()
+
+    async def test_runs_submitted_jobs(self):
+        done = asyncio.Event()
+
+        async def job():
+            done.set()
+
+        await self.scheduler.submit('job-1', job)
+        await asyncio.wait_for(done.wait(), timeout=1)
+
+    async def test_backpressure_when_queue_full(self):
+        release = asyncio.Event()
+
+        async def blocking_job():
+            await release.wait()
+
+        await self.scheduler.submit('running', blocking_job)
+        await asyncio.sleep(0)
+        await self.scheduler.try_submit('queued', blocking_job)
+
+        self.assertFalse(self.scheduler.has_capacity())
+        with self.assertRaises(SchedulerFullError):
+            await self.scheduler.try_submit('rejected', blocking_job)
+
+        stats = self.scheduler.stats()
+        self.assertEqual(stats['running'], 1)
+        self.assertEqual(stats['free_slots'], 0)
+        self.assertEqual(stats['queue_depth'], 1)
+        release.set()
+
+
+if __name__ == '__main__':
+    unittest.main()
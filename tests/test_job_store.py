@@ -0,0 +1,67 @@
+import os
+import tempfile
+import time
+import unittest
+
+from job_store import InMemoryJobStore, SQLiteJobStore
+
+
+class JobStoreContract:
+    def make_store(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.store = self.make_store()
+        self.store.create({
+            'job_id': 'job-1',
+            'status': 'awaiting_payment',
+            'payment_status': 'pending',
+            'payment_id': 'pay-1',
+            'input_data': {'text': 'AI'},
+            'identifier_from_purchaser': 'buyer',
+        })
+
+    def test_lookup_by_job_and_payment_id(self):
+        self.assertEqual(self.store.get('job-1')['input_data'], {'text': 'AI'})
+        self.assertEqual(self.store.get_by_payment_id('pay-1')['job_id'], 'job-1')
+        self.assertIsNone(self.store.get('missing'))
+
+    def test_transition_is_compare_and_set(self):
+        self.assertTrue(self.store.transition('job-1', 'pending', from_statuses=('awaiting_payment',)))
+        self.assertFalse(self.store.transition('job-1', 'pending', from_statuses=('awaiting_payment',)))
+        self.assertEqual(self.store.get('job-1')['status'], 'pending')
+
+    def test_extra_fields_round_trip(self):
+        self.store.update('job-1', trace={'slides': 1.5})
+        self.assertEqual(self.store.get('job-1')['trace'], {'slides': 1.5})
+
+    def test_prune_only_removes_old_finished_jobs(self):
+        self.store.transition('job-1', 'completed', result='done')
+        self.assertEqual(self.store.prune(ttl_seconds=3600), 0)
+        time.sleep(0.01)
+        self.assertEqual(self.store.prune(ttl_seconds=0), 1)
+        self.assertIsNone(self.store.get_by_payment_id('pay-1'))
+
+
+class InMemoryJobStoreTests(JobStoreContract, unittest.TestCase):
+    def make_store(self):
+        return InMemoryJobStore()
+
+
+class SQLiteJobStoreTests(JobStoreContract, unittest.TestCase):
+    def make_store(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        store = SQLiteJobStore(os.path.join(tmp.name, 'jobs.db'))
+        self.addCleanup(store.close)
+        return store
+
+    def test_survives_reopen(self):
+        path = self.store.path
+        reopened = SQLiteJobStore(path)
+        self.addCleanup(reopened.close)
+        self.assertEqual(reopened.get('job-1')['status'], 'awaiting_payment')
+
+
+if __name__ == '__main__':
+    unittest.main()
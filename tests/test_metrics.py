@@ -0,0 +1,43 @@
+import asyncio
+import unittest
+
+from metrics import Counter, Histogram, job_trace, record_span, render_metrics, stage_timer
+
+
+class MetricsTests(unittest.TestCase):
+    def test_histogram_renders_cumulative_buckets(self):
+        hist = Histogram('test_render_seconds', 'Test histogram', ['stage'], buckets=(1, 5))
+        hist.observe(0.5, stage='tts')
+        hist.observe(3, stage='tts')
+        text = render_metrics()
+        self.assertIn('test_render_seconds_bucket{stage="tts",le="1"} 1', text)
+        self.assertIn('test_render_seconds_bucket{stage="tts",le="5"} 2', text)
+        self.assertIn('test_render_seconds_bucket{stage="tts",le="+Inf"} 2', text)
+        self.assertIn('test_render_seconds_count{stage="tts"} 2', text)
+
+    def test_counter_labels(self):
+        counter = Counter('test_errors_total', 'Test counter', ['upstream'])
+        counter.inc(upstream='podio')
+        counter.inc(2, upstream='podio')
+        self.assertEqual(counter.value(upstream='podio'), 3)
+        self.assertIn('test_errors_total{upstream="podio"} 3', render_metrics())
+
+    def test_trace_collects_spans_from_child_tasks(self):
+        async def pipeline():
+            with stage_timer('slides'):
+                pass
+            await asyncio.gather(
+                asyncio.create_task(asyncio.to_thread(record_span, 'tts_call', 0.1, source='cache')),
+            )
+
+        with job_trace() as trace:
+            asyncio.run(pipeline())
+        names = [span['name'] for span in trace.to_dict()['spans']]
+        self.assertEqual(sorted(names), ['slides', 'tts_call'])
+
+    def test_spans_outside_a_trace_are_ignored(self):
+        record_span('orphan', 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
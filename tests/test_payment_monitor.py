@@ -0,0 +1,71 @@
+import asyncio
+import unittest
+
+from payment_monitor import PaymentMonitor
+from payment_status import PaymentStatusCache
+
+
+class PaymentMonitorTests(unittest.IsolatedAsyncioTestCase):
+    def monitor(self, states, **kwargs):
+        self.resolved = []
+        self.confirmed = []
+
+        async def resolve(identifier):
+            self.resolved.append(identifier)
+            return {'blockchainIdentifier': identifier, 'onChainState': states.get(identifier)}
+
+        async def on_confirmed(job_id, payment):
+            self.confirmed.append((job_id, payment['blockchainIdentifier']))
+
+        return PaymentMonitor(resolve, on_confirmed, **kwargs)
+
+    async def test_rounds_resolve_tracked_payments_in_batches(self):
+        states = {}
+        statuses = PaymentStatusCache()
+        monitor = self.monitor(states, statuses=statuses, batch_size=2)
+        for idx in range(3):
+            monitor.track(f'job{idx}', f'pay{idx}')
+
+        await monitor.poll()
+        await monitor.poll()
+        # Least recently checked first, so the third payment is not starved
+        self.assertEqual(self.resolved, ['pay0', 'pay1', 'pay2', 'pay0'])
+
+        states['pay1'] = 'FundsLocked'
+        await monitor.poll()
+        await asyncio.sleep(0)
+        self.assertEqual(self.confirmed, [('job1', 'pay1')])
+        self.assertFalse(monitor.is_tracking('job1'))
+        self.assertEqual(statuses.peek('job1'), 'FundsLocked')
+        self.assertEqual(monitor.stats()['tracked'], 2)
+
+    async def test_interval_backs_off_until_something_changes(self):
+        states = {}
+        monitor = self.monitor(states, interval=1, max_interval=3)
+        monitor.track('job', 'pay')
+        await monitor.poll()
+        self.assertEqual(monitor.interval, 1.5)
+        for _ in range(3):
+            await monitor.poll()
+        self.assertEqual(monitor.interval, 3)
+        states['pay'] = 'FundsLocked'
+        await monitor.poll()
+        self.assertEqual(monitor.interval, 1)
+        monitor.interval = 3
+        monitor.track('other', 'pay-other')
+        self.assertEqual(monitor.interval, 1)
+
+    async def test_loop_dispatches_paid_jobs(self):
+        monitor = self.monitor({'pay': 'FundsLocked'}, interval=0.01)
+        monitor.start()
+        self.addAsyncCleanup(monitor.stop)
+        monitor.track('job', 'pay')
+        for _ in range(100):
+            if self.confirmed:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual(self.confirmed, [('job', 'pay')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from payment_status import PaymentStatusCache
+
+
+class PaymentStatusCacheTests(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_pollers_share_one_fetch(self):
+        cache = PaymentStatusCache(ttl=60)
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return 'FundsLocked'
+
+        results = await asyncio.gather(*(cache.get('job', fetch) for _ in range(20)))
+        self.assertEqual(set(results), {'FundsLocked'})
+        self.assertEqual(calls, 1)
+        # Fresh entries are served without another call
+        self.assertEqual(await cache.get('job', fetch), 'FundsLocked')
+        self.assertEqual(calls, 1)
+        self.assertEqual(cache.stats(), {'jobs': 1, 'hits': 1, 'fetches': 1, 'coalesced': 19})
+
+    async def test_recorded_state_is_served_until_it_expires(self):
+        cache = PaymentStatusCache(ttl=0.05)
+        cache.record('job', 'FundsLocked')
+
+        async def fetch():
+            return 'ResultSubmitted'
+
+        self.assertEqual(await cache.get('job', fetch), 'FundsLocked')
+        await asyncio.sleep(0.06)
+        self.assertEqual(await cache.get('job', fetch), 'ResultSubmitted')
+        cache.forget('job')
+        self.assertIsNone(cache.peek('job'))
+
+    async def test_failed_lookups_are_not_cached_as_states(self):
+        cache = PaymentStatusCache(ttl=10, failure_ttl=1)
+        answers = ['error', 'ResultSubmitted']
+
+        async def fetch():
+            return answers.pop(0)
+
+        with patch('payment_status.time.monotonic', return_value=100):
+            cache.record('job', 'FundsLocked')
+        # Past the TTL Masumi fails: pollers see it, the known state stays
+        with patch('payment_status.time.monotonic', return_value=110):
+            self.assertEqual(await cache.get('job', fetch), 'error')
+            self.assertEqual(await cache.get('job', fetch), 'error')
+            self.assertEqual(cache.peek('job'), 'FundsLocked')
+        # ...and the first poll after the short failure TTL asks again
+        with patch('payment_status.time.monotonic', return_value=111):
+            self.assertEqual(await cache.get('job', fetch), 'ResultSubmitted')
+            self.assertEqual(await cache.get('job', fetch), 'ResultSubmitted')
+        self.assertEqual(answers, [])
+
+if __name__ == '__main__':
+    unittest.main()
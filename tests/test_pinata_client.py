@@ -0,0 +1,89 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+import pinata_client
+from metrics import UPSTREAM_RETRIES
+from pinata_client import PinataError, drain_background_uploads, publish_in_background, upload_file_async
+
+
+class PinataUploadTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.mp4')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(os.urandom(50_000))
+        self.addCleanup(os.remove, self.path)
+        env = patch.dict(os.environ, {'PINATA_JWT': 'jwt', 'PINATA_RETRY_BACKOFF': '0', 'PINATA_UPLOAD_RETRIES': '2'})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def serve(self, *statuses):
+        self.requests = []
+        responses = list(statuses)
+
+        def handler(request):
+            self.requests.append(len(request.read()))
+            status = responses.pop(0) if responses else 200
+            return httpx.Response(status, json={'IpfsHash': 'QmVideo'} if status == 200 else {'error': 'nope'})
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.addAsyncCleanup(client.aclose)
+        patcher = patch.object(pinata_client, 'get_client', return_value=client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_retries_server_errors_with_the_whole_file(self):
+        self.serve(503, 429)
+        retries = UPSTREAM_RETRIES.value(upstream='pinata', endpoint='pinFileToIPFS')
+        data = await upload_file_async(self.path)
+        self.assertEqual(data['ipfsUrl'], 'ipfs://QmVideo')
+        self.assertEqual(len(self.requests), 3)
+        # Every attempt re-sends the file from the start
+        self.assertTrue(all(size > 50_000 for size in self.requests))
+        self.assertEqual(UPSTREAM_RETRIES.value(upstream='pinata', endpoint='pinFileToIPFS'), retries + 2)
+
+    async def test_gives_up_after_retries_and_on_client_errors(self):
+        self.serve(500, 500, 500)
+        with self.assertRaises(PinataError):
+            await upload_file_async(self.path)
+        self.assertEqual(len(self.requests), 3)
+
+        self.serve(401)
+        with self.assertRaises(PinataError):
+            await upload_file_async(self.path)
+        self.assertEqual(len(self.requests), 1)
+
+    async def test_background_publish_reports_pending_then_pinned(self):
+        self.serve(503)
+        reports = []
+
+        async def on_publish(ipfs):
+            reports.append(ipfs)
+
+        await publish_in_background(self.path, on_publish)
+        self.assertEqual(reports, [{'status': 'pending'}])
+        await drain_background_uploads(timeout=5)
+        self.assertEqual(reports[1]['status'], 'pinned')
+        self.assertEqual(reports[1]['ipfsHash'], 'QmVideo')
+
+    async def test_drain_cancels_uploads_that_outlive_it(self):
+        reports = []
+
+        async def on_publish(ipfs):
+            reports.append(ipfs)
+
+        async def stalled(*args, **kwargs):
+            await asyncio.sleep(60)
+
+        with patch.object(pinata_client, 'upload_file_async', side_effect=stalled):
+            await publish_in_background(self.path, on_publish)
+            await drain_background_uploads(timeout=0.05)
+        self.assertEqual(reports[-1]['status'], 'failed')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+import urllib.request
+from unittest.mock import patch
+
+import pipeline
+import render_remotion
+import video_generation
+from pipeline import pipeline_capacity, render_stage
+from schemas import Slide
+from stage_pipeline import Stage, StagePipeline
+from video_generation import RenderCancelledError, VideoGenerationError
+
+
+class PipelineStageTests(unittest.TestCase):
+    def test_stages_are_sized_from_the_environment(self):
+        env = {'PIPELINE_RENDER_WORKERS': '3', 'PIPELINE_RENDER_RETRIES': '', 'PIPELINE_PUBLISH_WORKERS': 'x'}
+        with patch.dict(os.environ, env):
+            stages = {stage.name: stage for stage in pipeline._stages()}
+            self.assertEqual((stages['render'].workers, stages['render'].retries), (3, 1))
+            self.assertEqual(stages['publish'].workers, 2)
+            self.assertEqual(pipeline_capacity(), 4 + 3 + 2)
+            # A Stage built directly keeps the sizes it was given
+            self.assertEqual(Stage('render', render_stage, workers=1).workers, 1)
+
+
+class RenderRetryTests(unittest.IsolatedAsyncioTestCase):
+    async def test_a_retried_render_still_has_the_narration(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        audio_dir = os.path.join(tmp.name, 'p1_assets')
+        os.makedirs(audio_dir)
+        audio_path = os.path.join(audio_dir, 'slide-01.mp3')
+        with open(audio_path, 'wb') as f:
+            f.write(b'narration')
+
+        served = []
+
+        def flaky_render(props, output_mp4, settings, on_progress=None, cancel=None):
+            url = props['slides'][0]['audioUrl']
+            with urllib.request.urlopen(url) as response:
+                served.append(response.read())
+            if len(served) == 1:
+                raise RuntimeError('browser crashed')
+            with open(output_mp4, 'wb') as f:
+                f.write(b'video')
+            return True
+
+        job = {
+            'topic': 'AI',
+            'project_id': 'p1',
+            'audio_dir': audio_dir,
+            'slides': [Slide(title='Intro', audioPath=audio_path, duration=1)],
+        }
+        stage = Stage('render', render_stage, retries=1, retry_on=(VideoGenerationError,), backoff=0)
+        stage_pipeline = StagePipeline([stage])
+        self.addAsyncCleanup(stage_pipeline.stop)
+        with patch.dict(os.environ, {'MEDIA_DIR': tmp.name, 'VIDEO_ENGINE': 'remotion'}), \
+                patch.object(render_remotion, '_render_with_server', side_effect=flaky_render):
+            job = await asyncio.wait_for(stage_pipeline.run(job), 10)
+
+        self.assertEqual(served, [b'narration', b'narration'])
+        self.assertTrue(os.path.isfile(job['video_path']))
+        self.assertFalse(os.path.exists(os.path.join(tmp.name, 'p1_render')))
+
+
+class RenderCancellationTests(unittest.IsolatedAsyncioTestCase):
+    async def test_cancelling_a_job_stops_its_render_thread(self):
+        started = threading.Event()
+        stopped = []
+
+        def blocking_render(cancel=None, **_options):
+            started.set()
+            stopped.append(cancel.wait(5))
+            raise RenderCancelledError('Render cancelled')
+
+        stage_pipeline = StagePipeline([Stage('render', render_stage, retries=1, retry_on=(VideoGenerationError,), backoff=0)])
+        self.addAsyncCleanup(stage_pipeline.stop)
+        job = {'topic': 'AI', 'project_id': 'p1', 'audio_dir': '/nonexistent', 'slides': []}
+        with patch.object(video_generation, 'render_video', side_effect=blocking_render) as render:
+            task = asyncio.create_task(stage_pipeline.run(job))
+            await asyncio.to_thread(started.wait, 5)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            # The render thread saw the cancel and returned before the stage let go
+            await asyncio.sleep(0.05)
+            self.assertEqual(stopped, [True])
+            self.assertEqual(render.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,206 @@
+import asyncio
+import os
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+import podio_client
+from metrics import UPSTREAM_HEDGES
+from podio_client import PodioAIError, PodioUnavailableError, _SlideStreamParser, generate_slides_async, generate_tts_async, stream_slides_async
+from resilience import CircuitBreaker
+
+
+class PodioClientTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        env = patch.dict(os.environ, {'PODIO_RETRY_BACKOFF': '0', 'PODIO_RETRIES': '2'})
+        env.start()
+        self.addCleanup(env.stop)
+        breaker = patch.object(podio_client, '_breaker', CircuitBreaker('podio', failure_threshold=3, reset_seconds=60))
+        latencies = patch.object(podio_client, '_latencies', {})
+        breaker.start()
+        latencies.start()
+        self.addCleanup(breaker.stop)
+        self.addCleanup(latencies.stop)
+
+    def serve(self, handler):
+        self.calls = 0
+
+        async def counted(request):
+            self.calls += 1
+            return await handler(request)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(counted))
+        self.addAsyncCleanup(client.aclose)
+        patcher = patch.object(podio_client, 'get_client', return_value=client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_transient_errors_are_retried(self):
+        statuses = [502, 503]
+
+        async def handler(request):
+            status = statuses.pop(0) if statuses else 200
+            return httpx.Response(status, json={'slides': []})
+
+        self.serve(handler)
+        self.assertEqual(await generate_slides_async('AI'), {'slides': []})
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(podio_client.circuit_breaker().state, 'closed')
+
+    async def test_client_errors_are_not_retried(self):
+        async def handler(request):
+            return httpx.Response(400, json={'error': 'bad topic'})
+
+        self.serve(handler)
+        with self.assertRaises(PodioAIError):
+            await generate_slides_async('AI')
+        self.assertEqual(self.calls, 1)
+
+    async def test_circuit_opens_and_fails_fast(self):
+        async def handler(request):
+            return httpx.Response(503)
+
+        self.serve(handler)
+        with self.assertRaises(PodioAIError):
+            await generate_slides_async('AI')
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(podio_client.circuit_breaker().state, 'open')
+
+        with self.assertRaises(PodioUnavailableError) as ctx:
+            await generate_slides_async('AI')
+        self.assertEqual(self.calls, 3)
+        self.assertGreater(ctx.exception.retry_after, 0)
+
+    async def test_slow_tts_calls_are_hedged(self):
+        delays = [0.01] * 20 + [5.0, 0.01]
+
+        async def handler(request):
+            await asyncio.sleep(delays.pop(0))
+            return httpx.Response(200, json={'audio': 'AAAA'})
+
+        self.serve(handler)
+        with patch.dict(os.environ, {'PODIO_HEDGE_TTS': 'true', 'PODIO_HEDGE_MIN_SECONDS': '0.05'}):
+            for _ in range(20):
+                await generate_tts_async([{'speaker': 'A', 'line': 'hi'}])
+            hedges = UPSTREAM_HEDGES.value(upstream='podio', endpoint='/api/podcast/tts')
+            started = asyncio.get_running_loop().time()
+            self.assertEqual((await generate_tts_async([{'speaker': 'A', 'line': 'hi'}]))['audio'], 'AAAA')
+        self.assertLess(asyncio.get_running_loop().time() - started, 1)
+        self.assertEqual(self.calls, 22)
+        self.assertEqual(UPSTREAM_HEDGES.value(upstream='podio', endpoint='/api/podcast/tts'), hedges + 1)
+
+
+    async def test_stream_slides_retries_before_the_first_slide(self):
+        statuses = [503]
+
+        async def handler(request):
+            if statuses:
+                return httpx.Response(statuses.pop(0))
+            body = b'{"title": "A"}\n{"slide": {"title": "B"}}\n'
+            return httpx.Response(200, headers={'Content-Type': 'application/x-ndjson'}, content=body)
+
+        self.serve(handler)
+        self.assertEqual([s['title'] async for s in stream_slides_async('AI')], ['A', 'B'])
+        self.assertEqual(self.calls, 2)
+
+
+class SlideStreamParserTests(unittest.TestCase):
+    def feed_in_chunks(self, parser, body, size=7):
+        arrived = []
+        for start in range(0, len(body), size):
+            arrived.append([s['title'] for s in parser.feed(body[start:start + size])])
+        arrived.append([s['title'] for s in parser.close()])
+        return arrived
+
+    def test_json_slides_are_returned_as_each_element_completes(self):
+        body = '{"slides": [{"title": "A", "bullets": ["x]"]}, {"title": "B"}], "meta": {}}'
+        arrived = self.feed_in_chunks(_SlideStreamParser('application/json'), body)
+        flat = [title for chunk in arrived for title in chunk]
+        self.assertEqual(flat, ['A', 'B'])
+        # "A" is out before the rest of the body has arrived
+        self.assertLess(next(i for i, chunk in enumerate(arrived) if chunk), len(arrived) - 3)
+
+    def test_ndjson_and_sse(self):
+        ndjson = '{"title": "A"}\n{"title": "B"}'
+        self.assertEqual(sum(self.feed_in_chunks(_SlideStreamParser('application/x-ndjson'), ndjson), []), ['A', 'B'])
+        sse = 'event: slide\ndata: {"title": "A"}\n\ndata: {"slides": [{"title": "B"}]}\n\ndata: [DONE]\n\n'
+        self.assertEqual(sum(self.feed_in_chunks(_SlideStreamParser('text/event-stream'), sse), []), ['A', 'B'])
+
+    def test_other_json_bodies_fall_back_to_a_plain_parse(self):
+        parser = _SlideStreamParser('application/json; charset=utf-8')
+        self.assertEqual(parser.feed('{"slide": {"title": "A"}}'), [])
+        self.assertEqual([s['title'] for s in parser.close()], ['A'])
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    def setUp(self):
+        self.now = 100.0
+        clock = patch('resilience.time.monotonic', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_half_open_probe_closes_or_reopens(self):
+        breaker = CircuitBreaker('podio', failure_threshold=2, reset_seconds=10)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.allow())
+        # reset_seconds elapsed: one probe, then nothing until it reports back
+        self.now += 10
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        self.now += 10
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.stats(), {'state': 'closed', 'failures': 0, 'retry_after': 0.0})
+
+    def test_probe_that_never_reports_back_expires(self):
+        breaker = CircuitBreaker('podio', failure_threshold=1, reset_seconds=10)
+        breaker.record_failure()
+        self.now += 10
+        self.assertTrue(breaker.allow())
+        # The probe was cancelled and recorded nothing
+        self.now += 4
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.retry_after(), 6)
+        self.now += 6
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, 'half_open')
+
+
+class CircuitProbeCancellationTests(unittest.IsolatedAsyncioTestCase):
+    async def test_cancelled_probe_does_not_wedge_the_circuit(self):
+        breaker = CircuitBreaker('podio', failure_threshold=1, reset_seconds=0.05)
+        release = asyncio.Event()
+
+        async def handler(request):
+            await release.wait()
+            return httpx.Response(200, json={'slides': []})
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.addAsyncCleanup(client.aclose)
+        with patch.object(podio_client, '_breaker', breaker), \
+                patch.object(podio_client, 'get_client', return_value=client):
+            breaker.record_failure()
+            await asyncio.sleep(0.05)
+            probe = asyncio.create_task(generate_slides_async('AI'))
+            await asyncio.sleep(0.01)
+            self.assertEqual(breaker.state, 'half_open')
+            probe.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await probe
+            with self.assertRaises(PodioUnavailableError):
+                await generate_slides_async('AI')
+
+            await asyncio.sleep(0.05)
+            release.set()
+            self.assertEqual(await generate_slides_async('AI'), {'slides': []})
+            self.assertEqual(breaker.state, 'closed')
+
+
+if __name__ == '__main__':
+    unittest.main()
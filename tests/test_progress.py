@@ -0,0 +1,47 @@
+import asyncio
+import threading
+import unittest
+
+from progress import ProgressHub, emit, job_progress
+
+
+class ProgressHubTests(unittest.IsolatedAsyncioTestCase):
+    async def test_subscriber_gets_history_then_live_events_from_threads(self):
+        hub = ProgressHub(history=2)
+        for step in range(3):
+            hub.publish('job', {'event': 'tts', 'slide': step + 1})
+
+        with hub.subscribe('job') as subscription:
+            # The history is bounded: the first event has been dropped
+            self.assertEqual([(await subscription.get())['slide'] for _ in range(2)], [2, 3])
+            threading.Thread(target=hub.publish, args=('job', {'event': 'render', 'progress': 0.5})).start()
+            live = await subscription.get(timeout=2)
+            self.assertEqual((live['event'], live['id']), ('render', f'{hub.epoch}-4'))
+            self.assertIsNone(await subscription.get(timeout=0.01))
+
+        with hub.subscribe('job', after=hub.resume_after('job', f'{hub.epoch}-3')) as subscription:
+            self.assertEqual((await subscription.get())['id'], f'{hub.epoch}-4')
+
+    def test_ids_from_another_process_start_over(self):
+        hub = ProgressHub()
+        for _ in range(3):
+            hub.publish('job', {'event': 'tts'})
+        self.assertEqual(hub.resume_after('job', f'{hub.epoch}-2'), 2)
+        for stale in ('2', 'a1b2c3d4-2', None, f'{hub.epoch}-x', f'{hub.epoch}-57'):
+            self.assertEqual(hub.resume_after('job', stale), 0)
+
+    async def test_emit_reaches_the_job_from_tasks_and_threads(self):
+        events = []
+
+        async def upload():
+            emit('upload', progress=0.5)
+
+        with job_progress('job', sink=events.append):
+            await asyncio.to_thread(emit, 'render', progress=1.0)
+            await asyncio.create_task(upload())
+        emit('ignored')
+        self.assertEqual(sorted(e['event'] for e in events), ['render', 'upload'])
+
+
+if __name__ == '__main__':
+    unittest.main()
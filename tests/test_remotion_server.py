@@ -0,0 +1,141 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import render_remotion
+from remotion_server import RemotionServer, RemotionServerError, RenderCancelled
+
+
+class FakeSidecar:
+    """
+    Speaks the server.mjs protocol; each render reports three progress steps.
+    A `stall`ed render goes quiet after the first step until it is deleted.
+    """
+
+    def __init__(self, fail=False, step_delay=0.0, stall=False):
+        self.fail = fail
+        self.step_delay = step_delay
+        self.stall = stall
+        self.renders = []
+        self.deleted = []
+        self.cancelled = threading.Event()
+        sidecar = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == '/health':
+                    return self._send({'ready': True, 'error': None})
+                self.send_response(200)
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                output = sidecar.renders[-1]['output']
+                for progress in (0.0, 0.5, 1.0):
+                    self.wfile.write(b'\n')
+                    self.wfile.write(json.dumps({'status': 'rendering', 'progress': progress}).encode() + b'\n')
+                    self.wfile.flush()
+                    if sidecar.cancelled.wait(5 if sidecar.stall else sidecar.step_delay):
+                        self.wfile.write(json.dumps({'status': 'cancelled'}).encode() + b'\n')
+                        return
+                final = {'status': 'failed', 'error': 'boom'} if sidecar.fail else {'status': 'done', 'progress': 1.0, 'output': output}
+                self.wfile.write(json.dumps(final).encode() + b'\n')
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                sidecar.renders.append(body)
+                self._send({'id': 'r1', 'status': 'queued'})
+
+            def do_DELETE(self):
+                sidecar.deleted.append(self.path)
+                sidecar.cancelled.set()
+                self._send({'id': 'r1', 'status': 'cancelled'})
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class RemotionServerTests(unittest.TestCase):
+    def sidecar(self, **kwargs):
+        sidecar = FakeSidecar(**kwargs)
+        self.addCleanup(sidecar.close)
+        client = RemotionServer(url=sidecar.url)
+        self.addCleanup(client.close)
+        return sidecar, client
+
+    def test_render_streams_progress(self):
+        sidecar, client = self.sidecar()
+        progress = []
+        output = client.render({'slides': []}, '/tmp/out.mp4', on_progress=lambda s: progress.append(s['progress']))
+        self.assertEqual(output, '/tmp/out.mp4')
+        self.assertEqual(progress, [0.0, 0.5, 1.0, 1.0])
+        self.assertEqual(sidecar.renders[0]['props'], {'slides': []})
+
+    def test_failed_render_raises(self):
+        _, client = self.sidecar(fail=True)
+        with self.assertRaisesRegex(RemotionServerError, 'boom'):
+            client.render({'slides': []}, '/tmp/out.mp4')
+
+    def test_cancel_deletes_render(self):
+        sidecar, client = self.sidecar(step_delay=0.05)
+        cancel = threading.Event()
+        with self.assertRaises(RenderCancelled):
+            client.render({'slides': []}, '/tmp/out.mp4', on_progress=lambda s: cancel.set(), cancel=cancel)
+        self.assertEqual(sidecar.deleted, ['/renders/r1'])
+
+    def test_cancel_reaches_a_render_that_reports_nothing(self):
+        sidecar, client = self.sidecar(stall=True)
+        cancel = threading.Event()
+        threading.Timer(0.1, cancel.set).start()
+        started = time.monotonic()
+        with self.assertRaises(RenderCancelled):
+            client.render({'slides': []}, '/tmp/out.mp4', cancel=cancel)
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(sidecar.deleted, ['/renders/r1'])
+
+    def test_missing_checkout_is_remembered(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch.dict(os.environ, {'PODIO_AI_DIR': os.path.join(tmp, 'missing')}):
+            client = RemotionServer()
+            self.addCleanup(client.close)
+            with self.assertRaisesRegex(RemotionServerError, 'not found'):
+                client.start()
+            with patch.object(client, '_spawn') as spawn, self.assertRaises(RemotionServerError):
+                client.start()
+            spawn.assert_not_called()
+
+    def test_render_remotion_uses_server(self):
+        sidecar, client = self.sidecar()
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch.dict(os.environ, {'MEDIA_DIR': tmp}), \
+                patch.object(render_remotion, 'get_render_server', return_value=client), \
+                patch.object(render_remotion.subprocess, 'run') as run:
+            path = render_remotion.render_remotion_video([{'title': 'One', 'duration': 5}], 'project')
+        run.assert_not_called()
+        self.assertEqual(sidecar.renders[0]['output'], path)
+        self.assertEqual(sidecar.renders[0]['props']['slides'][0]['title'], 'One')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import unittest
+from unittest.mock import patch
+
+import render_settings
+from render_settings import auto_concurrency, render_slot, resolve_render_settings
+
+
+class RenderSettingsTests(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.dict(os.environ, {'REMOTION_CONCURRENCY': '', 'FFMPEG_CONCURRENCY': ''})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def host(self, cpus, memory_mb):
+        cpu = patch.object(render_settings, 'available_cpus', return_value=cpus)
+        mem = patch.object(render_settings, 'available_memory', return_value=memory_mb << 20)
+        cpu.start()
+        mem.start()
+        self.addCleanup(cpu.stop)
+        self.addCleanup(mem.stop)
+
+    def test_concurrency_shares_cpus_between_running_renders(self):
+        self.host(cpus=32, memory_mb=64_000)
+        self.assertEqual(auto_concurrency('remotion'), 32)
+        with render_slot(), render_slot(), render_slot():
+            self.assertEqual(auto_concurrency('remotion'), 8)
+        self.assertEqual(auto_concurrency('remotion'), 32)
+
+    def test_concurrency_is_bounded_by_free_memory(self):
+        self.host(cpus=8, memory_mb=1_000)
+        self.assertEqual(auto_concurrency('remotion'), 2)
+        self.assertEqual(auto_concurrency('ffmpeg'), 6)
+        self.host(cpus=2, memory_mb=100)
+        self.assertEqual(auto_concurrency('remotion', running=3), 1)
+
+    def test_overrides_and_codec_defaults(self):
+        self.host(cpus=4, memory_mb=64_000)
+        settings = resolve_render_settings('ffmpeg', fps=24, output_format='webm', crf=40, resolution=720)
+        self.assertEqual((settings.codec, settings.crf, settings.resolution, settings.concurrency), ('vp9', 40, 720, 4))
+        self.assertIsNone(settings.gl)
+        with patch.dict(os.environ, {'REMOTION_CONCURRENCY': '3'}):
+            self.assertEqual(resolve_render_settings('remotion').concurrency, 3)
+            self.assertEqual(resolve_render_settings('remotion', concurrency=2).concurrency, 2)
+        with self.assertRaises(ValueError):
+            resolve_render_settings('ffmpeg', output_format='mp4', codec='vp9')
+
+    def test_requested_concurrency_is_capped_by_the_host(self):
+        self.host(cpus=4, memory_mb=64_000)
+        self.assertEqual(resolve_render_settings('ffmpeg', concurrency=10_000).concurrency, 4)
+        # The cap is the whole host, not this render's share of it
+        with render_slot(), render_slot():
+            self.assertEqual(resolve_render_settings('ffmpeg', concurrency=3).concurrency, 3)
+        self.host(cpus=32, memory_mb=1_000)
+        self.assertEqual(resolve_render_settings('remotion', concurrency=32).concurrency, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
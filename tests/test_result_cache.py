@@ -0,0 +1,103 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from result_cache import ResultCache, result_key
+
+PINNED = {'status': 'pinned', 'ipfsHash': 'QmCid', 'ipfsUrl': 'ipfs://QmCid', 'gatewayUrl': 'https://gw/QmCid'}
+
+
+class ResultKeyTests(unittest.TestCase):
+    def test_topic_is_normalized_and_parameters_are_part_of_the_key(self):
+        key = result_key('AI  and jobs', count=5, style='Modern')
+        self.assertEqual(result_key('  ai and JOBS\n', count=5, style='Modern'), key)
+        self.assertNotEqual(result_key('AI and jobs', count=6, style='Modern'), key)
+        self.assertNotEqual(result_key('AI and work', count=5, style='Modern'), key)
+
+
+class ResultCacheTests(unittest.IsolatedAsyncioTestCase):
+    async def test_identical_concurrent_jobs_run_once(self):
+        cache = ResultCache()
+        calls = []
+
+        async def produce(publish):
+            calls.append(publish)
+            await asyncio.sleep(0.01)
+            cache.put('key', 'done', PINNED)
+            return 'done'
+
+        results = await asyncio.gather(*(cache.run('key', produce) for _ in range(3)))
+        self.assertEqual(results, ['done'] * 3)
+        self.assertEqual(calls, [None])
+
+        published = []
+
+        async def on_publish(ipfs):
+            published.append(ipfs)
+
+        # Later repeats are served from the cache, CID included
+        self.assertEqual(await cache.run('key', produce, on_publish), 'done')
+        self.assertEqual(published, [PINNED])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['coalesced'], 2)
+
+    async def test_failures_are_shared_but_not_cached(self):
+        cache = ResultCache()
+        calls = []
+
+        async def produce(publish):
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise RuntimeError('render failed')
+
+        results = await asyncio.gather(cache.run('key', produce), cache.run('key', produce), return_exceptions=True)
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        with self.assertRaises(RuntimeError):
+            await cache.run('key', produce)
+        self.assertEqual(len(calls), 2)
+
+    async def test_publish_events_reach_every_waiting_job(self):
+        cache = ResultCache()
+        pin = asyncio.Event()
+        events = {'a': [], 'b': []}
+
+        async def produce(publish):
+            await publish({'status': 'pending'})
+
+            async def background():
+                await pin.wait()
+                await publish(PINNED)
+
+            asyncio.create_task(background())
+            return 'pending'
+
+        def recorder(name):
+            async def on_publish(ipfs):
+                events[name].append(ipfs['status'])
+            return on_publish
+
+        results = await asyncio.gather(cache.run('key', produce, recorder('a')), cache.run('key', produce, recorder('b')))
+        self.assertEqual(results, ['pending', 'pending'])
+        pin.set()
+        await asyncio.sleep(0.01)
+        self.assertEqual(events, {'a': ['pending', 'pinned'], 'b': ['pending', 'pinned']})
+
+    async def test_entries_expire_and_are_bounded(self):
+        cache = ResultCache(ttl=10, max_entries=2)
+        with patch('result_cache.time.monotonic', return_value=100):
+            cache.put('a', 'A', PINNED)
+            cache.put('b', 'B', PINNED)
+            cache.lookup('a')
+            cache.put('c', 'C', PINNED)
+        # Least recently used goes first
+        with patch('result_cache.time.monotonic', return_value=105):
+            self.assertIsNone(cache.lookup('b'))
+            self.assertEqual(cache.lookup('a')['result'], 'A')
+        with patch('result_cache.time.monotonic', return_value=111):
+            self.assertIsNone(cache.lookup('c'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
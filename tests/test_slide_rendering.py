@@ -0,0 +1,129 @@
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from PIL import Image
+
+import slide_rendering
+from schemas import Slide
+from slide_rendering import (
+    _draw_linear_gradient,
+    _parse_linear_gradient,
+    _resolve_positions,
+    render_slide,
+    render_slides,
+    shutdown_render_pool,
+)
+
+
+class GradientTests(unittest.TestCase):
+    def assertColorClose(self, actual, expected, tolerance=3):
+        for a, e in zip(actual, expected):
+            self.assertLessEqual(abs(a - e), tolerance, f'{actual} != {expected}')
+
+    def test_parses_angle_and_stops(self):
+        direction, stops = _parse_linear_gradient('linear-gradient(135deg, #1e1b4b 0%, #0f172a 100%)')
+        self.assertEqual(direction, 135.0)
+        self.assertEqual(stops, [((30, 27, 75), 0.0), ((15, 23, 42), 1.0)])
+
+    def test_missing_positions_follow_css(self):
+        self.assertEqual(_resolve_positions([None, None, None]), [0.0, 0.5, 1.0])
+        self.assertEqual(_resolve_positions([None, 0.8, 0.4, None]), [0.0, 0.8, 0.8, 1.0])
+
+    def test_unparseable_gradient_falls_back_to_vertical(self):
+        direction, stops = _parse_linear_gradient('radial-gradient(circle, #111111, #eeeeee)')
+        self.assertEqual(direction, 180.0)
+        self.assertEqual([color for color, _ in stops], [(17, 17, 17), (238, 238, 238)])
+
+    def test_angled_gradient_runs_corner_to_corner(self):
+        image = _draw_linear_gradient(320, 180, *_parse_linear_gradient('linear-gradient(135deg, #000000, #ffffff)'))
+        self.assertEqual(image.size, (320, 180))
+        self.assertColorClose(image.getpixel((0, 0)), (0, 0, 0))
+        self.assertColorClose(image.getpixel((319, 179)), (255, 255, 255))
+        self.assertColorClose(image.getpixel((160, 90)), (128, 128, 128))
+
+    def test_to_corner_makes_other_corners_midway(self):
+        image = _draw_linear_gradient(400, 100, *_parse_linear_gradient('linear-gradient(to bottom right, black, white)'))
+        self.assertColorClose(image.getpixel((399, 0)), (128, 128, 128))
+        self.assertColorClose(image.getpixel((0, 99)), (128, 128, 128))
+
+    def test_multi_stop_horizontal(self):
+        image = _draw_linear_gradient(100, 10, *_parse_linear_gradient('linear-gradient(to right, red, blue 50%, lime)'))
+        self.assertColorClose(image.getpixel((0, 5)), (255, 0, 0))
+        self.assertColorClose(image.getpixel((50, 5)), (0, 0, 255), tolerance=8)
+        self.assertColorClose(image.getpixel((99, 5)), (0, 255, 0))
+
+    def test_render_slide_with_gradient(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = render_slide(
+                Slide(title='Growth', gradient='linear-gradient(180deg, #000000 0%, #ffffff 100%)'),
+                os.path.join(tmp, 'slide.png'),
+                format='4:5',
+            )
+            with Image.open(path) as image:
+                self.assertEqual(image.size, (1080, 1350))
+                self.assertColorClose(image.getpixel((5, 1345)), (255, 255, 255))
+
+
+class BatchRenderTests(unittest.TestCase):
+    def setUp(self):
+        # Distinct background colors so the output order can be checked
+        self.slides = [Slide(title=f'Slide {idx}', backgroundColor=color)
+                       for idx, color in enumerate(['#ff0000', '#00ff00', '#0000ff'])]
+
+    def test_pool_renders_in_order_to_files(self):
+        self.addCleanup(shutdown_render_pool)
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = render_slides(self.slides, tmp, encoding='jpeg', workers=2)
+            self.assertEqual([os.path.basename(p) for p in paths], ['slide-01.jpg', 'slide-02.jpg', 'slide-03.jpg'])
+            with Image.open(paths[1]) as image:
+                r, g, b = image.getpixel((5, 5))
+                self.assertGreater(g, 200)
+                self.assertLess(r, 50)
+
+    def test_pool_is_reused_across_deck_sizes(self):
+        self.addCleanup(shutdown_render_pool)
+        with patch.dict(os.environ, {'SLIDE_RENDER_WORKERS': ''}):
+            render_slides(self.slides, encoding='jpeg', workers=2)
+            pool = slide_rendering._pool
+            self.assertIsNotNone(pool)
+            render_slides(self.slides[:2], encoding='jpeg', workers=2)
+            self.assertIs(slide_rendering._pool, pool)
+
+    def test_workers_bounds_the_slides_in_the_pool(self):
+        pool = ThreadPoolExecutor(max_workers=8)
+        self.addCleanup(pool.shutdown)
+        lock = threading.Lock()
+        state = {'running': 0, 'peak': 0}
+
+        def tracked(job):
+            with lock:
+                state['running'] += 1
+                state['peak'] = max(state['peak'], state['running'])
+            time.sleep(0.02)
+            with lock:
+                state['running'] -= 1
+            return job['slide']['title'].encode()
+
+        slides = [Slide(title=f'Slide {idx}') for idx in range(7)]
+        with patch.object(slide_rendering, '_get_pool', return_value=pool), \
+                patch.object(slide_rendering, '_render_job', side_effect=tracked):
+            images = render_slides(slides, workers=3)
+        self.assertEqual(images, [f'Slide {idx}'.encode() for idx in range(7)])
+        self.assertEqual(state['peak'], 3)
+
+    def test_in_memory_webp(self):
+        images = render_slides(self.slides, format='9:16', encoding='webp', workers=1)
+        self.assertEqual(len(images), 3)
+        with Image.open(io.BytesIO(images[2])) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (720, 1280))
+
+
+if __name__ == '__main__':
+    unittest.main()
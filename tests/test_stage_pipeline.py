@@ -0,0 +1,139 @@
+import asyncio
+import contextvars
+import unittest
+
+from stage_pipeline import Stage, StagePipeline
+
+current_job = contextvars.ContextVar('current_job', default=None)
+
+
+class StagePipelineTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.pipelines = []
+
+    async def asyncTearDown(self):
+        for pipeline in self.pipelines:
+            await pipeline.stop()
+
+    def pipeline(self, stages, **kwargs):
+        pipeline = StagePipeline(stages, **kwargs)
+        self.pipelines.append(pipeline)
+        return pipeline
+
+    async def test_jobs_occupy_different_stages_at_once(self):
+        events = []
+
+        def step(name):
+            async def run(job):
+                events.append((name, job['id'], 'start'))
+                await asyncio.sleep(0.05)
+                events.append((name, job['id'], 'end'))
+                job.setdefault('path', []).append(name)
+                return job
+            return run
+
+        pipeline = self.pipeline([Stage('render', step('render')), Stage('publish', step('publish'))])
+        jobs = await asyncio.gather(*(pipeline.run({'id': idx}) for idx in range(2)))
+
+        self.assertEqual([job['path'] for job in jobs], [['render', 'publish']] * 2)
+        # Job 1 renders while job 0 publishes
+        overlap = events.index(('render', 1, 'start')) < events.index(('publish', 0, 'end'))
+        self.assertTrue(overlap)
+        self.assertLess(events.index(('publish', 0, 'start')), events.index(('render', 1, 'end')))
+
+    async def test_retries_matching_failures(self):
+        calls = []
+
+        async def flaky(job):
+            calls.append(job['id'])
+            if len(calls) == 1:
+                raise ConnectionError('render crashed')
+            return job
+
+        async def broken(job):
+            raise ValueError('bad input')
+
+        pipeline = self.pipeline([Stage('render', flaky, retries=1, retry_on=(ConnectionError,), backoff=0)])
+        self.assertEqual(await pipeline.run({'id': 1}), {'id': 1})
+        self.assertEqual(calls, [1, 1])
+
+        pipeline = self.pipeline([Stage('render', broken, retries=3, retry_on=(ConnectionError,), backoff=0)])
+        with self.assertRaises(ValueError):
+            await pipeline.run({'id': 2})
+
+        async def refused(job):
+            calls.append(job['id'])
+            raise ConnectionRefusedError('render cancelled upstream')
+
+        pipeline = self.pipeline([Stage('render', refused, retries=3, retry_on=(ConnectionError,),
+                                        no_retry=(ConnectionRefusedError,), backoff=0)])
+        with self.assertRaises(ConnectionRefusedError):
+            await pipeline.run({'id': 3})
+        self.assertEqual(calls, [1, 1, 3])
+
+    async def test_cancelling_a_job_cancels_its_running_stage(self):
+        started = asyncio.Event()
+        cancelled = []
+
+        async def slow(job):
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(job['id'])
+                raise
+            return job
+
+        async def quick(job):
+            return job
+
+        pipeline = self.pipeline([Stage('render', slow)])
+        task = asyncio.create_task(pipeline.run({'id': 1}))
+        await started.wait()
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0)
+        self.assertEqual(cancelled, [1])
+
+        # The worker is free again afterwards
+        pipeline = self.pipeline([Stage('render', quick)])
+        self.assertEqual(await asyncio.wait_for(pipeline.run({'id': 2}), 1), {'id': 2})
+
+    async def test_cancelled_jobs_are_dropped_from_the_queue(self):
+        release = asyncio.Event()
+        ran = []
+
+        async def run(job):
+            ran.append(job['id'])
+            await release.wait()
+            return job
+
+        pipeline = self.pipeline([Stage('render', run)])
+        first = asyncio.create_task(pipeline.run({'id': 1}))
+        queued = asyncio.create_task(pipeline.run({'id': 2}))
+        await asyncio.sleep(0.01)
+        queued.cancel()
+        release.set()
+        self.assertEqual(await first, {'id': 1})
+        await asyncio.sleep(0.01)
+        self.assertEqual(ran, [1])
+        self.assertEqual(pipeline.stats()['render'], {'workers': 1, 'busy': 0, 'queued': 0})
+
+    async def test_stages_run_in_the_submitters_context(self):
+        async def run(job):
+            job['seen'] = current_job.get()
+            return job
+
+        pipeline = self.pipeline([Stage('compose', run, workers=2)])
+
+        async def submit(idx):
+            current_job.set(idx)
+            return await pipeline.run({})
+
+        jobs = await asyncio.gather(submit('a'), submit('b'))
+        self.assertEqual([job['seen'] for job in jobs], ['a', 'b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+
+from tts_cache import TTSCache, cache_key
+
+
+class CacheKeyTests(unittest.TestCase):
+    def test_normalizes_whitespace_and_includes_voice(self):
+        a = cache_key([{'speaker': 'Presenter', 'line': 'Hello  world '}], 'en-US')
+        b = cache_key([{'speaker': 'Presenter', 'line': 'Hello world'}], 'en-US')
+        c = cache_key([{'speaker': 'Presenter', 'line': 'Hello world'}], 'en-US', voice='en-US-Neural2-F')
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+
+
+class TTSCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_memory_and_disk_tiers(self):
+        cache = TTSCache(self.tmp.name, memory_bytes=1024, disk_bytes=1024 * 1024)
+        self.assertIsNone(cache.get('a' * 64))
+        cache.put('a' * 64, b'audio')
+        self.assertEqual(cache.get('a' * 64), b'audio')
+
+        # A fresh instance only has the disk tier to go on
+        cold = TTSCache(self.tmp.name, memory_bytes=1024, disk_bytes=1024 * 1024)
+        self.assertEqual(cold.get('a' * 64), b'audio')
+        self.assertEqual(cold.stats()['disk_hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_evicts_least_recently_used(self):
+        cache = TTSCache(self.tmp.name, memory_bytes=10, disk_bytes=25)
+        for idx, key in enumerate(['a' * 64, 'b' * 64, 'c' * 64]):
+            cache.put(key, bytes(10))
+            path = os.path.join(self.tmp.name, key[:2], f'{key}.mp3')
+            os.utime(path, (idx, idx))
+
+        stats = cache.stats()
+        self.assertEqual(stats['memory_entries'], 1)
+        self.assertLessEqual(stats['disk_bytes'], 25)
+        self.assertGreaterEqual(stats['evictions'], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, 'aa', 'a' * 64 + '.mp3')))
+
+
+if __name__ == '__main__':
+    unittest.main()
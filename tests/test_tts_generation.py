@@ -0,0 +1,90 @@
+import asyncio
+import base64
+import os
+import struct
+import unittest
+from unittest.mock import patch
+
+import tts_generation
+from schemas import Slide
+from tts_generation import TTSGenerationError, attach_streamed_slide_audio, generate_tts_batch
+
+
+async def _fake_podio_tts(script, language='en-US', **_options):
+    line = script[0]['line']
+    # Earlier slides finish last to prove ordering does not depend on timing
+    await asyncio.sleep(0.05 if line == 'one' else 0)
+    if line == 'boom':
+        raise RuntimeError('upstream 502')
+    return {'audio': base64.b64encode(line.encode()).decode()}
+
+
+@patch.dict(os.environ, {'TTS_CACHE_ENABLED': 'false'})
+class GenerateTTSBatchTests(unittest.IsolatedAsyncioTestCase):
+    @patch.object(tts_generation, 'podio_generate_tts', side_effect=_fake_podio_tts)
+    async def test_preserves_slide_order(self, _mock):
+        scripts = [
+            [{'speaker': 'Presenter', 'line': 'one'}],
+            None,
+            [{'speaker': 'Presenter', 'line': 'three'}],
+        ]
+        results = await generate_tts_batch(scripts, concurrency=2)
+        decoded = [r.decode() if r else None for r in results]
+        self.assertEqual(decoded, ['one', None, 'three'])
+
+    @patch.object(tts_generation, 'podio_generate_tts', side_effect=_fake_podio_tts)
+    async def test_reports_failing_slide(self, _mock):
+        scripts = [
+            [{'speaker': 'Presenter', 'line': 'one'}],
+            [{'speaker': 'Presenter', 'line': 'boom'}],
+        ]
+        with self.assertRaisesRegex(TTSGenerationError, 'slide 2'):
+            await generate_tts_batch(scripts, concurrency=2)
+
+
+    @patch.object(tts_generation, 'podio_generate_tts', side_effect=_fake_podio_tts)
+    async def test_streamed_slides_are_voiced_while_later_ones_arrive(self, mock_tts):
+        calls_when_second_slide_arrived = []
+
+        async def slides():
+            yield Slide(title='A', speakerNotes='one')
+            await asyncio.sleep(0.01)
+            calls_when_second_slide_arrived.append(mock_tts.await_count)
+            yield Slide(title='B', speakerNotes='')
+            yield Slide(title='C', speakerNotes='three')
+
+        voiced = await attach_streamed_slide_audio(slides())
+        self.assertEqual([s.title for s in voiced], ['A', 'B', 'C'])
+        self.assertEqual(calls_when_second_slide_arrived, [1])
+        self.assertEqual(base64.b64decode(voiced[0].audioUrl.split(',', 1)[1]), b'one')
+        self.assertIsNone(voiced[1].audioUrl)
+        self.assertEqual(voiced[2].duration, 5.0)
+
+    @patch.dict(os.environ, {'SLIDE_AUDIO_PADDING_SECONDS': '0.5'})
+    async def test_slide_duration_is_the_measured_audio_length(self):
+        # One second of silent 8 kHz mono WAV
+        audio = b'RIFF' + struct.pack('<I', 36 + 16000) + b'WAVEfmt ' + struct.pack('<IHHIIHH', 16, 1, 1, 8000, 16000, 2, 16)
+        audio += b'data' + struct.pack('<I', 16000) + bytes(16000)
+
+        async def podio_tts(script, language='en-US', **_options):
+            return {'audio': base64.b64encode(audio).decode()}
+
+        async def slides():
+            yield Slide(title='A', speakerNotes='a very long speaker note ' * 20)
+
+        with patch.object(tts_generation, 'podio_generate_tts', side_effect=podio_tts):
+            voiced = await attach_streamed_slide_audio(slides())
+        self.assertAlmostEqual(voiced[0].duration, 1.5)
+
+    @patch.object(tts_generation, 'podio_generate_tts', side_effect=_fake_podio_tts)
+    async def test_stream_failure_cancels_synthesis(self, _mock):
+        async def slides():
+            yield Slide(title='A', speakerNotes='one')
+            raise RuntimeError('stream cut')
+
+        with self.assertRaisesRegex(RuntimeError, 'stream cut'):
+            await attach_streamed_slide_audio(slides())
+
+
+if __name__ == '__main__':
+    unittest.main()
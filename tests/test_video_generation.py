@@ -0,0 +1,102 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import video_generation
+from schemas import Slide
+from segment_cache import SegmentCache
+from remotion_server import RenderCancelled
+from video_generation import RenderCancelledError, VideoGenerationError, render_video
+
+
+class FfmpegEngineTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.slides = [Slide(title='Intro', duration=2.5), Slide(title='Market', duration=1)]
+        self.cache = SegmentCache(os.path.join(self.tmp, 'segment_cache'), disk_bytes=1 << 30)
+        patcher = patch.object(video_generation, 'get_segment_cache', return_value=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def render_mocked(self, slides):
+        commands = []
+
+        def fake_run(cmd, cancel=None):
+            commands.append(cmd)
+            with open(cmd[-1], 'wb') as f:
+                f.write(b'video')
+
+        with patch.object(video_generation, '_run', side_effect=fake_run), \
+                patch.object(video_generation, 'render_slides',
+                             side_effect=lambda slides, out, **_: [os.path.join(out, f'{i}.png') for i in range(len(slides))]):
+            path, filename = render_video('Our Pitch!', slides, self.tmp, fps=10, engine='ffmpeg', generate_audio=False)
+        return path, filename, commands
+
+    def test_slides_are_encoded_once_and_looped(self):
+        path, filename, commands = self.render_mocked(self.slides)
+
+        self.assertTrue(filename.startswith('Our_Pitch_') and filename.endswith('.mp4'))
+        self.assertTrue(os.path.exists(path))
+        self.assertFalse(any(name.endswith('_work') for name in os.listdir(self.tmp)))
+        # Slide 1: a 1 s unit plus a 0.5 s tail; slide 2: one unit; one audio pass; one stream-copy mux
+        frame_counts = [cmd[cmd.index('-frames:v') + 1] for cmd in commands if '-frames:v' in cmd]
+        self.assertEqual(sorted(frame_counts), ['10', '10', '5'])
+        audio = next(cmd for cmd in commands if '-filter_complex' in cmd)
+        self.assertIn('concat=n=2:v=0:a=1', audio[audio.index('-filter_complex') + 1])
+        mux = commands[-1]
+        self.assertEqual(mux[mux.index('-c') + 1], 'copy')
+
+    def test_cancel_stops_ffmpeg_before_the_next_encode(self):
+        cancel = threading.Event()
+        cancel.set()
+        with patch.object(video_generation.subprocess, 'run') as run, \
+                patch.object(video_generation, 'render_slides',
+                             side_effect=lambda slides, out, **_: [os.path.join(out, f'{i}.png') for i in range(len(slides))]), \
+                self.assertRaises(RenderCancelledError):
+            render_video('Pitch', self.slides, self.tmp, engine='ffmpeg', generate_audio=False, cancel=cancel)
+        run.assert_not_called()
+
+    def test_cancel_reaches_the_remotion_render(self):
+        cancel = threading.Event()
+
+        def fake_remotion(slides, project_id, **options):
+            self.assertIs(options['cancel'], cancel)
+            raise RenderCancelled('Render r1 cancelled')
+
+        with patch.object(video_generation, 'render_remotion_video', side_effect=fake_remotion), \
+                self.assertRaises(RenderCancelledError):
+            render_video('Pitch', self.slides, self.tmp, engine='remotion', generate_audio=False, cancel=cancel)
+
+    def test_rerender_encodes_only_changed_slides(self):
+        self.render_mocked(self.slides)
+        edited = [self.slides[0], Slide(title='Market (updated)', duration=1)]
+        _, _, commands = self.render_mocked(edited)
+        # Only the edited slide's unit is encoded; its audio and slide 1's clips come from the cache
+        encoded = [cmd for cmd in commands if '-frames:v' in cmd]
+        self.assertEqual(len(encoded), 1)
+        self.assertFalse(any('-filter_complex' in cmd for cmd in commands))
+        self.assertEqual(len(commands), 2)
+        _, _, commands = self.render_mocked(edited)
+        self.assertEqual(len(commands), 1)
+
+    def test_rejects_unknown_engine_and_remotion_webm(self):
+        with self.assertRaises(VideoGenerationError):
+            render_video('x', self.slides, self.tmp, engine='blender', generate_audio=False)
+        with self.assertRaises(VideoGenerationError):
+            render_video('x', self.slides, self.tmp, engine='remotion', output_format='webm', generate_audio=False)
+
+    @unittest.skipUnless(shutil.which('ffmpeg'), 'ffmpeg not installed')
+    def test_real_ffmpeg_render(self):
+        path, _ = render_video('Deck', self.slides, self.tmp, format='9:16', fps=10, engine='ffmpeg', generate_audio=False)
+        probe = subprocess.run(['ffmpeg', '-i', path, '-map', '0:v', '-f', 'null', '-'], capture_output=True, text=True)
+        self.assertIn('frame=   35', probe.stderr.replace('\r', '\n'))
+
+
+if __name__ == '__main__':
+    unittest.main()
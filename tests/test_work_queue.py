@@ -0,0 +1,130 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import worker
+from progress import emit
+from work_queue import SQLiteWorkQueue
+
+
+class WorkQueueTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.queue = SQLiteWorkQueue(os.path.join(tmp.name, 'queue.db'), max_attempts=2)
+        self.addCleanup(self.queue.close)
+
+    def test_enqueue_is_idempotent_per_job(self):
+        first = self.queue.enqueue('job-1', {'text': 'AI'})
+        second = self.queue.enqueue('job-1', {'text': 'AI'})
+        self.assertEqual(first, second)
+        self.assertEqual(self.queue.stats()['queue_depth'], 1)
+
+    def test_lease_expiry_lets_another_worker_claim(self):
+        self.queue.enqueue('job-1', {'text': 'AI'})
+        task = self.queue.claim('worker-a', lease_seconds=0.01)
+        self.assertIsNone(self.queue.claim('worker-b', lease_seconds=60))
+        time.sleep(0.02)
+
+        reclaimed = self.queue.claim('worker-b', lease_seconds=60)
+        self.assertEqual(reclaimed['task_id'], task['task_id'])
+        self.assertEqual(reclaimed['attempts'], 2)
+        self.assertFalse(self.queue.heartbeat(task['task_id'], 'worker-a', 60))
+        self.assertFalse(self.queue.complete(task['task_id'], 'worker-a', result='late'))
+        self.assertTrue(self.queue.complete(task['task_id'], 'worker-b', result='done'))
+
+        finished = self.queue.finished()
+        self.assertEqual([t['result'] for t in finished], ['done'])
+        self.queue.mark_collected(task['task_id'])
+        self.assertEqual(self.queue.finished(), [])
+
+    def test_gives_up_after_max_attempts(self):
+        self.queue.enqueue('job-1', {'text': 'AI'})
+        for _ in range(2):
+            self.assertIsNotNone(self.queue.claim('worker-a', lease_seconds=0.01))
+            time.sleep(0.02)
+        self.assertIsNone(self.queue.claim('worker-a', lease_seconds=60))
+        self.assertEqual(self.queue.finished()[0]['status'], 'failed')
+
+    def test_heartbeats_carry_progress_events(self):
+        self.queue.enqueue('job-1', {'text': 'AI'})
+        task = self.queue.claim('worker-a', lease_seconds=60)
+        self.assertTrue(self.queue.heartbeat(task['task_id'], 'worker-a', 60, [{'event': 'tts', 'slide': 1}]))
+        self.assertTrue(self.queue.heartbeat(task['task_id'], 'worker-a', 60, [{'event': 'tts', 'slide': 2}]))
+        self.assertFalse(self.queue.heartbeat(task['task_id'], 'worker-b', 60, [{'event': 'stolen'}]))
+        drained = self.queue.drain_events()
+        self.assertEqual(drained, [('job-1', [{'event': 'tts', 'slide': 1}, {'event': 'tts', 'slide': 2}])])
+        self.assertEqual(self.queue.drain_events(), [])
+
+
+class WorkerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_worker_runs_claimed_task_and_reports_result(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        queue = SQLiteWorkQueue(os.path.join(tmp.name, 'queue.db'))
+        self.addCleanup(queue.close)
+        queue.enqueue('job-1', {'text': 'AI'})
+        client = worker.LocalWorkQueueClient(queue)
+        task = await client.claim('worker-a', 60)
+
+        with patch.object(worker, 'execute_crew_task', new_callable=AsyncMock, return_value='ipfs://Qm'):
+            await worker._run_task(client, task, 'worker-a', 60)
+
+        finished = queue.finished()[0]
+        self.assertEqual(finished['result'], 'ipfs://Qm')
+        self.assertIn('spans', finished['trace'])
+
+    async def test_worker_forwards_progress_before_completing(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        queue = SQLiteWorkQueue(os.path.join(tmp.name, 'queue.db'))
+        self.addCleanup(queue.close)
+        queue.enqueue('job-1', {'text': 'AI'})
+        client = worker.LocalWorkQueueClient(queue)
+        task = await client.claim('worker-a', 60)
+
+        async def pipeline(text):
+            emit('tts', slide=1, completed=1, total=1)
+            return 'ipfs://Qm'
+
+        with patch.object(worker, 'execute_crew_task', side_effect=pipeline):
+            await worker._run_task(client, task, 'worker-a', 60)
+
+        [(job_id, events)] = queue.drain_events()
+        self.assertEqual(job_id, 'job-1')
+        self.assertEqual([e['event'] for e in events], ['tts'])
+
+    async def test_failed_completion_is_retried_and_never_kills_the_worker(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        queue = SQLiteWorkQueue(os.path.join(tmp.name, 'queue.db'))
+        self.addCleanup(queue.close)
+        queue.enqueue('job-1', {'text': 'AI'})
+        queue.enqueue('job-2', {'text': 'ML'})
+        client = worker.LocalWorkQueueClient(queue)
+        complete = client.complete
+        failures = [sqlite3.OperationalError('database is locked')]
+
+        async def flaky_complete(*args, **kwargs):
+            if failures:
+                raise failures.pop(0)
+            return await complete(*args, **kwargs)
+
+        client.complete = flaky_complete
+        with patch.object(worker, '_COMPLETE_BACKOFF', 0), \
+                patch.object(worker, 'execute_crew_task', new_callable=AsyncMock, return_value='ipfs://Qm'):
+            await worker._run_task(client, await client.claim('worker-a', 60), 'worker-a', 60)
+            self.assertEqual([task['job_id'] for task in queue.finished()], ['job-1'])
+
+            # The queue stays down: the outcome is dropped and the job waits for its lease to expire
+            failures.extend(sqlite3.OperationalError('disk I/O error') for _ in range(worker._COMPLETE_ATTEMPTS))
+            await worker._run_task(client, await client.claim('worker-a', 60), 'worker-a', 60)
+        self.assertEqual(failures, [])
+        self.assertEqual(queue.leased_job_ids(), ['job-2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
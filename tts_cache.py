@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from config import env_int
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def cache_key(
+    lines: List[dict],
+    language: str,
+    provider: Optional[str] = None,
+    voice: Optional[str] = None,
+    voice_map: Optional[Dict[str, str]] = None,
+) -> str:
+    """ Content hash of everything that changes the synthesized audio """
+    script = [
+        {"speaker": (line.get("speaker") or "").strip(), "line": " ".join((line.get("line") or "").split())}
+        for line in lines
+    ]
+    material = json.dumps({
+        "script": script,
+        "language": language,
+        "provider": provider,
+        "voice": voice,
+        "voiceMap": voice_map or {},
+    }, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """
+    Two-tier content-addressed store for synthesized audio bytes.
+
+    An in-memory LRU bounded by `memory_bytes` sits in front of a directory of
+    `<key>.mp3` files bounded by `disk_bytes`; the least recently used files
+    (by mtime, refreshed on every hit) are evicted first.
+    """
+
+    def __init__(self, directory: str, memory_bytes: int, disk_bytes: int):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_size = 0
+        self._disk_size: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.mp3")
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, data)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        with self._lock:
+            self._remember(key, data)
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write TTS cache entry {key[:12]}: {str(e)}")
+            return
+
+        with self._lock:
+            if self._disk_size is None:
+                self._disk_size = self._scan_disk_size()
+            else:
+                self._disk_size += len(data)
+            if self._disk_size > self.disk_bytes:
+                self._evict_disk()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "disk_bytes": self._disk_size or 0,
+            }
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if len(data) > self.memory_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_size -= len(previous)
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def _cache_files(self) -> List[os.DirEntry]:
+        entries: List[os.DirEntry] = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for shard in os.scandir(self.directory):
+            if shard.is_dir():
+                entries.extend(e for e in os.scandir(shard.path) if e.name.endswith(".mp3"))
+        return entries
+
+    def _scan_disk_size(self) -> int:
+        return sum(e.stat().st_size for e in self._cache_files())
+
+    def _evict_disk(self) -> None:
+        # Trim to 90% of the budget so we do not rescan on every put
+        target = int(self.disk_bytes * 0.9)
+        files = sorted(self._cache_files(), key=lambda e: e.stat().st_mtime)
+        size = sum(e.stat().st_size for e in files)
+        for entry in files:
+            if size <= target:
+                break
+            try:
+                entry_size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            size -= entry_size
+            self.evictions += 1
+        self._disk_size = size
+
+
+_cache: Optional[TTSCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_tts_cache() -> Optional[TTSCache]:
+    """ Process-wide cache, or None when TTS_CACHE_ENABLED is false """
+    global _cache
+    if os.getenv("TTS_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            media_dir = os.getenv("MEDIA_DIR", os.path.join(os.getcwd(), "outputs"))
+            _cache = TTSCache(
+                directory=os.path.join(media_dir, "tts_cache"),
+                memory_bytes=env_int("TTS_CACHE_MEMORY_BYTES", 64 * 1024 * 1024),
+                disk_bytes=env_int("TTS_CACHE_DISK_BYTES", 1024 * 1024 * 1024),
+            )
+        return _cache
@@ -1,22 +1,232 @@
 from __future__ import annotations
 
+import asyncio
 import base64
-from typing import List
-from podio_client import generate_tts as podio_generate_tts
+import os
+import time
+from typing import AsyncIterator, Dict, List, Optional
+from schemas import Slide
+from podio_client import generate_tts_async as podio_generate_tts
+from http_pool import run_sync
+from tts_cache import cache_key, get_tts_cache
+from audio_assets import write_audio_file
+from audio_probe import audio_duration
+from metrics import AUDIO_BYTES, TTS_REQUEST_SECONDS, record_span
+from progress import emit
 
 
 class TTSGenerationError(RuntimeError):
     pass
 
 
-def generate_tts(lines: List[dict], language: str = "en-US") -> str:
-    payload = podio_generate_tts(script=lines, language=language)
+def _slide_padding() -> float:
+    try:
+        return max(0.0, float(os.getenv("SLIDE_AUDIO_PADDING_SECONDS", "0.5")))
+    except ValueError:
+        return 0.5
+
+
+def _tts_concurrency() -> int:
+    try:
+        return max(1, int(os.getenv("TTS_CONCURRENCY", "4")))
+    except ValueError:
+        return 4
+
+
+async def generate_tts_bytes_async(
+    lines: List[dict],
+    language: str = "en-US",
+    provider: Optional[str] = None,
+    voice: Optional[str] = None,
+    voice_map: Optional[Dict[str, str]] = None,
+) -> bytes:
+    start = time.perf_counter()
+    cache = get_tts_cache()
+    key = cache_key(lines, language, provider, voice, voice_map)
+    if cache:
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            _observe_tts("cache", start, cached)
+            return cached
+
+    payload = await podio_generate_tts(script=lines, language=language, provider=provider, voice=voice, voice_map=voice_map)
     audio = payload.get("audio")
     if not audio:
         raise TTSGenerationError("No audio generated from podio-ai TTS")
     # validate base64
     try:
-        base64.b64decode(audio)
+        audio_bytes = base64.b64decode(audio)
     except Exception as exc:
         raise TTSGenerationError(f"Invalid audio base64: {exc}") from exc
-    return audio
+
+    if cache:
+        await asyncio.to_thread(cache.put, key, audio_bytes)
+    _observe_tts("upstream", start, audio_bytes)
+    return audio_bytes
+
+
+def _observe_tts(source: str, start: float, audio: bytes) -> None:
+    elapsed = time.perf_counter() - start
+    TTS_REQUEST_SECONDS.observe(elapsed, source=source)
+    AUDIO_BYTES.inc(len(audio))
+    record_span("tts_call", elapsed, source=source, bytes=len(audio))
+
+
+async def generate_tts_async(
+    lines: List[dict],
+    language: str = "en-US",
+    provider: Optional[str] = None,
+    voice: Optional[str] = None,
+    voice_map: Optional[Dict[str, str]] = None,
+) -> str:
+    audio_bytes = await generate_tts_bytes_async(lines, language=language, provider=provider, voice=voice, voice_map=voice_map)
+    return base64.b64encode(audio_bytes).decode("ascii")
+
+
+def generate_tts(
+    lines: List[dict],
+    language: str = "en-US",
+    provider: Optional[str] = None,
+    voice: Optional[str] = None,
+    voice_map: Optional[Dict[str, str]] = None,
+) -> str:
+    return run_sync(generate_tts_async(lines, language=language, provider=provider, voice=voice, voice_map=voice_map))
+
+
+async def generate_tts_batch(
+    scripts: List[Optional[List[dict]]],
+    language: str = "en-US",
+    concurrency: Optional[int] = None,
+    provider: Optional[str] = None,
+    voice: Optional[str] = None,
+) -> List[Optional[bytes]]:
+    """
+    Synthesize several scripts concurrently, at most `concurrency` at a time.
+
+    Results keep the order of `scripts`; empty scripts yield None. If any
+    script fails, scripts that have not started yet are skipped, in-flight
+    ones are allowed to finish, and the earliest failing script is reported.
+    """
+    semaphore = asyncio.Semaphore(concurrency or _tts_concurrency())
+    results: List[Optional[bytes]] = [None] * len(scripts)
+    failures: List[tuple[int, Exception]] = []
+    total = sum(1 for lines in scripts if lines)
+    done = 0
+
+    async def run(idx: int, lines: List[dict]) -> None:
+        nonlocal done
+        async with semaphore:
+            if failures:
+                return
+            try:
+                results[idx] = await generate_tts_bytes_async(lines, language, provider=provider, voice=voice)
+            except Exception as exc:
+                failures.append((idx, exc))
+                return
+            done += 1
+            emit("tts", slide=idx + 1, completed=done, total=total)
+
+    await asyncio.gather(*(run(idx, lines) for idx, lines in enumerate(scripts) if lines))
+
+    if failures:
+        idx, exc = min(failures, key=lambda f: f[0])
+        raise TTSGenerationError(f"TTS failed for slide {idx + 1}: {exc}") from exc
+    return results
+
+
+def _slide_script(slide: Slide) -> Optional[List[dict]]:
+    """ The TTS script for a slide, or None if it has no notes or already has audio """
+    if slide.speakerNotes and not (slide.audioUrl or slide.audioPath):
+        return [{"speaker": "Presenter", "line": slide.speakerNotes}]
+    return None
+
+
+async def _apply_slide_audio(slide: Slide, idx: int, audio_bytes: bytes, audio_dir: Optional[str]) -> None:
+    if audio_dir:
+        path = os.path.join(audio_dir, f"slide-{idx + 1:02d}.mp3")
+        slide.audioPath = await asyncio.to_thread(write_audio_file, audio_bytes, path)
+    else:
+        slide.audioUrl = f"data:audio/mp3;base64,{base64.b64encode(audio_bytes).decode('ascii')}"
+
+    # The slide lasts as long as its narration plus a short pause; audio the
+    # probe cannot read falls back to an estimate from the word count
+    seconds = audio_duration(audio_bytes)
+    if seconds is not None:
+        slide.duration = seconds + _slide_padding()
+    else:
+        word_count = len(slide.speakerNotes.split())
+        slide.duration = max(5.0, word_count / 2.2 + 1.5)
+
+
+async def attach_slide_audio(
+    slides: List[Slide],
+    language: str = "en-US",
+    provider: Optional[str] = None,
+    voice: Optional[str] = None,
+    audio_dir: Optional[str] = None,
+) -> None:
+    """
+    Voice the speaker notes of every slide that has no audio yet, in place.
+
+    With `audio_dir` the audio is written to one file per slide and referenced
+    through `audioPath`; otherwise it is inlined as a data URI in `audioUrl`.
+    """
+    scripts = [_slide_script(slide) for slide in slides]
+    audio_list = await generate_tts_batch(scripts, language=language, provider=provider, voice=voice)
+    for idx, (slide, audio_bytes) in enumerate(zip(slides, audio_list)):
+        if audio_bytes:
+            await _apply_slide_audio(slide, idx, audio_bytes, audio_dir)
+
+
+async def attach_streamed_slide_audio(
+    slides: AsyncIterator[Slide],
+    language: str = "en-US",
+    provider: Optional[str] = None,
+    voice: Optional[str] = None,
+    audio_dir: Optional[str] = None,
+) -> List[Slide]:
+    """
+    Collect slides from a stream and voice each one as soon as it arrives,
+    so synthesis overlaps the generation of the slides after it.
+
+    Same audio handling and failure semantics as attach_slide_audio and
+    generate_tts_batch; returns the slides in stream order. If the stream
+    fails, in-flight synthesis is cancelled.
+    """
+    semaphore = asyncio.Semaphore(_tts_concurrency())
+    collected: List[Slide] = []
+    tasks: List[asyncio.Task] = []
+    failures: List[tuple[int, Exception]] = []
+    done = 0
+
+    async def run(idx: int, slide: Slide, lines: List[dict]) -> None:
+        nonlocal done
+        async with semaphore:
+            if failures:
+                return
+            try:
+                audio_bytes = await generate_tts_bytes_async(lines, language, provider=provider, voice=voice)
+                await _apply_slide_audio(slide, idx, audio_bytes, audio_dir)
+            except Exception as exc:
+                failures.append((idx, exc))
+                return
+            done += 1
+            emit("tts", slide=idx + 1, completed=done)
+
+    try:
+        async for slide in slides:
+            lines = _slide_script(slide)
+            if lines and not failures:
+                tasks.append(asyncio.create_task(run(len(collected), slide, lines)))
+            collected.append(slide)
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    if failures:
+        idx, exc = min(failures, key=lambda f: f[0])
+        raise TTSGenerationError(f"TTS failed for slide {idx + 1}: {exc}") from exc
+    return collected
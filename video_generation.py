@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import shutil
+import subprocess
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+from audio_assets import materialize_slide_audio
+from http_pool import run_sync
+from logging_config import get_logger
+from metrics import VIDEO_BYTES, stage_timer
+from progress import emit
+from remotion_server import RenderCancelled
+from render_remotion import render_remotion_video
+from render_settings import render_slot, resolve_render_settings, slide_frames
+from schemas import BrandKit, RenderSettings, Slide
+from segment_cache import audio_track_key, get_segment_cache, segment_key
+from slide_rendering import DIMENSIONS, render_slides
+from tts_generation import attach_slide_audio
+
+logger = get_logger(__name__)
+
+ENGINES = ("remotion", "ffmpeg")
+
+# Every segment gets identical stream parameters so they concatenate without re-encoding
+_VIDEO_CODECS = {
+    "h264": ["-c:v", "libx264", "-preset", "veryfast", "-tune", "stillimage"],
+    "h265": ["-c:v", "libx265", "-preset", "veryfast", "-tag:v", "hvc1"],
+    "vp8": ["-c:v", "libvpx", "-deadline", "realtime", "-cpu-used", "8", "-b:v", "2M"],
+    "vp9": ["-c:v", "libvpx-vp9", "-deadline", "realtime", "-cpu-used", "8", "-b:v", "0"],
+}
+# Encoder defaults apply when a render does not set a CRF, except for VP9,
+# whose constant-quality mode needs one
+_DEFAULT_CRF = {"vp8": 10, "vp9": 34}
+_AUDIO_CODECS = {
+    "mp4": ["-c:a", "aac", "-b:a", "128k"],
+    "webm": ["-c:a", "libopus", "-b:a", "96k"],
+}
+
+
+class VideoGenerationError(RuntimeError):
+    pass
+
+
+class RenderCancelledError(VideoGenerationError):
+    pass
+
+
+def default_engine() -> str:
+    engine = os.getenv("VIDEO_ENGINE", "remotion").lower()
+    return engine if engine in ENGINES else "remotion"
+
+
+def _ffmpeg() -> str:
+    return os.getenv("FFMPEG_PATH", "ffmpeg")
+
+
+def _safe_name(topic: str) -> str:
+    name = re.sub(r"[^A-Za-z0-9]+", "_", topic).strip("_")[:80]
+    return name or "presentation"
+
+
+def render_video(
+    topic: str,
+    slides: List[Slide],
+    output_dir: str,
+    format: str = "16:9",
+    brand: Optional[BrandKit] = None,
+    fps: int = 30,
+    output_format: str = "mp4",
+    generate_audio: bool = True,
+    tts_language: str = "en-US",
+    tts_provider: Optional[str] = None,
+    tts_voice: Optional[str] = None,
+    engine: Optional[str] = None,
+    project_id: Optional[str] = None,
+    settings: Optional[RenderSettings] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Tuple[str, str]:
+    """
+    Render a deck to a video file; returns (path, filename).
+
+    `engine` is "remotion" (the podio-ai composition, animated layouts) or
+    "ffmpeg" (Pillow slide images plus audio, encoded natively); it defaults
+    to VIDEO_ENGINE. `settings` (see render_settings) defaults to ones derived
+    from `fps`, `output_format` and the host. Blocking: call it from a worker
+    thread, and set `cancel` to stop the render (RenderCancelledError).
+    """
+    engine = (settings.engine if settings else engine or default_engine()).lower()
+    if engine not in ENGINES:
+        raise VideoGenerationError(f"Unknown video engine: {engine}")
+    if output_format not in _AUDIO_CODECS:
+        raise VideoGenerationError(f"Unsupported output format: {output_format}")
+    if not slides:
+        raise VideoGenerationError("No slides to render")
+
+    if generate_audio:
+        run_sync(attach_slide_audio(slides, language=tts_language, provider=tts_provider, voice=tts_voice))
+
+    project_id = project_id or str(uuid.uuid4())
+    os.makedirs(output_dir, exist_ok=True)
+
+    if engine == "remotion" and output_format != "mp4":
+        raise VideoGenerationError("The remotion engine only renders mp4")
+    if settings is None:
+        try:
+            settings = resolve_render_settings(engine, fps=fps, output_format=output_format)
+        except ValueError as e:
+            raise VideoGenerationError(str(e)) from e
+    with render_slot():
+        if engine == "remotion":
+            try:
+                video_path = render_remotion_video(
+                    [s.model_dump() for s in slides], project_id, settings=settings, on_progress=_remotion_progress,
+                    output_dir=output_dir, cancel=cancel,
+                )
+            except RenderCancelled as e:
+                raise RenderCancelledError(str(e)) from e
+            except Exception as e:
+                raise VideoGenerationError(f"Remotion render failed: {e}") from e
+            return video_path, os.path.basename(video_path)
+
+        filename = f"{_safe_name(topic)}_{project_id[:8]}.{output_format}"
+        video_path = os.path.join(output_dir, filename)
+        render_ffmpeg_video(slides, video_path, format=format, brand=brand, output_format=output_format, settings=settings,
+                            cancel=cancel)
+        return video_path, filename
+
+
+async def render_video_async(**kwargs: Any) -> Tuple[str, str]:
+    """
+    render_video in a worker thread. Cancelling the caller sets the render's
+    `cancel` event and waits for the thread to stop, so a cancelled job does
+    not leave its render (or sidecar job) running.
+    """
+    cancel = threading.Event()
+    render = asyncio.ensure_future(asyncio.to_thread(render_video, cancel=cancel, **kwargs))
+    try:
+        return await asyncio.shield(render)
+    except asyncio.CancelledError:
+        cancel.set()
+        await asyncio.gather(render, return_exceptions=True)
+        raise
+
+
+def _remotion_progress(state: dict) -> None:
+    emit(
+        "render",
+        engine="remotion",
+        progress=round(state.get("progress") or 0, 4),
+        renderedFrames=state.get("renderedFrames"),
+        encodedFrames=state.get("encodedFrames"),
+    )
+
+
+def _run(cmd: List[str], cancel: Optional[threading.Event] = None) -> None:
+    if cancel is not None and cancel.is_set():
+        raise RenderCancelledError("Render cancelled")
+    try:
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except FileNotFoundError as e:
+        raise VideoGenerationError(f"ffmpeg not found ({_ffmpeg()}); install it or set FFMPEG_PATH") from e
+    except subprocess.CalledProcessError as e:
+        stderr = (e.stderr or b"").decode("utf-8", "replace").strip().splitlines()
+        raise VideoGenerationError(f"ffmpeg failed: {stderr[-1] if stderr else e}") from e
+
+
+def _video_args(settings: RenderSettings) -> List[str]:
+    crf = settings.crf if settings.crf is not None else _DEFAULT_CRF.get(settings.codec)
+    return [*_VIDEO_CODECS[settings.codec], *(["-crf", str(crf)] if crf is not None else []), "-pix_fmt", "yuv420p"]
+
+
+def _unit_command(image: str, output: str, frames: int, settings: RenderSettings) -> List[str]:
+    """
+    Encode a still slide as a short clip of `frames` frames. The image is
+    decoded once and repeated in memory; the clip is then looped by the
+    concat demuxer for as long as the slide lasts.
+    """
+    fps = settings.fps
+    filters = f"loop=loop={frames - 1}:size=1:start=0,setpts=N/({fps}*TB)"
+    if settings.resolution:
+        filters += f",scale=-2:{settings.resolution}"
+    return [
+        _ffmpeg(), "-y", "-hide_banner", "-loglevel", "error",
+        "-framerate", str(fps), "-i", image,
+        "-filter:v", filters,
+        "-frames:v", str(frames), "-r", str(fps), "-g", str(frames), "-an",
+        *_video_args(settings),
+        output,
+    ]
+
+
+def _audio_command(audio_files: List[Optional[str]], seconds: List[float], output: str, output_format: str) -> List[str]:
+    """ One pass over the whole deck: each slide's audio padded or cut to its slot, silence where there is none """
+    cmd = [_ffmpeg(), "-y", "-hide_banner", "-loglevel", "error"]
+    filters = []
+    inputs = 0
+    for idx, (audio, duration) in enumerate(zip(audio_files, seconds)):
+        if audio:
+            cmd += ["-i", audio]
+            source = f"[{inputs}:a]"
+            inputs += 1
+            filters.append(
+                f"{source}aresample=48000,aformat=sample_fmts=fltp:channel_layouts=stereo,"
+                f"apad,atrim=0:{duration:.6f}[a{idx}]"
+            )
+        else:
+            filters.append(f"anullsrc=r=48000:cl=stereo,aformat=sample_fmts=fltp,atrim=0:{duration:.6f}[a{idx}]")
+    labels = "".join(f"[a{idx}]" for idx in range(len(seconds)))
+    filters.append(f"{labels}concat=n={len(seconds)}:v=0:a=1[out]")
+    cmd += ["-filter_complex", ";".join(filters), "-map", "[out]", *_AUDIO_CODECS[output_format], output]
+    return cmd
+
+
+def render_ffmpeg_video(
+    slides: List[Slide],
+    output_path: str,
+    format: str = "16:9",
+    brand: Optional[BrandKit] = None,
+    output_format: str = "mp4",
+    settings: Optional[RenderSettings] = None,
+    cancel: Optional[threading.Event] = None,
+) -> str:
+    """
+    Native render path: each slide is drawn once by slide_rendering and
+    encoded once as a one-second clip; the concat demuxer repeats that clip
+    for the slide's duration and the deck's audio is encoded in a single
+    pass, so the final mux is a stream copy.
+
+    Clips and audio tracks are kept in the segment cache under a hash of
+    their content, so re-rendering an edited deck only draws and encodes
+    the slides that changed. Setting `cancel` stops it before the next
+    ffmpeg command.
+    """
+    if format not in DIMENSIONS:
+        raise VideoGenerationError(f"Unsupported format: {format}")
+    settings = settings or resolve_render_settings("ffmpeg", output_format=output_format)
+    fps = settings.fps
+    audio_ext = "m4a" if output_format == "mp4" else "webm"
+    cache = get_segment_cache()
+    encoder = {**settings.model_dump(include={"fps", "codec", "crf", "resolution"}), "container": output_format}
+    brand_dict = brand.model_dump() if brand else None
+    work_dir = f"{os.path.splitext(output_path)[0]}_work"
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        slide_dicts = [s.model_dump() for s in slides]
+        frames = [slide_frames(slide.duration, fps) for slide in slides]
+
+        # One-second units, plus a shorter tail clip when a slide is not a whole number of seconds
+        playlist = []
+        missing: Dict[str, Tuple[int, int]] = {}
+        for idx, (slide, count) in enumerate(zip(slide_dicts, frames)):
+            repeats, tail = divmod(count, fps)
+            for length, times in ((fps, repeats), (tail, 1 if tail else 0)):
+                if not times:
+                    continue
+                key = segment_key(slide, length, format, brand_dict, encoder)
+                clip = os.path.join(work_dir, f"{key}.{output_format}")
+                if not os.path.exists(clip) and key not in missing:
+                    if not (cache and cache.fetch(key, output_format, clip)):
+                        missing[key] = (idx, length)
+                playlist += [clip] * times
+
+        with stage_timer("frames", slides=len(slides)):
+            # Only slides with a clip to encode are drawn
+            to_draw = sorted({idx for idx, _ in missing.values()})
+            drawn = render_slides([slides[idx] for idx in to_draw], os.path.join(work_dir, "frames"),
+                                  format=format, brand=brand, encoding="png") if to_draw else []
+            images = dict(zip(to_draw, drawn))
+            audio_names = materialize_slide_audio(slide_dicts, os.path.join(work_dir, "audio"))
+        audio_files = [os.path.join(work_dir, "audio", name) if name else None for name in audio_names]
+
+        commands = [
+            _unit_command(images[idx], os.path.join(work_dir, f"{key}.{output_format}"), length, settings)
+            for key, (idx, length) in missing.items()
+        ]
+        seconds = [count / fps for count in frames]
+        audio_key = audio_track_key(audio_files, seconds, output_format) if cache else None
+        audio_track = os.path.join(work_dir, f"audio.{audio_ext}")
+        audio_cached = bool(cache and cache.fetch(audio_key, audio_ext, audio_track))
+        if not audio_cached:
+            commands.append(_audio_command(audio_files, seconds, audio_track, output_format))
+        logger.info(f"Encoding {len(missing)} of {len(set(playlist))} slide clips"
+                    f"{'' if audio_cached else ' and the audio track'}")
+
+        with stage_timer("render", engine="ffmpeg", encoded=len(missing)):
+            if commands:
+                with ThreadPoolExecutor(max_workers=min(settings.concurrency, len(commands))) as pool:
+                    for done, future in enumerate(as_completed([pool.submit(_run, cmd, cancel) for cmd in commands]), 1):
+                        future.result()
+                        emit("render", engine="ffmpeg", progress=round(done / len(commands), 4))
+            if cache:
+                for key in missing:
+                    cache.put(key, output_format, os.path.join(work_dir, f"{key}.{output_format}"))
+                if not audio_cached:
+                    cache.put(audio_key, audio_ext, audio_track)
+
+            concat_list = os.path.join(work_dir, "video.txt")
+            with open(concat_list, "w") as f:
+                for clip in playlist:
+                    f.write(f"file '{os.path.abspath(clip)}'\n")
+            tmp_path = f"{output_path}.tmp.{output_format}"
+            cmd = [_ffmpeg(), "-y", "-hide_banner", "-loglevel", "error",
+                   "-f", "concat", "-safe", "0", "-i", concat_list, "-i", audio_track,
+                   "-map", "0:v", "-map", "1:a", "-c", "copy"]
+            if output_format == "mp4":
+                cmd += ["-movflags", "+faststart"]
+            _run(cmd + [tmp_path], cancel)
+            os.replace(tmp_path, output_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    VIDEO_BYTES.inc(os.path.getsize(output_path))
+    logger.info(f"Rendered {len(slides)} slides to {output_path} with ffmpeg")
+    return output_path
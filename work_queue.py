@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from http_pool import get_client
+from config import env_int
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class WorkQueueError(RuntimeError):
+    pass
+
+
+class SQLiteWorkQueue:
+    """
+    Durable task queue with leases, shared by the API and worker processes.
+
+    A task is `queued` until a worker claims it, which leases it for
+    `lease_seconds`. Workers extend the lease with `heartbeat`; a lease that
+    expires (crashed or partitioned worker) makes the task claimable again
+    until `max_attempts` is reached. Finished tasks stay `done` / `failed`
+    until the API has applied the outcome and calls `mark_collected`.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                job_id TEXT NOT NULL UNIQUE,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires_at REAL,
+                result TEXT,
+                error TEXT,
+                trace TEXT,
+                events TEXT,
+                collected INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_tasks_claim ON tasks(status, created_at);
+            CREATE INDEX IF NOT EXISTS idx_tasks_collect ON tasks(collected, status);
+            """
+        )
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(tasks)")}
+        if "trace" not in columns:
+            self._conn.execute("ALTER TABLE tasks ADD COLUMN trace TEXT")
+        if "events" not in columns:
+            self._conn.execute("ALTER TABLE tasks ADD COLUMN events TEXT")
+
+    def _write(self, fn):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn()
+                self._conn.execute("COMMIT")
+                return result
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _task(row: sqlite3.Row) -> Dict[str, Any]:
+        task = dict(row)
+        task["payload"] = json.loads(task["payload"])
+        task["trace"] = json.loads(task["trace"]) if task.get("trace") else None
+        return task
+
+    def enqueue(self, job_id: str, payload: Dict[str, Any]) -> str:
+        """ Queue work for a job; re-enqueueing an already queued job is a no-op """
+        now = time.time()
+        task_id = str(uuid.uuid4())
+
+        def op():
+            self._conn.execute(
+                "INSERT OR IGNORE INTO tasks (task_id, job_id, payload, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?)",
+                (task_id, job_id, json.dumps(payload), now, now),
+            )
+            return self._conn.execute("SELECT task_id FROM tasks WHERE job_id = ?", (job_id,)).fetchone()["task_id"]
+
+        return self._write(op)
+
+    def claim(self, worker_id: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        now = time.time()
+
+        def op():
+            # Tasks whose lease ran out too often are given up on
+            self._conn.execute(
+                "UPDATE tasks SET status = 'failed', error = 'Lease expired too many times', updated_at = ? "
+                "WHERE status = 'leased' AND lease_expires_at < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            row = self._conn.execute(
+                "SELECT * FROM tasks WHERE status = 'queued' OR (status = 'leased' AND lease_expires_at < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires_at = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE task_id = ?",
+                (worker_id, now + lease_seconds, now, row["task_id"]),
+            )
+            return self._task(self._conn.execute("SELECT * FROM tasks WHERE task_id = ?", (row["task_id"],)).fetchone())
+
+        return self._write(op)
+
+    def heartbeat(
+        self,
+        task_id: str,
+        worker_id: str,
+        lease_seconds: float,
+        events: Optional[List[Dict[str, Any]]] = None,
+    ) -> bool:
+        """
+        Extend a lease, queueing the worker's progress events for the API to
+        pick up with `drain_events`; False means the worker no longer owns the task.
+        """
+        now = time.time()
+
+        def op():
+            cursor = self._conn.execute(
+                "UPDATE tasks SET lease_expires_at = ?, updated_at = ? "
+                "WHERE task_id = ? AND lease_owner = ? AND status = 'leased'",
+                (now + lease_seconds, now, task_id, worker_id),
+            )
+            if cursor.rowcount != 1:
+                return False
+            if events:
+                row = self._conn.execute("SELECT events FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+                pending = json.loads(row["events"]) if row["events"] else []
+                self._conn.execute("UPDATE tasks SET events = ? WHERE task_id = ?", (json.dumps(pending + events), task_id))
+            return True
+
+        return self._write(op)
+
+    def drain_events(self) -> List[Tuple[str, List[Dict[str, Any]]]]:
+        """ (job_id, events) for every task with progress the API has not published yet """
+
+        def op():
+            rows = self._conn.execute("SELECT job_id, events FROM tasks WHERE events IS NOT NULL").fetchall()
+            if rows:
+                self._conn.execute("UPDATE tasks SET events = NULL WHERE events IS NOT NULL")
+            return [(row["job_id"], json.loads(row["events"])) for row in rows]
+
+        return self._write(op)
+
+    def complete(
+        self,
+        task_id: str,
+        worker_id: str,
+        result: Optional[str] = None,
+        error: Optional[str] = None,
+        trace: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        now = time.time()
+        status = "failed" if error else "done"
+        trace_json = json.dumps(trace) if trace else None
+
+        def op():
+            cursor = self._conn.execute(
+                "UPDATE tasks SET status = ?, result = ?, error = ?, trace = ?, lease_expires_at = NULL, updated_at = ? "
+                "WHERE task_id = ? AND lease_owner = ? AND status = 'leased'",
+                (status, result, error, trace_json, now, task_id, worker_id),
+            )
+            return cursor.rowcount == 1
+
+        return self._write(op)
+
+    def finished(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """ Finished tasks whose outcome the API has not applied yet """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM tasks WHERE collected = 0 AND status IN ('done', 'failed') ORDER BY updated_at LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [self._task(row) for row in rows]
+
+    def leased_job_ids(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT job_id FROM tasks WHERE status = 'leased'").fetchall()
+        return [row["job_id"] for row in rows]
+
+    def mark_collected(self, task_id: str) -> None:
+        self._write(lambda: self._conn.execute("UPDATE tasks SET collected = 1 WHERE task_id = ?", (task_id,)))
+
+    def stats(self) -> Dict[str, int]:
+        now = time.time()
+        with self._lock:
+            queued = self._conn.execute("SELECT COUNT(*) FROM tasks WHERE status = 'queued'").fetchone()[0]
+            leased = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT lease_owner) FROM tasks WHERE status = 'leased' AND lease_expires_at >= ?",
+                (now,),
+            ).fetchone()
+        return {"queue_depth": queued, "leased": leased[0], "active_workers": leased[1]}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class HTTPWorkQueue:
+    """ Worker-side client for a queue owned by an API process on another host """
+
+    def __init__(self, base_url: str, token: str) -> None:
+        self.base_url = base_url.rstrip("/")
+        self._headers = {"X-Worker-Token": token}
+
+    async def _post(self, path: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            resp = await get_client("queue").post(f"{self.base_url}{path}", json=payload, headers=self._headers, timeout=30)
+            resp.raise_for_status()
+        except Exception as exc:
+            raise WorkQueueError(f"Work queue request failed: {exc}") from exc
+        return resp.json() if resp.status_code != 204 else None
+
+    async def claim(self, worker_id: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        return await self._post("/internal/queue/claim", {"worker_id": worker_id, "lease_seconds": lease_seconds})
+
+    async def heartbeat(
+        self,
+        task_id: str,
+        worker_id: str,
+        lease_seconds: float,
+        events: Optional[List[Dict[str, Any]]] = None,
+    ) -> bool:
+        body = await self._post(
+            "/internal/queue/heartbeat",
+            {"task_id": task_id, "worker_id": worker_id, "lease_seconds": lease_seconds, "events": events or []},
+        )
+        return bool(body and body.get("ok"))
+
+    async def complete(
+        self,
+        task_id: str,
+        worker_id: str,
+        result: Optional[str] = None,
+        error: Optional[str] = None,
+        trace: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        body = await self._post(
+            "/internal/queue/complete",
+            {"task_id": task_id, "worker_id": worker_id, "result": result, "error": error, "trace": trace},
+        )
+        return bool(body and body.get("ok"))
+
+
+def create_work_queue() -> SQLiteWorkQueue:
+    return SQLiteWorkQueue(
+        os.getenv("WORK_QUEUE_PATH", "work_queue.db"),
+        max_attempts=env_int("WORK_QUEUE_MAX_ATTEMPTS", 3),
+    )
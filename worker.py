@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import socket
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from config import env_float, env_int
+from font_registry import preload_fonts
+from http_pool import run_sync
+from logging_config import get_logger
+from metrics import job_trace
+from pipeline import execute_crew_task
+from progress import job_progress
+from remotion_server import shutdown_render_server, warm_render_server
+from work_queue import HTTPWorkQueue, SQLiteWorkQueue, create_work_queue
+
+logger = get_logger(__name__)
+
+PROGRESS_FLUSH_SECONDS = env_float("PROGRESS_FLUSH_SECONDS", 1)
+# Attempts at reporting a finished job, with exponential backoff between them
+_COMPLETE_ATTEMPTS = 3
+_COMPLETE_BACKOFF = 1.0
+
+
+class LocalWorkQueueClient:
+    """ Async facade over a SQLite queue on this host """
+
+    def __init__(self, queue: SQLiteWorkQueue) -> None:
+        self.queue = queue
+
+    async def claim(self, worker_id: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.queue.claim, worker_id, lease_seconds)
+
+    async def heartbeat(
+        self,
+        task_id: str,
+        worker_id: str,
+        lease_seconds: float,
+        events: Optional[List[Dict[str, Any]]] = None,
+    ) -> bool:
+        return await asyncio.to_thread(self.queue.heartbeat, task_id, worker_id, lease_seconds, events)
+
+    async def complete(
+        self,
+        task_id: str,
+        worker_id: str,
+        result: Optional[str] = None,
+        error: Optional[str] = None,
+        trace: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        return await asyncio.to_thread(self.queue.complete, task_id, worker_id, result, error, trace)
+
+
+def _queue_client():
+    url = os.getenv("WORK_QUEUE_URL")
+    if url:
+        return HTTPWorkQueue(url, os.getenv("WORKER_TOKEN", ""))
+    return LocalWorkQueueClient(create_work_queue())
+
+
+async def _complete(queue, task: Dict[str, Any], worker_id: str, **outcome: Any) -> None:
+    """
+    Report a finished job. If the queue stays unreachable the outcome is
+    dropped and the job runs again once its lease expires, rather than the
+    error taking the work loop down.
+    """
+    for attempt in range(_COMPLETE_ATTEMPTS):
+        try:
+            if not await queue.complete(task["task_id"], worker_id, **outcome):
+                logger.warning(f"Worker {worker_id} no longer holds job {task['job_id']}, its outcome was discarded")
+            return
+        except Exception as e:
+            if attempt + 1 == _COMPLETE_ATTEMPTS:
+                logger.error(f"Could not report job {task['job_id']}, it will be retried after its lease expires: {str(e)}")
+                return
+            logger.warning(f"Reporting job {task['job_id']} failed, retrying: {str(e)}")
+            await asyncio.sleep(_COMPLETE_BACKOFF * (2 ** attempt))
+
+
+async def _run_task(queue, task: Dict[str, Any], worker_id: str, lease_seconds: float) -> None:
+    task_id = task["task_id"]
+    logger.info(f"Worker {worker_id} running job {task['job_id']} (attempt {task['attempts']})")
+    # Progress events ride along with heartbeats; render threads append to this too
+    events: Deque[Dict[str, Any]] = deque()
+    # The task copies the current context, so spans land in this trace
+    with job_trace() as trace, job_progress(task["job_id"], sink=events.append):
+        work = asyncio.create_task(execute_crew_task(task["payload"]["text"]))
+
+    def take_events() -> List[Dict[str, Any]]:
+        batch = []
+        while events:
+            batch.append(events.popleft())
+        return batch
+
+    async def keep_lease() -> None:
+        last_beat = time.monotonic()
+        while True:
+            await asyncio.sleep(min(PROGRESS_FLUSH_SECONDS, lease_seconds / 3))
+            if not events and time.monotonic() - last_beat < lease_seconds / 3:
+                continue
+            batch = take_events()
+            try:
+                if not await queue.heartbeat(task_id, worker_id, lease_seconds, batch):
+                    logger.warning(f"Worker {worker_id} lost the lease on job {task['job_id']}, abandoning it")
+                    work.cancel()
+                    return
+                last_beat = time.monotonic()
+            except Exception as e:
+                # Transient: the lease is still valid until it expires; resend the events next time
+                events.extendleft(reversed(batch))
+                logger.warning(f"Heartbeat for job {task['job_id']} failed: {str(e)}")
+
+    async def flush_events() -> None:
+        batch = take_events()
+        if batch:
+            try:
+                await queue.heartbeat(task_id, worker_id, lease_seconds, batch)
+            except Exception as e:
+                logger.warning(f"Could not send the last progress events for job {task['job_id']}: {str(e)}")
+
+    heartbeat = asyncio.create_task(keep_lease())
+    try:
+        result = await work
+    except asyncio.CancelledError:
+        if heartbeat.done():
+            # keep_lease cancelled the work: another worker owns the task now
+            return
+        raise
+    except Exception as e:
+        logger.error(f"Job {task['job_id']} failed: {str(e)}", exc_info=True)
+        await flush_events()
+        await _complete(queue, task, worker_id, error=str(e), trace=trace.to_dict())
+        return
+    finally:
+        heartbeat.cancel()
+
+    await flush_events()
+    await _complete(queue, task, worker_id, result=result, trace=trace.to_dict())
+    logger.info(f"Worker {worker_id} finished job {task['job_id']}")
+
+
+async def _work_loop(queue, worker_id: str, lease_seconds: float, poll_interval: float) -> None:
+    while True:
+        try:
+            task = await queue.claim(worker_id, lease_seconds)
+        except Exception as e:
+            logger.warning(f"Worker {worker_id} could not claim work: {str(e)}")
+            task = None
+        if task is None:
+            await asyncio.sleep(poll_interval)
+            continue
+        await _run_task(queue, task, worker_id, lease_seconds)
+
+
+async def serve_worker() -> None:
+    concurrency = env_int("WORKER_CONCURRENCY", 1, minimum=1)
+    lease_seconds = env_float("WORK_QUEUE_LEASE_SECONDS", 60)
+    poll_interval = env_float("WORK_QUEUE_POLL_INTERVAL", 1)
+    queue = _queue_client()
+    await asyncio.to_thread(preload_fonts)
+    await asyncio.to_thread(warm_render_server)
+    base_id = f"{socket.gethostname()}-{os.getpid()}"
+    logger.info(f"Starting {concurrency} render worker(s) as {base_id}")
+    try:
+        await asyncio.gather(*(
+            _work_loop(queue, f"{base_id}-{idx}", lease_seconds, poll_interval)
+            for idx in range(concurrency)
+        ))
+    finally:
+        await asyncio.to_thread(shutdown_render_server)
+
+
+def run_worker() -> None:
+    """ Entry point for `python worker.py` """
+    run_sync(serve_worker())
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from logging_config import setup_logging
+
+    setup_logging()
+    load_dotenv(override=True)
+    run_worker()